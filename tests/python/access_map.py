@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Mapa persistente de acessibilidade dos endpoints (SQLite)
+
+Guarda o último resultado de cada endpoint sondado e decide se vale chamar
+de novo:
+    403/404/405   cache negativo: ignorado até expirar (NEGATIVE_TTL por status)
+    5xx/timeout   circuit breaker: após BREAKER_THRESHOLD falhas seguidas o
+                  endpoint fica ignorado por um intervalo que dobra a cada nova
+                  falha (até BREAKER_MAX_COOLDOWN); expirado, uma chamada de
+                  teste fecha o circuito se der certo
+    2xx/3xx       limpa qualquer bloqueio
+
+A chave é a raiz da API (host + subdomínio) mais o path, então rodadas contra
+o mock_server.py ou outro tenant não se misturam.
+
+Uso:
+    python access_map.py
+    python access_map.py --reset /v1/fixed-assets
+    python access_map.py --reset
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+ACCESS_DB = os.getenv("SIENGE_ACCESS_DB", "sienge_access.db")
+
+# Validade de uma resposta negativa antes de reverificar o endpoint
+NEGATIVE_TTL = {
+    403: timedelta(days=7),   # permissão do usuário muda raramente
+    404: timedelta(days=30),  # path inexistente
+    405: timedelta(days=30),
+}
+
+# Falhas transitórias seguidas que abrem o circuito e o intervalo inicial/máximo
+BREAKER_THRESHOLD = 3
+BREAKER_COOLDOWN = timedelta(minutes=30)
+BREAKER_MAX_COOLDOWN = timedelta(days=1)
+
+_API_ROOT = "/public/api"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS access_map (
+    scope TEXT NOT NULL,
+    endpoint TEXT NOT NULL,
+    status INTEGER,
+    checked_at TEXT NOT NULL,
+    skip_until TEXT,
+    failures INTEGER NOT NULL DEFAULT 0,
+    cooldown INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    PRIMARY KEY (scope, endpoint)
+)
+"""
+
+
+@dataclass
+class AccessEntry:
+    """Último resultado conhecido de um endpoint"""
+    scope: str
+    endpoint: str
+    status: Optional[int]      # None: timeout ou erro de conexão
+    checked_at: str
+    skip_until: Optional[str]
+    failures: int              # falhas transitórias seguidas
+    cooldown: int              # segundos do circuito aberto (0 = fechado)
+    error: Optional[str]
+
+    @property
+    def state(self) -> str:
+        if self.cooldown:
+            return "circuito aberto"
+        if self.status in NEGATIVE_TTL:
+            return "negado" if self.status == 403 else "inexistente"
+        if self.failures:
+            return "instável"
+        return "ok"
+
+    def blocked(self, now: datetime) -> bool:
+        return bool(self.skip_until) and now < datetime.fromisoformat(self.skip_until)
+
+    def reason(self) -> str:
+        if self.cooldown:
+            what = f"circuito aberto após {self.failures} falhas ({self.error or self.status})"
+        else:
+            what = f"{self.status} em {self.checked_at}"
+        return f"{what}; reverifica em {self.skip_until}"
+
+
+def access_key(url: str) -> Tuple[str, str]:
+    """(raiz da API, path relativo) de uma URL, sem query string"""
+    parts = urlsplit(url)
+    path = parts.path.rstrip("/") or "/"
+    root = path.find(_API_ROOT)
+    if root < 0:
+        return f"{parts.scheme}://{parts.netloc}", path
+    end = root + len(_API_ROOT)
+    return f"{parts.scheme}://{parts.netloc}{path[:end]}", path[end:] or "/"
+
+
+def transient(status: Optional[int]) -> bool:
+    """Falha que conta para o circuit breaker (5xx, timeout, conexão)"""
+    return status is None or status >= 500
+
+
+class AccessMap:
+    """Acessibilidade por endpoint, com cache negativo e circuit breaker"""
+
+    def __init__(self, path: str = ACCESS_DB, recheck: bool = False):
+        self.path = path
+        # recheck=True ignora os bloqueios (mas continua registrando os resultados)
+        self.recheck = recheck
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(SCHEMA)
+        rows = self._conn.execute(
+            "SELECT scope, endpoint, status, checked_at, skip_until, failures, cooldown, error "
+            "FROM access_map").fetchall()
+        self._entries: Dict[Tuple[str, str], AccessEntry] = {
+            (row[0], row[1]): AccessEntry(*row) for row in rows}
+        # Endpoints com circuito em meia-abertura: só uma chamada de teste por vez
+        self._probing: set = set()
+
+    def get(self, url: str) -> Optional[AccessEntry]:
+        return self._entries.get(access_key(url))
+
+    def skip_reason(self, url: str, now: Optional[datetime] = None) -> Optional[str]:
+        """Motivo para não chamar a URL agora, ou None se a chamada deve ser feita"""
+        if self.recheck:
+            return None
+        key = access_key(url)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.blocked(now or datetime.now()):
+                return entry.reason()
+            if entry.cooldown:
+                if key in self._probing:
+                    return "circuito em teste por outra chamada"
+                self._probing.add(key)
+        return None
+
+    def record(self, url: str, status: Optional[int], error: Optional[str] = None,
+               now: Optional[datetime] = None):
+        """Registra o resultado de uma chamada (status None para timeout/erro de conexão)"""
+        if status == 429:
+            # Rate limit diz respeito à conta, não ao endpoint
+            return
+        now = now or datetime.now()
+        key = access_key(url)
+        with self._lock:
+            self._probing.discard(key)
+            previous = self._entries.get(key)
+            failures = previous.failures if previous else 0
+            cooldown = previous.cooldown if previous else 0
+            skip_until = None
+            if status in NEGATIVE_TTL:
+                failures = cooldown = 0
+                skip_until = now + NEGATIVE_TTL[status]
+            elif transient(status):
+                failures += 1
+                if failures >= BREAKER_THRESHOLD or cooldown:
+                    # Abre (ou reabre, após a chamada de teste) com intervalo dobrado
+                    seconds = cooldown * 2 if cooldown else BREAKER_COOLDOWN.total_seconds()
+                    cooldown = int(min(seconds, BREAKER_MAX_COOLDOWN.total_seconds()))
+                    skip_until = now + timedelta(seconds=cooldown)
+            else:
+                failures = cooldown = 0
+                error = None
+            entry = AccessEntry(key[0], key[1], status, now.isoformat(timespec="seconds"),
+                                skip_until.isoformat(timespec="seconds") if skip_until else None,
+                                failures, cooldown, error[:200] if error else None)
+            self._entries[key] = entry
+            self._conn.execute(
+                "INSERT INTO access_map (scope, endpoint, status, checked_at, skip_until, "
+                "failures, cooldown, error) VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (scope, endpoint) DO UPDATE SET status = excluded.status, "
+                "checked_at = excluded.checked_at, skip_until = excluded.skip_until, "
+                "failures = excluded.failures, cooldown = excluded.cooldown, "
+                "error = excluded.error",
+                (entry.scope, entry.endpoint, entry.status, entry.checked_at, entry.skip_until,
+                 entry.failures, entry.cooldown, entry.error))
+
+    def entries(self) -> List[AccessEntry]:
+        with self._lock:
+            return sorted(self._entries.values(), key=lambda e: (e.scope, e.endpoint))
+
+    def reset(self, endpoint: Optional[str] = None) -> int:
+        """Esquece um endpoint (path relativo, em qualquer raiz) ou todos; devolve quantos"""
+        with self._lock:
+            keys = [key for key in self._entries if endpoint is None or key[1] == endpoint]
+            for key in keys:
+                del self._entries[key]
+                self._conn.execute("DELETE FROM access_map WHERE scope = ? AND endpoint = ?", key)
+            self._probing.difference_update(keys)
+        return len(keys)
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Mapa de acessibilidade dos endpoints Sienge")
+    parser.add_argument("--db", default=ACCESS_DB)
+    parser.add_argument("--reset", nargs="?", const="", metavar="ENDPOINT",
+                        help="Esquece um endpoint (ex. /v1/fixed-assets) ou todos")
+    args = parser.parse_args(argv)
+
+    with AccessMap(args.db) as access:
+        if args.reset is not None:
+            removed = access.reset(args.reset or None)
+            print(f"[OK] {removed} endpoint(s) removido(s) do mapa")
+            return 0
+        now = datetime.now()
+        for entry in access.entries():
+            blocked = "ignorado até " + entry.skip_until if entry.blocked(now) else "chamado"
+            print(f"{entry.scope:45} | {entry.endpoint:50} | {entry.status or '-':>4} | "
+                  f"{entry.state:15} | {blocked} | visto {entry.checked_at}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Extração de lançamentos contábeis em jobs por (empresa, período)
+
+/accountancy/entries/async não serve para extrair: no
+accountancy-entries-v1.yaml ele é o POST que *importa* lançamentos, e
+/async/status só informa o andamento dessa importação. A leitura continua
+sendo o GET paginado /accountancy/entries, que exige companyId e aceita
+startDate/endDate.
+
+O ano inteiro de uma empresa numa única varredura fica limitado a uma
+página por vez. Aqui o intervalo é dividido em janelas (um mês por padrão) e
+cada (empresa, janela) vira um job independente: todos entram no mesmo pool,
+com orçamento global de concorrência e o token bucket do cliente. Cada
+página é decodificada em streaming (json_stream) e só vai para o destino
+depois de lida inteira, então uma nova tentativa não duplica registros.
+
+O estado de cada job fica no banco de checkpoints: um job concluído não é
+refeito (a menos que a janela chegue até hoje, ou com --refresh) e um job que
+caiu continua do último offset confirmado, com novas tentativas e backoff.
+
+Uso:
+    python accountancy_jobs.py --start 2024-01-01 --end 2024-12-31 --output entries.jsonl
+    python accountancy_jobs.py --start 2024-01-01 --end 2024-12-31 --companies 1,2 --window-days 7
+    python accountancy_jobs.py --status
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import requests
+
+from checkpoints import CHECKPOINT_DB, CheckpointStore, endpoint_key
+from date_sharding import DateWindow, split_range
+from fanout import DEFAULT_CACHE_DIR, JsonlSink, ParentResolver
+from http_cache import HttpCache
+from json_stream import RecordStream
+from pagination import PAGE_SIZE, PageError, total_count
+from probe_engine import MAX_CONCURRENCY, TokenBucket
+
+ENTRIES_PATH = "/accountancy/entries"
+PARENT_PARAM = "companyId"
+WINDOW_DAYS = 31
+
+MAX_ATTEMPTS = 4
+RETRY_DELAY = 1.0
+MAX_RETRY_DELAY = 30.0
+
+
+@dataclass(frozen=True)
+class LedgerJob:
+    """Lançamentos de uma empresa numa janela de datas"""
+    company_id: Any
+    window: DateWindow
+
+    @property
+    def key(self) -> str:
+        """Chave do job no banco de checkpoints"""
+        return (f"{endpoint_key(ENTRIES_PATH)}?{PARENT_PARAM}={self.company_id}"
+                f"&startDate={self.window.start.isoformat()}&endDate={self.window.end.isoformat()}")
+
+    def params(self) -> Dict[str, Any]:
+        return {PARENT_PARAM: self.company_id, **self.window.params("startDate", "endDate")}
+
+
+@dataclass
+class JobResult:
+    job: LedgerJob
+    records: int = 0
+    pages: int = 0
+    attempts: int = 0
+    seconds: float = 0.0
+    skipped: bool = False
+    error: Optional[str] = None
+
+
+@dataclass
+class JobsReport:
+    companies: int
+    windows: int
+    seconds: float
+    results: List[JobResult] = field(default_factory=list)
+
+    @property
+    def records(self) -> int:
+        return sum(result.records for result in self.results if not result.skipped)
+
+    @property
+    def failed(self) -> List[JobResult]:
+        return [result for result in self.results if result.error]
+
+    @property
+    def skipped(self) -> int:
+        return sum(1 for result in self.results if result.skipped)
+
+
+def plan_jobs(company_ids: List[Any], start: date, end: date,
+              window_days: int = WINDOW_DAYS) -> List[LedgerJob]:
+    """
+    Jobs em ordem de janela e depois de empresa, para que as janelas de uma
+    mesma empresa não se concentrem no fim da fila
+    """
+    windows = split_range(start, end, window_days)
+    return [LedgerJob(company_id, window) for window in windows for company_id in company_ids]
+
+
+def backoff(attempt: int, base: float = RETRY_DELAY, cap: float = MAX_RETRY_DELAY) -> float:
+    """Espera exponencial com jitter antes da tentativa seguinte"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def stream_page(client, params: Dict[str, Any], offset: int,
+                limit: int) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+    """Decodifica uma página em streaming; devolve (registros, total)"""
+    query = {**params, "limit": limit, "offset": offset}
+    with client.stream("GET", ENTRIES_PATH, params=query) as response:
+        if response.status_code != 200:
+            raise PageError(response.url, response.status_code,
+                            response.read().decode("utf-8", "replace"))
+        stream = RecordStream(response.iter_bytes())
+        records = [{**record, PARENT_PARAM: params[PARENT_PARAM]}
+                   if isinstance(record, dict) and PARENT_PARAM not in record else record
+                   for record in stream]
+        return records, total_count(stream.result_set_metadata)
+
+
+class LedgerJobs:
+    """Executa os jobs (empresa, janela) num pool com orçamento global"""
+
+    def __init__(self, client, store: CheckpointStore, concurrency: int = MAX_CONCURRENCY,
+                 max_attempts: int = MAX_ATTEMPTS, page_size: int = PAGE_SIZE):
+        self.client = client
+        self.store = store
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.page_size = page_size
+        self.parents = ParentResolver(client)
+
+    def _run(self, job: LedgerJob, sink: Callable[[Dict[str, Any]], None],
+             refresh: bool) -> JobResult:
+        result = JobResult(job)
+        checkpoint = self.store.get(job.key)
+        # Janelas que chegam até hoje ainda recebem lançamentos: sempre refeitas
+        final = job.window.end < date.today()
+        if checkpoint is not None and not checkpoint.running and final and not refresh:
+            result.skipped, result.records = True, checkpoint.records
+            return result
+
+        start = time.perf_counter()
+        while True:
+            result.attempts += 1
+            checkpoint = self.store.get(job.key)
+            if checkpoint is not None and checkpoint.running:
+                offset, emitted = checkpoint.next_offset, checkpoint.records
+            else:
+                self.store.begin(job.key, job.window.start.isoformat(), job.window.end.isoformat())
+                offset = emitted = 0
+            try:
+                while True:
+                    records, count = stream_page(self.client, job.params(), offset, self.page_size)
+                    # Página completa: uma queda no meio do corpo não deixa registros no destino
+                    for record in records:
+                        sink(record)
+                    received = len(records)
+                    offset += received
+                    emitted += received
+                    result.records += received
+                    result.pages += 1
+                    self.store.advance(job.key, offset, emitted)
+                    done = offset >= count if count is not None else received != self.page_size
+                    if done or not received:
+                        break
+                self.store.complete(job.key, job.window.end.isoformat())
+                result.error = None
+                break
+            except (PageError, requests.RequestException, ValueError) as e:
+                # O checkpoint ficou na última página confirmada: a nova tentativa continua dali
+                result.error = f"{type(e).__name__}: {e}"[:300]
+                retryable = not isinstance(e, PageError) or e.status_code >= 500 \
+                    or e.status_code == 429
+                if not retryable or result.attempts >= self.max_attempts:
+                    break
+                time.sleep(backoff(result.attempts - 1))
+        result.seconds = time.perf_counter() - start
+        return result
+
+    def run(self, start: date, end: date, sink: Callable[[Dict[str, Any]], None],
+            company_ids: Optional[List[Any]] = None, window_days: int = WINDOW_DAYS,
+            refresh: bool = False,
+            on_job: Optional[Callable[[JobResult], None]] = None) -> JobsReport:
+        """Extrai [start, end] para todas as empresas (ou company_ids)"""
+        ids = company_ids if company_ids is not None else self.parents.ids(PARENT_PARAM)
+        jobs = plan_jobs(ids, start, end, window_days)
+        report = JobsReport(len(ids), len(jobs) // max(len(ids), 1), 0.0)
+        began = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            futures = [executor.submit(self._run, job, sink, refresh) for job in jobs]
+            for future in as_completed(futures):
+                result = future.result()
+                report.results.append(result)
+                if on_job:
+                    on_job(result)
+        report.results.sort(key=lambda result: (str(result.job.company_id), result.job.window.start))
+        report.seconds = time.perf_counter() - began
+        return report
+
+
+def print_job(result: JobResult):
+    if result.skipped:
+        symbol = "[SKIP]"
+    else:
+        symbol = "[ERRO]" if result.error else "[OK]"
+    retries = f" | {result.attempts} tentativas" if result.attempts > 1 else ""
+    print(f"{symbol:7} empresa {str(result.job.company_id):>6} | {result.job.window} | "
+          f"{result.records:7} lançamentos | {result.seconds:6.2f}s{retries}"
+          + (f" | {result.error}" if result.error else ""))
+
+
+def main(argv=None) -> int:
+    from sienge_client import SiengeClient
+
+    parser = argparse.ArgumentParser(description="Lançamentos contábeis em jobs por empresa e período")
+    parser.add_argument("--start", help="Data inicial dos lançamentos (yyyy-MM-dd)")
+    parser.add_argument("--end", help="Data final (padrão: hoje)")
+    parser.add_argument("--companies", help="Ids de empresa separados por vírgula (padrão: todas)")
+    parser.add_argument("--window-days", type=int, default=WINDOW_DAYS,
+                        help="Dias por job")
+    parser.add_argument("--concurrency", type=int, default=MAX_CONCURRENCY,
+                        help="Jobs simultâneos (orçamento global)")
+    parser.add_argument("--refresh", action="store_true", help="Refaz jobs já concluídos")
+    parser.add_argument("--output", help="Arquivo JSONL (acrescenta ao existente)")
+    parser.add_argument("--db", default=CHECKPOINT_DB)
+    parser.add_argument("--tenant", default=os.getenv("SIENGE_SUBDOMAIN", "abf"))
+    parser.add_argument("--status", action="store_true", help="Mostra o estado dos jobs")
+    args = parser.parse_args(argv)
+
+    with CheckpointStore(args.db, args.tenant) as store:
+        if args.status:
+            prefix = f"{endpoint_key(ENTRIES_PATH)}?{PARENT_PARAM}="
+            for cp in store.all():
+                if cp.endpoint.startswith(prefix) and "&startDate=" in cp.endpoint:
+                    print(f"empresa {cp.endpoint[len(prefix):].split('&')[0]:>6} | "
+                          f"{cp.window_start}..{cp.window_end} | {cp.status:7} | "
+                          f"offset {cp.next_offset:6} | {cp.records:7} lançamentos")
+            return 0
+        if not args.start:
+            parser.error("informe --start (ou --status)")
+
+        client = SiengeClient.from_env(args.tenant, pool_size=args.concurrency,
+                                       rate_limiter=TokenBucket(),
+                                       cache=HttpCache.from_env() or HttpCache(DEFAULT_CACHE_DIR))
+        sink = JsonlSink(args.output)
+        companies = [item.strip() for item in args.companies.split(",")] \
+            if args.companies else None
+        try:
+            report = LedgerJobs(client, store, args.concurrency).run(
+                date.fromisoformat(args.start),
+                date.fromisoformat(args.end) if args.end else date.today(),
+                sink, companies, args.window_days, args.refresh, on_job=print_job)
+        except (ValueError, PageError, requests.RequestException) as e:
+            print(f"[ERRO] {e}")
+            return 1
+        finally:
+            sink.close()
+            client.close()
+
+    failed = report.failed
+    print(f"\n{ENTRIES_PATH}: {report.companies} empresa(s) x {report.windows} janela(s) | "
+          f"{report.records} lançamentos em {report.seconds:.1f}s | "
+          f"{report.skipped} job(s) já concluído(s) | concorrência {args.concurrency}")
+    if failed:
+        print(f"[AVISO] {len(failed)} job(s) com falha, retomados do último offset confirmado "
+              f"na próxima execução")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+"""
+Benchmarks de throughput e latência dos caminhos de sondagem e extração
+
+Sobe o mock_server.py em um processo separado (para não disputar a GIL com o
+cliente) e mede sondagens de página única, paginação completa, extração
+fatiada por datas, decodificação JSON e mapeamento compilado dos registros.
+Reporta páginas/s, registros/s, latências p50/p95/p99 e pico de RSS, e
+salva/compara baselines em JSON.
+
+Uso:
+    python benchmarks.py --save-baseline benchmark_baseline.json
+    python benchmarks.py --compare benchmark_baseline.json --tolerance 0.15
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from date_sharding import DateShardPlanner
+from mock_server import MockConfig
+from pagination import fetch_all
+from probe_engine import TokenBucket, probe_all
+from sienge_client import SiengeClient
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+HERE = Path(__file__).resolve().parent
+
+# Endpoints usados na sondagem de página única (mesma forma do test_all_sienge_endpoints)
+PROBE_ENDPOINTS = [
+    ("/customers", {"limit": 5, "offset": 0}, False),
+    ("/companies", {"limit": 5, "offset": 0}, False),
+    ("/enterprises", {"limit": 5, "offset": 0}, False),
+    ("/units", {"limit": 5, "offset": 0}, False),
+    ("/sales-contracts", {"limit": 5, "offset": 0}, False),
+    ("/creditors", {"limit": 5, "offset": 0}, False),
+    ("/customer-types", {"limit": 5, "offset": 0}, False),
+    ("/indexers", {"limit": 5, "offset": 0}, False),
+    ("/cost-centers", {"limit": 5, "offset": 0}, False),
+    ("/bills", {"startDate": "2024-01-01", "endDate": "2024-01-31", "limit": 5, "offset": 0}, False),
+    ("/accounts-statements", {"startDate": "2024-01-01", "endDate": "2024-01-31", "limit": 5, "offset": 0}, False),
+    ("/accounts-balances", {"balanceDate": "2024-01-31", "limit": 5, "offset": 0}, False),
+]
+
+
+@dataclass
+class BenchResult:
+    """Resultado de uma execução de benchmark"""
+    name: str
+    seconds: float = 0.0
+    requests: int = 0
+    pages: int = 0
+    records: int = 0
+    peak_rss_mb: Optional[float] = None
+    latencies: List[float] = field(default_factory=list, repr=False)
+
+    def summary(self) -> Dict[str, Any]:
+        seconds = self.seconds or 1e-9
+        return {
+            "name": self.name,
+            "seconds": round(self.seconds, 4),
+            "requests": self.requests,
+            "pages": self.pages,
+            "records": self.records,
+            "pages_per_sec": round(self.pages / seconds, 2),
+            "records_per_sec": round(self.records / seconds, 2),
+            "p50_ms": round(percentile(self.latencies, 50) * 1000, 2),
+            "p95_ms": round(percentile(self.latencies, 95) * 1000, 2),
+            "p99_ms": round(percentile(self.latencies, 99) * 1000, 2),
+            "peak_rss_mb": self.peak_rss_mb,
+        }
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Percentil por interpolação linear (0 para lista vazia)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def current_rss_mb() -> Optional[float]:
+    """RSS atual do processo em MB"""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss / 1024 / 1024
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError, AttributeError):
+        pass
+    if resource is not None:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return None
+
+
+class RssSampler:
+    """Amostra o RSS em uma thread de fundo e guarda o pico"""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.peak: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            rss = current_rss_mb()
+            if rss is not None and (self.peak is None or rss > self.peak):
+                self.peak = rss
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+class RecordingClient:
+    """Repassa chamadas ao SiengeClient registrando latência e contagem de páginas"""
+
+    def __init__(self, client: SiengeClient):
+        self.client = client
+        self.latencies: List[float] = []
+        self._lock = threading.Lock()
+
+    def get(self, path, params=None, **kwargs):
+        response = self.client.get(path, params=params, **kwargs)
+        with self._lock:
+            self.latencies.append(response.timings["total"])
+        return response
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+
+class MockProcess:
+    """mock_server.py em um subprocesso, numa porta livre"""
+
+    def __init__(self, config: MockConfig):
+        self.config = config
+        self.process: Optional[subprocess.Popen] = None
+        self.base_url = ""
+
+    def __enter__(self) -> "MockProcess":
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        self._config_file = tempfile.NamedTemporaryFile("w", suffix=".json", delete=False)
+        json.dump(asdict(self.config), self._config_file)
+        self._config_file.close()
+
+        self.process = subprocess.Popen(
+            [sys.executable, str(HERE / "mock_server.py"), "--port", str(port),
+             "--config", self._config_file.name],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, cwd=str(HERE))
+        self.base_url = f"http://127.0.0.1:{port}/abf/public/api"
+
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            try:
+                with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                    return self
+            except OSError:
+                time.sleep(0.05)
+        self.__exit__()
+        raise RuntimeError("mock_server.py não respondeu em 30s")
+
+    def __exit__(self, *exc):
+        if self.process is not None:
+            self.process.terminate()
+            self.process.wait(timeout=10)
+        os.unlink(self._config_file.name)
+
+
+def bench_probe(client: SiengeClient, args) -> BenchResult:
+    """Sondagens de página única em paralelo, como no test_all_sienge_endpoints"""
+    recorder = RecordingClient(client)
+    jobs = PROBE_ENDPOINTS * args.probe_rounds
+    result = BenchResult("probe")
+    start = time.perf_counter()
+    responses = probe_all(jobs, lambda job: recorder.get(job[0], params=job[1], bulk=job[2]),
+                          bucket=TokenBucket(rate_per_minute=600_000, burst=len(jobs)))
+    result.seconds = time.perf_counter() - start
+    for response in responses:
+        data = response.json()
+        result.records += len(data.get("results", [])) if isinstance(data, dict) else len(data)
+    result.requests = result.pages = len(responses)
+    result.latencies = recorder.latencies
+    return result
+
+
+def bench_pagination(client: SiengeClient, args) -> BenchResult:
+    """Extração completa de /customers via pagination.iter_records"""
+    recorder = RecordingClient(client)
+    result = BenchResult("pagination")
+    start = time.perf_counter()
+    records = fetch_all(recorder, "/customers", window=args.window)
+    result.seconds = time.perf_counter() - start
+    result.records = len(records)
+    result.requests = result.pages = len(recorder.latencies)
+    result.latencies = recorder.latencies
+    return result
+
+
+def bench_sharding(client: SiengeClient, args) -> BenchResult:
+    """Extração de um ano de /bills fatiada por janelas de datas"""
+    recorder = RecordingClient(client)
+    planner = DateShardPlanner(recorder, "/bills", max_records=args.shard_records)
+    result = BenchResult("sharding")
+    start = time.perf_counter()
+    records = list(planner.extract("2024-01-01", "2024-12-31"))
+    result.seconds = time.perf_counter() - start
+    result.records = len(records)
+    result.requests = result.pages = len(recorder.latencies)
+    result.latencies = recorder.latencies
+    return result
+
+
+def bench_decode(client: SiengeClient, args) -> BenchResult:
+    """Decodificação JSON de uma página cheia, isolada da rede"""
+    payload = client.get("/customers", params={"limit": 200, "offset": 0}).content
+    result = BenchResult("decode")
+    start = time.perf_counter()
+    for _ in range(args.decode_rounds):
+        t0 = time.perf_counter()
+        data = json.loads(payload)
+        result.latencies.append(time.perf_counter() - t0)
+        result.records += len(data["results"])
+    result.seconds = time.perf_counter() - start
+    result.pages = args.decode_rounds
+    return result
+
+
+def bench_mapping(client: SiengeClient, args) -> BenchResult:
+    """Mapeamento compilado (ENDPOINT_MAPPINGS) de uma página cheia, isolado da rede"""
+    from endpoint_mappings import load_mappings
+    from mapping_engine import CompiledMapping
+
+    items = client.get("/customers", params={"limit": 200, "offset": 0}).json()["results"]
+    compiled = CompiledMapping(load_mappings()["customers"])
+    result = BenchResult("mapping")
+    start = time.perf_counter()
+    for _ in range(args.decode_rounds):
+        t0 = time.perf_counter()
+        compiled.rows(items)
+        result.latencies.append(time.perf_counter() - t0)
+        result.records += len(items)
+    result.seconds = time.perf_counter() - start
+    result.pages = args.decode_rounds
+    return result
+
+
+BENCHMARKS: Dict[str, Callable[[SiengeClient, Any], BenchResult]] = {
+    "probe": bench_probe,
+    "pagination": bench_pagination,
+    "sharding": bench_sharding,
+    "decode": bench_decode,
+    "mapping": bench_mapping,
+}
+
+
+def run_benchmark(name: str, base_url: str, args) -> Dict[str, Any]:
+    """Executa um benchmark `repeat` vezes e fica com a execução mediana
+
+    As execuções de aquecimento não entram no resultado: elas preenchem o cache
+    de registros do mock, para que o tempo medido seja o do cliente.
+    """
+    runs = []
+    for attempt in range(args.warmup + args.repeat):
+        with SiengeClient("abf", "bench", "bench", base_url=base_url,
+                          pool_size=max(args.window, 8)) as client:
+            with RssSampler() as sampler:
+                result = BENCHMARKS[name](client, args)
+            if attempt < args.warmup:
+                continue
+            result.peak_rss_mb = round(sampler.peak, 1) if sampler.peak is not None else None
+            runs.append(result.summary())
+    runs.sort(key=lambda r: r["seconds"])
+    chosen = dict(runs[len(runs) // 2])
+    chosen["runs_seconds"] = [r["seconds"] for r in runs]
+    return chosen
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Lista as regressões de throughput e p95 além da tolerância"""
+    regressions = []
+    for name, result in current["benchmarks"].items():
+        base = baseline.get("benchmarks", {}).get(name)
+        if not base:
+            continue
+        if base["records_per_sec"] and result["records_per_sec"] < base["records_per_sec"] * (1 - tolerance):
+            regressions.append(f"{name}: records/s {result['records_per_sec']} < baseline {base['records_per_sec']}")
+        if base["p95_ms"] and result["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {result['p95_ms']}ms > baseline {base['p95_ms']}ms")
+    return regressions
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmarks do cliente Sienge contra o mock local")
+    parser.add_argument("--only", help="Benchmarks separados por vírgula (padrão: todos)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--warmup", type=int, default=1, help="Execuções descartadas antes das medidas")
+    parser.add_argument("--records", type=int, default=5000, help="Registros por endpoint no mock")
+    parser.add_argument("--latency", default="fixed:0.02", help="Latência do mock (ver mock_server.py)")
+    parser.add_argument("--window", type=int, default=4, help="Páginas em voo na paginação")
+    parser.add_argument("--probe-rounds", type=int, default=5)
+    parser.add_argument("--shard-records", type=int, default=1000)
+    parser.add_argument("--decode-rounds", type=int, default=50)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--save-baseline", help="Grava o resultado também como baseline")
+    parser.add_argument("--compare", help="Baseline para detectar regressões")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    names = [n.strip() for n in args.only.split(",")] if args.only else list(BENCHMARKS)
+
+    print("=" * 80)
+    print("BENCHMARKS DO CLIENTE SIENGE (MOCK LOCAL)")
+    print("=" * 80)
+    print(f"Registros por endpoint: {args.records} | Latência: {args.latency} | Repetições: {args.repeat}")
+    print("-" * 80)
+
+    config = MockConfig(records=args.records, latency=args.latency,
+                        date_start="2023-01-01", date_end="2025-12-31")
+    output = {
+        "timestamp": datetime.now().isoformat(),
+        "python": sys.version.split()[0],
+        "config": {k: v for k, v in vars(args).items()
+                   if k not in ("output", "save_baseline", "compare")},
+        "benchmarks": {},
+    }
+    with MockProcess(config) as mock:
+        for name in names:
+            summary = run_benchmark(name, mock.base_url, args)
+            output["benchmarks"][name] = summary
+            print(f"{name:12} | {summary['pages_per_sec']:9.1f} pág/s | {summary['records_per_sec']:11.1f} reg/s | "
+                  f"p50 {summary['p50_ms']:7.1f}ms | p95 {summary['p95_ms']:7.1f}ms | "
+                  f"p99 {summary['p99_ms']:7.1f}ms | RSS {summary['peak_rss_mb']}MB")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(output, f, indent=2, ensure_ascii=False)
+    print(f"\nResultados salvos em: {args.output}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(output, f, indent=2, ensure_ascii=False)
+        print(f"Baseline salva em: {args.save_baseline}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(output, baseline, args.tolerance)
+        if regressions:
+            print(f"\nREGRESSÕES (tolerância {args.tolerance:.0%}):")
+            for line in regressions:
+                print(f"  [REGRESSÃO] {line}")
+            return 1
+        print(f"\nSem regressões em relação a {args.compare}")
+    print("=" * 80)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Análise local de /bills em tabela colunar (Arrow)
+
+Em vez de uma chamada a /bills por período, status e origem, puxa uma vez
+todos os títulos do intervalo que cobre os períodos pedidos e calcula
+contagens, somas e distribuições de valor com group-bys vetorizados do
+pyarrow.compute. Os períodos viram máscaras sobre a mesma tabela.
+
+Requer pyarrow (pip install pyarrow).
+
+Uso:
+    python bills_analysis.py --start 2024-01-01 --end 2024-12-31
+    python bills_analysis.py --start 2024-01-01 --end 2024-12-31 --by creditorId --top 20
+    python test_bills_endpoint.py --analyze
+"""
+
+import argparse
+import sys
+import time
+from datetime import date
+from typing import Any, Dict, Iterable, Optional, Sequence, Tuple
+
+from pagination import iter_records
+from profiling import phase
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    HAS_PYARROW = True
+except ImportError:
+    pa = pc = None
+    HAS_PYARROW = False
+
+AMOUNT = "totalInvoiceAmount"
+# Dimensões padrão do relatório (month é derivada de issueDate)
+DIMENSIONS = ("status", "originId", "creditorId", "month")
+QUANTILES = (0.5, 0.9, 0.99)
+
+STATUS_NAMES = {"S": "Completo", "N": "Incompleto", "I": "Em inclusão"}
+ORIGIN_NAMES = {"AC": "Administração de Compras", "CP": "Contas a Pagar",
+                "SE": "Sistemas Externos"}
+
+
+def _require_pyarrow():
+    if not HAS_PYARROW:
+        raise RuntimeError("pyarrow não instalado (pip install pyarrow)")
+
+
+def bill_schema() -> "pa.Schema":
+    """Colunas do Bill (bill-debt-v1.yaml) usadas na análise"""
+    return pa.schema([
+        ("id", pa.int64()),
+        ("debtorId", pa.int64()),
+        ("creditorId", pa.int64()),
+        ("documentIdentificationId", pa.string()),
+        ("issueDate", pa.string()),
+        ("installmentsNumber", pa.int64()),
+        (AMOUNT, pa.float64()),
+        ("discount", pa.float64()),
+        ("status", pa.string()),
+        ("originId", pa.string()),
+    ])
+
+
+def bills_table(records: Iterable[Dict[str, Any]]) -> "pa.Table":
+    """
+    Tabela colunar dos títulos: issueDate vira date32, a coluna month (yyyy-MM)
+    é derivada dela e os códigos repetitivos ficam dictionary-encoded
+    """
+    _require_pyarrow()
+    with phase("transform"):
+        table = pa.Table.from_pylist(list(records), schema=bill_schema())
+        issued = pc.strptime(pc.utf8_slice_codeunits(table["issueDate"], 0, 10),
+                             format="%Y-%m-%d", unit="s", error_is_null=True)
+        table = table.set_column(table.schema.get_field_index("issueDate"), "issueDate",
+                                 pc.cast(issued, pa.date32()))
+        table = table.append_column("month", pc.strftime(issued, format="%Y-%m"))
+        for name in ("status", "originId", "documentIdentificationId"):
+            index = table.schema.get_field_index(name)
+            table = table.set_column(index, name, pc.dictionary_encode(table[name]))
+    return table
+
+
+def fetch_bills(client, start: str, end: str,
+                params: Optional[Dict[str, Any]] = None) -> "pa.Table":
+    """Todos os títulos emitidos entre start e end, numa única varredura paginada"""
+    query = {"startDate": start, "endDate": end, **(params or {})}
+    return bills_table(iter_records(client, "/bills", query))
+
+
+def between(table: "pa.Table", start: str, end: str) -> "pa.Table":
+    """Títulos com issueDate em [start, end]"""
+    issued = table["issueDate"]
+    mask = pc.and_(pc.greater_equal(issued, pa.scalar(date.fromisoformat(start))),
+                   pc.less_equal(issued, pa.scalar(date.fromisoformat(end))))
+    return table.filter(mask)
+
+
+def summarize(table: "pa.Table", by: Sequence[str],
+              quantiles: Sequence[float] = QUANTILES) -> "pa.Table":
+    """Contagem, soma, média e quantis de valor por grupo (meses em ordem, demais por soma)"""
+    grouped = table.group_by(list(by)).aggregate([
+        ("id", "count"),
+        (AMOUNT, "sum"),
+        (AMOUNT, "mean"),
+        (AMOUNT, "min"),
+        (AMOUNT, "max"),
+        (AMOUNT, "tdigest", pc.TDigestOptions(q=list(quantiles))),
+    ])
+    if list(by) == ["month"]:
+        return grouped.sort_by([("month", "ascending")])
+    return grouped.sort_by([(f"{AMOUNT}_sum", "descending")])
+
+
+def totals(table: "pa.Table") -> Dict[str, Any]:
+    """Totais da tabela inteira (mesmas medidas de summarize)"""
+    amount = table[AMOUNT]
+    return {
+        "count": table.num_rows,
+        "sum": pc.sum(amount).as_py() or 0.0,
+        "mean": pc.mean(amount).as_py(),
+        "quantiles": pc.tdigest(amount, q=list(QUANTILES)).to_pylist(),
+    }
+
+
+def label(dimension: str, value: Any) -> str:
+    names = {"status": STATUS_NAMES, "originId": ORIGIN_NAMES}.get(dimension, {})
+    if value is None:
+        return "(vazio)"
+    return f"{value} - {names[value]}" if value in names else str(value)
+
+
+def print_summary(summary: "pa.Table", dimension: str, top: Optional[int] = None):
+    rows = summary.to_pylist()
+    shown = rows[:top] if top else rows
+    print(f"\nPor {dimension} ({len(rows)} grupo(s)):")
+    for row in shown:
+        quantiles = row[f"{AMOUNT}_tdigest"] or []
+        spread = " / ".join(f"{q:,.2f}" for q in quantiles if q is not None)
+        total, mean = row[f"{AMOUNT}_sum"] or 0, row[f"{AMOUNT}_mean"] or 0
+        print(f"  {label(dimension, row[dimension]):40} | {row['id_count']:7} títulos | "
+              f"soma {total:16,.2f} | média {mean:12,.2f} | p50/p90/p99 {spread or '-'}")
+    if top and len(rows) > top:
+        print(f"  ... mais {len(rows) - top} grupo(s)")
+
+
+def analyze(table: "pa.Table", periods: Sequence[Tuple[str, str, str]] = (),
+            dimensions: Sequence[str] = DIMENSIONS, top: Optional[int] = 10) -> float:
+    """Imprime os totais por período e os group-bys; devolve os segundos de cálculo"""
+    start = time.perf_counter()
+    with phase("transform"):
+        period_totals = [(name, totals(between(table, first, last)))
+                         for name, first, last in periods]
+        summaries = [(dimension, summarize(table, [dimension])) for dimension in dimensions]
+    elapsed = time.perf_counter() - start
+
+    overall = totals(table)
+    print(f"\nTítulos carregados: {overall['count']} | soma {overall['sum']:,.2f}")
+    for name, stats in period_totals:
+        print(f"  {name:30} | {stats['count']:7} títulos | soma {stats['sum']:16,.2f}")
+    for dimension, summary in summaries:
+        print_summary(summary, dimension, top if dimension == "creditorId" else None)
+    return elapsed
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Análise colunar local dos títulos a pagar")
+    parser.add_argument("--start", required=True, help="Data inicial de emissão (yyyy-MM-dd)")
+    parser.add_argument("--end", required=True, help="Data final de emissão (yyyy-MM-dd)")
+    parser.add_argument("--by", action="append", choices=DIMENSIONS,
+                        help="Dimensão do group-by (padrão: todas)")
+    parser.add_argument("--top", type=int, default=10, help="Credores mostrados")
+    parser.add_argument("--param", action="append", default=[], metavar="NOME=VALOR",
+                        help="Filtro repassado ao /bills (ex. debtorId=1)")
+    args = parser.parse_args(argv)
+    if not HAS_PYARROW:
+        print("[ERRO] pyarrow não instalado (pip install pyarrow)")
+        return 1
+
+    from sienge_client import SiengeClient
+    client = SiengeClient.from_env()
+    try:
+        start = time.perf_counter()
+        table = fetch_bills(client, args.start, args.end,
+                            dict(item.split("=", 1) for item in args.param))
+        fetched = time.perf_counter() - start
+    finally:
+        client.close()
+
+    elapsed = analyze(table, dimensions=args.by or DIMENSIONS, top=args.top)
+    print(f"\n[OK] {table.num_rows} títulos em {fetched:.2f}s (uma varredura) | "
+          f"agregações em {elapsed * 1000:.1f}ms | {table.nbytes / 1024:.0f} KiB em memória")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
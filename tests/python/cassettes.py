@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+Gravação e reprodução de requisições HTTP (cassetes) do cliente Sienge
+
+No modo record, cada par requisição/resposta que passa pelo SiengeClient
+(request e stream) é gravado num arquivo SQLite único: índice pelo hash da
+requisição normalizada e corpos comprimidos com zlib, guardados uma vez por
+conteúdo. No modo replay o cliente não abre conexão: a resposta sai do
+cassete na velocidade do disco, e uma requisição não gravada vira
+CassetteMiss (um ConnectionError, tratado pelos scripts como falha de rede).
+
+A chave usa o path a partir de /public/api (sem host nem subdomínio), os
+parâmetros ordenados e o corpo JSON canônico. Os scripts montam datas a
+partir de hoje (get_date_params), então o replay tenta primeiro a chave
+exata e, na falta dela, a mesma requisição com as datas trocadas por um
+marcador. Credenciais e headers da requisição nunca são gravados.
+
+Ativado no SiengeClient com cassette=Cassette(...) ou pelas variáveis de
+ambiente SIENGE_CASSETTE (arquivo) e SIENGE_CASSETTE_MODE (record ou
+replay, padrão replay); com as variáveis o resumo é impresso no fim do processo.
+
+Uso:
+    SIENGE_CASSETTE=cassettes/abf.db SIENGE_CASSETTE_MODE=record python test_all_sienge_endpoints.py
+    SIENGE_CASSETTE=cassettes/abf.db python test_all_sienge_endpoints.py
+    python cassettes.py cassettes/abf.db --list
+"""
+
+import argparse
+import atexit
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+import requests
+
+CASSETTE_ENV = "SIENGE_CASSETTE"
+CASSETTE_MODE_ENV = "SIENGE_CASSETTE_MODE"
+MODES = ("record", "replay")
+
+COMPRESSION_LEVEL = 6
+CHUNK_SIZE = 64 * 1024
+# Headers de transporte não fazem sentido num corpo já descomprimido
+DROPPED_HEADERS = ("content-encoding", "content-length", "transfer-encoding", "connection",
+                   "keep-alive", "set-cookie")
+
+_API_ROOT = "/public/api"
+_DATE_VALUE = re.compile(r"^\d{4}-\d{2}-\d{2}([T ][\d:.]+)?$|^\d{2}[-/]\d{4}$")
+DATE_PLACEHOLDER = "<data>"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS interactions (
+    key TEXT PRIMARY KEY,
+    loose_key TEXT NOT NULL,
+    method TEXT NOT NULL,
+    path TEXT NOT NULL,
+    params TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    headers TEXT NOT NULL,
+    body_hash TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    elapsed REAL NOT NULL,
+    recorded_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_interactions_loose ON interactions (loose_key, recorded_at);
+CREATE TABLE IF NOT EXISTS bodies (
+    hash TEXT PRIMARY KEY,
+    data BLOB NOT NULL
+);
+"""
+
+
+class CassetteMiss(requests.exceptions.ConnectionError):
+    """Requisição sem gravação no cassete (modo replay)"""
+
+
+@dataclass
+class Interaction:
+    """Resposta gravada"""
+    method: str
+    path: str
+    status: int
+    headers: Dict[str, str]
+    body: bytes
+    elapsed: float
+    recorded_at: str
+
+
+def api_path(url: str) -> Tuple[str, List[Tuple[str, str]]]:
+    """Path a partir da raiz da API e os parâmetros que vieram na própria URL"""
+    parts = urlsplit(url)
+    path = parts.path
+    root = path.find(_API_ROOT)
+    if root >= 0:
+        path = path[root + len(_API_ROOT):]
+    return path.rstrip("/") or "/", parse_qsl(parts.query, keep_blank_values=True)
+
+
+def normalized_request(method: str, url: str, params: Optional[Dict[str, Any]] = None,
+                       json_body: Any = None, loose: bool = False) -> str:
+    """Requisição em forma canônica; com loose=True as datas viram um marcador"""
+    path, query = api_path(url)
+    items = query + [(str(k), str(v)) for k, v in (params or {}).items() if v is not None]
+    if loose:
+        items = [(k, DATE_PLACEHOLDER if _DATE_VALUE.match(v) else v) for k, v in items]
+    body = json.dumps(json_body, sort_keys=True, separators=(",", ":")) \
+        if json_body is not None else None
+    return json.dumps([method.upper(), path, sorted(items), body], separators=(",", ":"))
+
+
+def request_key(method: str, url: str, params: Optional[Dict[str, Any]] = None,
+                json_body: Any = None, loose: bool = False) -> str:
+    raw = normalized_request(method, url, params, json_body, loose)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class Cassette:
+    """Arquivo de gravações, compartilhado entre threads"""
+
+    def __init__(self, path: str, mode: str = "replay"):
+        if mode not in MODES:
+            raise ValueError(f"modo de cassete inválido: {mode} (use {' ou '.join(MODES)})")
+        if mode == "replay" and not os.path.exists(path):
+            raise FileNotFoundError(f"cassete não encontrado: {path}")
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.mode = mode
+        self.stats = {"recorded": 0, "hits": 0, "loose_hits": 0, "misses": 0}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    @classmethod
+    def from_env(cls) -> Optional["Cassette"]:
+        """Cassete do processo quando SIENGE_CASSETTE está definida (resumo impresso no atexit)"""
+        global _env_cassette
+        path = os.environ.get(CASSETTE_ENV)
+        if not path:
+            return None
+        with _env_lock:
+            if _env_cassette is None or _env_cassette.path != path:
+                _env_cassette = cls(path, os.environ.get(CASSETTE_MODE_ENV, "replay"))
+                atexit.register(_env_cassette.print_summary)
+        return _env_cassette
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == "record"
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    def record(self, method: str, url: str, params: Optional[Dict[str, Any]], json_body: Any,
+               status: int, headers: Dict[str, str], body: bytes, elapsed: float):
+        """Grava (ou regrava) a resposta de uma requisição"""
+        body_hash = hashlib.sha256(body).hexdigest()
+        kept = {name.lower(): value for name, value in headers.items()
+                if name.lower() not in DROPPED_HEADERS}
+        path, query = api_path(url)
+        all_params = dict(query)
+        all_params.update({str(k): str(v) for k, v in (params or {}).items() if v is not None})
+        compressed = zlib.compress(body, COMPRESSION_LEVEL)
+        with self._lock:
+            self._conn.execute("INSERT OR IGNORE INTO bodies (hash, data) VALUES (?, ?)",
+                               (body_hash, compressed))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO interactions (key, loose_key, method, path, params, "
+                "status, headers, body_hash, size, elapsed, recorded_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (request_key(method, url, params, json_body),
+                 request_key(method, url, params, json_body, loose=True), method.upper(), path,
+                 json.dumps(all_params, sort_keys=True), status, json.dumps(kept), body_hash,
+                 len(body), elapsed, datetime.now().isoformat(timespec="seconds")))
+            self.stats["recorded"] += 1
+
+    def lookup(self, method: str, url: str, params: Optional[Dict[str, Any]] = None,
+               json_body: Any = None) -> Optional[Interaction]:
+        """Gravação da requisição: chave exata, senão a mais recente com as mesmas não-datas"""
+        columns = ("SELECT i.method, i.path, i.status, i.headers, b.data, i.elapsed, "
+                   "i.recorded_at FROM interactions i JOIN bodies b ON b.hash = i.body_hash ")
+        with self._lock:
+            row = self._conn.execute(columns + "WHERE i.key = ?",
+                                     (request_key(method, url, params, json_body),)).fetchone()
+            stat = "hits"
+            if row is None:
+                row = self._conn.execute(
+                    columns + "WHERE i.loose_key = ? ORDER BY i.recorded_at DESC LIMIT 1",
+                    (request_key(method, url, params, json_body, loose=True),)).fetchone()
+                stat = "loose_hits" if row is not None else "misses"
+            self.stats[stat] += 1
+        if row is None:
+            return None
+        return Interaction(row[0], row[1], row[2], json.loads(row[3]), zlib.decompress(row[4]),
+                           row[5], row[6])
+
+    def play(self, method: str, url: str, params: Optional[Dict[str, Any]] = None,
+             json_body: Any = None) -> Interaction:
+        """Como lookup, mas uma requisição não gravada levanta CassetteMiss"""
+        interaction = self.lookup(method, url, params, json_body)
+        if interaction is None:
+            raise CassetteMiss(f"sem gravação no cassete {self.path}: "
+                               f"{normalized_request(method, url, params, json_body)}")
+        return interaction
+
+    def interactions(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT method, path, params, status, size, elapsed, recorded_at "
+                "FROM interactions ORDER BY path, params").fetchall()
+        return [{"method": r[0], "path": r[1], "params": json.loads(r[2]), "status": r[3],
+                 "size": r[4], "elapsed": r[5], "recorded_at": r[6]} for r in rows]
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            entries, raw = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM interactions").fetchone()
+            stored = self._conn.execute(
+                "SELECT COALESCE(SUM(LENGTH(data)), 0) FROM bodies").fetchone()[0]
+        return {**self.stats, "mode": self.mode, "entries": entries,
+                "body_bytes": raw, "stored_bytes": stored}
+
+    def print_summary(self):
+        summary = self.summary()
+        if self.recording:
+            print(f"\nCassete {self.path}: {summary['recorded']} gravação(ões) nesta execução, "
+                  f"{summary['entries']} no total")
+        else:
+            print(f"\nCassete {self.path}: {summary['hits']} exatas, "
+                  f"{summary['loose_hits']} por datas equivalentes, {summary['misses']} sem gravação")
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+_env_cassette: Optional[Cassette] = None
+_env_lock = threading.Lock()
+
+
+def replay_chunks(body: bytes, chunk_size: Optional[int] = None) -> Iterator[bytes]:
+    """Corpo gravado em pedaços, como num stream da rede"""
+    size = chunk_size or CHUNK_SIZE
+    for start in range(0, len(body), size):
+        yield body[start:start + size]
+
+
+class StreamRecorder:
+    """Guarda os pedaços de um stream; a gravação só vale com o corpo inteiro"""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.complete = False
+        self.start = time.perf_counter()
+        self._source: Optional[Iterator[bytes]] = None
+
+    def wrap(self, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        self._source = iter(chunks)
+        for chunk in self._source:
+            self.chunks.append(chunk)
+            yield chunk
+        self.complete = True
+
+    def finish(self, open_chunks: Callable[[], Iterable[bytes]]):
+        """
+        Lê o que o consumidor deixou para trás: o parser de json_stream para no
+        fim do JSON sem pedir o último pedaço, e um corpo nunca lido é aberto aqui
+        """
+        if self._source is None:
+            for _ in open_chunks():
+                pass
+            return
+        for chunk in self._source:
+            self.chunks.append(chunk)
+        self.complete = True
+
+    @property
+    def body(self) -> bytes:
+        return b"".join(self.chunks)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Inspeciona um cassete de requisições Sienge")
+    parser.add_argument("path", nargs="?", default=os.environ.get(CASSETTE_ENV))
+    parser.add_argument("--list", action="store_true", help="Lista as requisições gravadas")
+    args = parser.parse_args(argv)
+    if not args.path:
+        parser.error(f"informe o arquivo ou defina {CASSETTE_ENV}")
+
+    try:
+        cassette = Cassette(args.path, "replay")
+    except FileNotFoundError as e:
+        print(f"[ERRO] {e}")
+        return 1
+    with cassette:
+        if args.list:
+            for item in cassette.interactions():
+                params = "&".join(f"{k}={v}" for k, v in item["params"].items())
+                print(f"{item['method']:6} {item['status']:3} | {item['path']}"
+                      f"{'?' + params if params else ''} | {item['size']} bytes | "
+                      f"{item['elapsed'] * 1000:.0f}ms | {item['recorded_at']}")
+        summary = cassette.summary()
+    ratio = summary["stored_bytes"] / summary["body_bytes"] if summary["body_bytes"] else 0
+    print(f"{summary['entries']} gravação(ões) | {summary['body_bytes'] / 1024:.0f} KiB de corpos, "
+          f"{summary['stored_bytes'] / 1024:.0f} KiB no disco ({ratio:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
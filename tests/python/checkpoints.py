@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+Extração incremental com checkpoints por endpoint (SQLite)
+
+Cada endpoint guarda uma marca d'água: a última data final processada, o
+offset da janela em andamento e a maior data de alteração/criação vista. Uma
+nova execução busca só o delta desde a marca e, se a anterior caiu no meio,
+retoma a mesma janela a partir do último offset confirmado.
+
+Uso:
+    python checkpoints.py /bills --output bills.jsonl
+    python checkpoints.py /sales --bulk --param enterpriseId=1 --param situation=SOLD
+    python checkpoints.py --status
+    python checkpoints.py /bills --reset
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from date_sharding import DATE_PARAMS
+from openapi_specs import BASE_BULK, BASE_V1
+from pagination import PAGE_SIZE, PageError, extract_page, fetch_page, total_count
+from profiling import add_profile_argument, profile_session, wrap
+from run_history import RunHistory, Sample, print_findings
+
+CHECKPOINT_DB = os.getenv("SIENGE_CHECKPOINT_DB", "sienge_checkpoints.db")
+
+# Mesma janela inicial de get_date_params() nos scripts de teste
+INITIAL_LOOKBACK_DAYS = 30
+# Dias reprocessados antes da marca, para pegar alterações do último dia
+OVERLAP_DAYS = 1
+
+# Filtros de alteração/criação (yyyy-MM-dd), que têm prioridade sobre DATE_PARAMS
+CHANGE_PARAMS = {
+    "/customers": ("modifiedAfter", "modifiedBefore"),
+    "/sales-contracts": ("modifiedAfter", "modifiedBefore"),
+    "/bills/by-change-date": ("startDate", "endDate"),
+}
+
+# Campo do registro com a data de alteração/criação, quando existe
+RECORD_DATE_FIELDS = {
+    "/customers": "modifiedAt",
+    "/bills": "changedDate",
+    "/bills/by-change-date": "changedDate",
+    "/sales": "creationDate",
+}
+
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    tenant TEXT NOT NULL,
+    endpoint TEXT NOT NULL,
+    status TEXT NOT NULL,
+    window_start TEXT,
+    window_end TEXT,
+    next_offset INTEGER NOT NULL DEFAULT 0,
+    watermark TEXT,
+    last_modified TEXT,
+    records INTEGER NOT NULL DEFAULT 0,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (tenant, endpoint)
+)
+"""
+
+
+@dataclass
+class Checkpoint:
+    """Estado salvo de um endpoint"""
+    endpoint: str
+    status: str
+    window_start: Optional[str]
+    window_end: Optional[str]
+    next_offset: int
+    watermark: Optional[str]
+    last_modified: Optional[str]
+    records: int
+    updated_at: str
+
+    @property
+    def running(self) -> bool:
+        return self.status == STATUS_RUNNING
+
+
+def endpoint_key(path: str, bulk: bool = False) -> str:
+    """Chave do endpoint no banco, separando v1 de bulk-data"""
+    return f"{BASE_BULK if bulk else BASE_V1}{path}"
+
+
+def incremental_params(path: str) -> Optional[Tuple[str, str]]:
+    """Par de parâmetros (início, fim) usado para buscar só o delta"""
+    return CHANGE_PARAMS.get(path) or DATE_PARAMS.get(path)
+
+
+class CheckpointStore:
+    """Marcas d'água por (tenant, endpoint) em um arquivo SQLite"""
+
+    def __init__(self, path: str = CHECKPOINT_DB, tenant: str = "default"):
+        self.path = path
+        self.tenant = tenant
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(SCHEMA)
+
+    def _now(self) -> str:
+        return datetime.now().isoformat(timespec="seconds")
+
+    def get(self, endpoint: str) -> Optional[Checkpoint]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT endpoint, status, window_start, window_end, next_offset, watermark, "
+                "last_modified, records, updated_at FROM checkpoints "
+                "WHERE tenant = ? AND endpoint = ?", (self.tenant, endpoint)).fetchone()
+        return Checkpoint(*row) if row else None
+
+    def all(self) -> List[Checkpoint]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT endpoint, status, window_start, window_end, next_offset, watermark, "
+                "last_modified, records, updated_at FROM checkpoints "
+                "WHERE tenant = ? ORDER BY endpoint", (self.tenant,)).fetchall()
+        return [Checkpoint(*row) for row in rows]
+
+    def begin(self, endpoint: str, window_start: Optional[str], window_end: Optional[str]):
+        """Abre uma janela nova (offset 0), preservando a marca anterior"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO checkpoints (tenant, endpoint, status, window_start, window_end, "
+                "next_offset, records, updated_at) VALUES (?, ?, ?, ?, ?, 0, 0, ?) "
+                "ON CONFLICT (tenant, endpoint) DO UPDATE SET status = excluded.status, "
+                "window_start = excluded.window_start, window_end = excluded.window_end, "
+                "next_offset = 0, records = 0, updated_at = excluded.updated_at",
+                (self.tenant, endpoint, STATUS_RUNNING, window_start, window_end, self._now()))
+
+    def advance(self, endpoint: str, next_offset: int, records: int,
+                last_modified: Optional[str] = None):
+        """Confirma uma página já entregue ao consumidor"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE checkpoints SET next_offset = ?, records = ?, "
+                "last_modified = MAX(COALESCE(last_modified, ''), COALESCE(?, '')), "
+                "updated_at = ? WHERE tenant = ? AND endpoint = ?",
+                (next_offset, records, last_modified, self._now(), self.tenant, endpoint))
+
+    def complete(self, endpoint: str, watermark: Optional[str]):
+        """Fecha a janela e move a marca d'água para o fim dela"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE checkpoints SET status = ?, watermark = COALESCE(?, watermark), "
+                "updated_at = ? WHERE tenant = ? AND endpoint = ?",
+                (STATUS_DONE, watermark, self._now(), self.tenant, endpoint))
+
+    def reset(self, endpoint: Optional[str] = None):
+        """Apaga o checkpoint de um endpoint (ou de todos do tenant)"""
+        with self._lock:
+            if endpoint is None:
+                self._conn.execute("DELETE FROM checkpoints WHERE tenant = ?", (self.tenant,))
+            else:
+                self._conn.execute("DELETE FROM checkpoints WHERE tenant = ? AND endpoint = ?",
+                                   (self.tenant, endpoint))
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def next_window(checkpoint: Optional[Checkpoint], until: date,
+                initial_start: Optional[date] = None,
+                overlap_days: int = OVERLAP_DAYS) -> Tuple[date, date]:
+    """Janela do delta: da marca d'água (menos a sobreposição) até `until`"""
+    if checkpoint is not None and checkpoint.watermark:
+        start = date.fromisoformat(checkpoint.watermark) - timedelta(days=overlap_days - 1)
+    else:
+        start = initial_start or until - timedelta(days=INITIAL_LOOKBACK_DAYS)
+    return min(start, until), until
+
+
+def incremental_records(client, store: CheckpointStore, path: str,
+                        params: Optional[Dict[str, Any]] = None, bulk: bool = False,
+                        until: Optional[date] = None, initial_start: Optional[date] = None,
+                        overlap_days: int = OVERLAP_DAYS,
+                        page_size: int = PAGE_SIZE, key: Optional[str] = None) -> Iterator[Any]:
+    """
+    Gera os registros novos/alterados de um endpoint desde o último checkpoint
+
+    O offset é confirmado depois que o consumidor pede o registro seguinte à
+    última linha da página, então uma queda reprocessa no máximo uma página
+    (entrega pelo menos uma vez). Endpoints sem filtro de data só ganham a
+    retomada por offset. `key` separa cursores do mesmo endpoint (ex. um por
+    empresa no fanout.py).
+
+    Bulk-data não tem limit/offset: a janela inteira vem numa resposta só e o
+    checkpoint avança por janela (uma queda refaz a janela toda). Respostas v1
+    sem resultSetMetadata seguem paginando enquanto a página vier cheia.
+    """
+    key = key or endpoint_key(path, bulk)
+    date_params = incremental_params(path)
+    date_field = RECORD_DATE_FIELDS.get(path)
+    checkpoint = store.get(key)
+    query = dict(params or {})
+    query.pop("limit", None)
+    query.pop("offset", None)
+
+    if checkpoint is not None and checkpoint.running:
+        # Execução anterior caiu no meio: mesma janela, a partir do offset confirmado
+        window_start, window_end = checkpoint.window_start, checkpoint.window_end
+        offset, emitted = checkpoint.next_offset, checkpoint.records
+        if bulk:
+            store.begin(key, window_start, window_end)
+            offset = emitted = 0
+    else:
+        window_start = window_end = None
+        if date_params:
+            start, end = next_window(checkpoint, until or date.today(), initial_start, overlap_days)
+            window_start, window_end = start.isoformat(), end.isoformat()
+        store.begin(key, window_start, window_end)
+        offset = emitted = 0
+
+    if date_params and window_start:
+        query[date_params[0]] = window_start
+        query[date_params[1]] = window_end
+
+    previous = None
+    while True:
+        if bulk:
+            response = client.get(path, params=query, bulk=True)
+            if response.status_code != 200:
+                raise PageError(response.url, response.status_code, response.text)
+            records, metadata = extract_page(response.json())
+        else:
+            records, metadata = fetch_page(client, path, query, offset, page_size)
+        count = total_count(metadata)
+        if count is None and offset and records == previous:
+            # Operação sem limit/offset devolveu de novo a mesma lista: já foi emitida
+            break
+        previous = records
+        last_modified = None
+        for record in records:
+            yield record
+            if date_field and isinstance(record, dict) and record.get(date_field):
+                last_modified = max(last_modified or "", str(record[date_field]))
+        offset += len(records)
+        emitted += len(records)
+        # Bulk não pagina: a resposta única fecha a janela
+        store.advance(key, 0 if bulk else offset, emitted, last_modified)
+
+        if bulk or not records:
+            break
+        # Sem resultSetMetadata só uma página cheia indica que pode haver outra
+        done = len(records) != page_size if count is None else offset >= count
+        if done:
+            break
+
+    store.complete(key, window_end)
+
+
+def main(argv=None) -> int:
+    from sienge_client import SiengeClient
+
+    parser = argparse.ArgumentParser(description="Extração incremental com checkpoints")
+    parser.add_argument("endpoint", nargs="?", help="Endpoint relativo, ex. /bills")
+    parser.add_argument("--bulk", action="store_true", help="Usa a base bulk-data/v1")
+    parser.add_argument("--db", default=CHECKPOINT_DB)
+    parser.add_argument("--tenant", default=os.getenv("SIENGE_SUBDOMAIN", "abf"))
+    parser.add_argument("--output", help="Arquivo JSONL (acrescenta ao existente)")
+    parser.add_argument("--param", action="append", default=[], metavar="NOME=VALOR",
+                        help="Parâmetro fixo da consulta (pode repetir)")
+    parser.add_argument("--since", help="Data inicial quando não há checkpoint (yyyy-MM-dd)")
+    parser.add_argument("--status", action="store_true", help="Mostra os checkpoints")
+    parser.add_argument("--reset", action="store_true", help="Apaga o checkpoint do endpoint")
+    add_profile_argument(parser)
+    args = parser.parse_args(argv)
+
+    with CheckpointStore(args.db, args.tenant) as store:
+        if args.status:
+            for cp in store.all():
+                print(f"{cp.endpoint:45} | {cp.status:7} | marca {cp.watermark or '-':10} | "
+                      f"janela {cp.window_start or '-'}..{cp.window_end or '-'} | "
+                      f"offset {cp.next_offset} | alterado {cp.last_modified or '-'}")
+            return 0
+        if not args.endpoint:
+            parser.error("informe o endpoint (ou --status)")
+        if args.reset:
+            store.reset(endpoint_key(args.endpoint, args.bulk))
+            print(f"[OK] Checkpoint de {args.endpoint} apagado")
+            return 0
+
+        client = SiengeClient.from_env(args.tenant)
+        since = date.fromisoformat(args.since) if args.since else None
+        params = dict(item.split("=", 1) for item in args.param)
+        out = open(args.output, "a", encoding="utf-8", buffering=1) if args.output else None
+        total = 0
+        started_at, started = datetime.now(), time.perf_counter()
+        try:
+            with profile_session(args.profile):
+                write = wrap("write", lambda record: out.write(
+                    json.dumps(record, ensure_ascii=False) + "\n")) if out else None
+                for record in incremental_records(client, store, args.endpoint, params,
+                                                  bulk=args.bulk, initial_start=since):
+                    if write:
+                        write(record)
+                    total += 1
+        finally:
+            if out:
+                out.close()
+            client.close()
+
+        cp = store.get(endpoint_key(args.endpoint, args.bulk))
+        print(f"[OK] {args.endpoint}: {total} registros | marca d'água {cp.watermark or '-'}")
+
+        # Histórico de execuções: vazão e volume comparados com as extrações anteriores
+        elapsed = time.perf_counter() - started
+        with RunHistory() as history:
+            sample = Sample(client.url(args.endpoint, args.bulk), 200, total,
+                            records_per_sec=total / elapsed if total and elapsed else None)
+            run_id = history.record_run("extract", [sample], started_at, elapsed)
+            print_findings(*history.compare(run_id, "extract"))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
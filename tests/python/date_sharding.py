@@ -0,0 +1,186 @@
+"""
+Fatiamento adaptativo de intervalos de datas para /bills e endpoints bulk-data
+
+Divide um intervalo (startDate/endDate e equivalentes) em sub-janelas e faz
+bissecção recursiva de toda janela cujo volume (resultSetMetadata.count) ou
+latência passe do limite. As fatias são extraídas em paralelo e os registros
+são unidos sem duplicatas nas bordas das janelas.
+"""
+
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+import requests
+
+from pagination import PAGE_SIZE, fetch_page, iter_records, total_count
+
+# Nomes dos parâmetros de data por endpoint (início, fim)
+DATE_PARAMS = {
+    "/bills": ("startDate", "endDate"),
+    "/accounts-statements": ("startDate", "endDate"),
+    "/income": ("startDate", "endDate"),
+    "/bank-movement": ("startDate", "endDate"),
+    "/customer-extract-history": ("startDueDate", "endDueDate"),
+    "/sales": ("createdAfter", "createdBefore"),
+    "/supply-contracts/measurements/attachments/all": ("measurementStartDate", "measurementEndDate"),
+}
+
+# Limites padrão para decidir se uma janela precisa ser dividida
+MAX_WINDOW_RECORDS = 5000
+MAX_WINDOW_LATENCY = 10.0
+INITIAL_WINDOW_DAYS = 31
+SHARD_WORKERS = 4
+
+DateLike = Union[date, str]
+
+
+@dataclass(frozen=True)
+class DateWindow:
+    """Janela de datas fechada [start, end]"""
+    start: date
+    end: date
+
+    @property
+    def days(self) -> int:
+        return (self.end - self.start).days + 1
+
+    def bisect(self) -> Tuple["DateWindow", "DateWindow"]:
+        middle = self.start + timedelta(days=self.days // 2 - 1)
+        return DateWindow(self.start, middle), DateWindow(middle + timedelta(days=1), self.end)
+
+    def params(self, start_param: str, end_param: str) -> Dict[str, str]:
+        return {start_param: self.start.isoformat(), end_param: self.end.isoformat()}
+
+    def __str__(self) -> str:
+        return f"{self.start.isoformat()}..{self.end.isoformat()}"
+
+
+@dataclass
+class Shard:
+    """Janela aceita pelo planejador, com o que a sondagem revelou"""
+    window: DateWindow
+    count: Optional[int]
+    latency: float
+    # Endpoints bulk ignoram limit/offset: a sondagem já trouxe a janela inteira
+    records: Optional[List[Any]] = None
+
+
+def _to_date(value: DateLike) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+def split_range(start: DateLike, end: DateLike, days: int = INITIAL_WINDOW_DAYS) -> List[DateWindow]:
+    """Divide [start, end] em janelas consecutivas de até `days` dias"""
+    start, end = _to_date(start), _to_date(end)
+    windows = []
+    while start <= end:
+        window_end = min(start + timedelta(days=days - 1), end)
+        windows.append(DateWindow(start, window_end))
+        start = window_end + timedelta(days=1)
+    return windows
+
+
+def date_params_for(path: str) -> Tuple[str, str]:
+    """Nomes dos parâmetros de data de um endpoint (padrão startDate/endDate)"""
+    return DATE_PARAMS.get(path, ("startDate", "endDate"))
+
+
+class DateShardPlanner:
+    """Planeja e extrai um intervalo de datas em fatias paralelas"""
+
+    def __init__(self, client, path: str, params: Optional[Dict[str, Any]] = None,
+                 bulk: bool = False, date_params: Optional[Tuple[str, str]] = None,
+                 max_records: int = MAX_WINDOW_RECORDS,
+                 max_latency: float = MAX_WINDOW_LATENCY,
+                 workers: int = SHARD_WORKERS, page_size: int = PAGE_SIZE):
+        self.client = client
+        self.path = path
+        self.params = dict(params or {})
+        self.bulk = bulk
+        self.start_param, self.end_param = date_params or date_params_for(path)
+        self.max_records = max_records
+        self.max_latency = max_latency
+        self.workers = workers
+        self.page_size = page_size
+
+    def _window_params(self, window: DateWindow) -> Dict[str, Any]:
+        return {**self.params, **window.params(self.start_param, self.end_param)}
+
+    def probe(self, window: DateWindow) -> Shard:
+        """Sonda a janela com uma página mínima para medir volume e latência"""
+        start = time.perf_counter()
+        try:
+            records, metadata = fetch_page(self.client, self.path, self._window_params(window),
+                                           0, 1, self.bulk)
+            count = total_count(metadata)
+        except requests.exceptions.Timeout:
+            # Janela que nem responde a tempo sempre é dividida
+            return Shard(window, None, float("inf"))
+        shard = Shard(window, count, time.perf_counter() - start)
+        if count is None and len(records) > 1:
+            shard.records = records
+        return shard
+
+    def _too_big(self, shard: Shard) -> bool:
+        if shard.window.days <= 1:
+            return False
+        if shard.count is not None and shard.count > self.max_records:
+            return True
+        return shard.latency > self.max_latency
+
+    def plan(self, start: DateLike, end: DateLike,
+             initial_days: int = INITIAL_WINDOW_DAYS) -> List[Shard]:
+        """Sonda as janelas em paralelo, bissectando as que passarem dos limites"""
+        accepted: List[Shard] = []
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            pending = {executor.submit(self.probe, w) for w in split_range(start, end, initial_days)}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    shard = future.result()
+                    if self._too_big(shard):
+                        pending |= {executor.submit(self.probe, w) for w in shard.window.bisect()}
+                    elif shard.count != 0:
+                        accepted.append(shard)
+        return sorted(accepted, key=lambda s: s.window.start)
+
+    def _extract_shard(self, shard: Shard) -> List[Any]:
+        if shard.records is not None:
+            return shard.records
+        return list(iter_records(self.client, self.path, self._window_params(shard.window),
+                                 page_size=self.page_size, window=1, bulk=self.bulk))
+
+    def extract(self, start: DateLike, end: DateLike,
+                key: Callable[[Any], Any] = lambda record: record.get("id"),
+                initial_days: int = INITIAL_WINDOW_DAYS) -> Iterator[Any]:
+        """
+        Extrai todo o intervalo, fatia por fatia em paralelo
+
+        Registros repetidos em janelas vizinhas (mesma chave) saem uma única
+        vez; registros sem chave nunca são descartados.
+        """
+        shards = self.plan(start, end, initial_days)
+        seen = set()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for records in executor.map(self._extract_shard, shards):
+                for record in records:
+                    record_key = key(record) if isinstance(record, dict) else None
+                    if record_key is not None:
+                        if record_key in seen:
+                            continue
+                        seen.add(record_key)
+                    yield record
+
+
+def extract_date_range(client, path: str, start: DateLike, end: DateLike,
+                       params: Optional[Dict[str, Any]] = None, **planner_kwargs) -> List[Any]:
+    """Atalho: extrai um intervalo completo de datas com fatiamento adaptativo"""
+    planner = DateShardPlanner(client, path, params, **planner_kwargs)
+    return list(planner.extract(start, end))
@@ -0,0 +1,596 @@
+"""
+Mapeamentos de campos dos endpoints, lidos de endpoint-mappings.ts
+
+Usa como fonte o mesmo app/api/sync/direct/endpoint-mappings.ts da rota de
+sincronização direta: model, primaryKey e fieldMapping de cada endpoint. Cada
+transform em TypeScript é reconhecido por padrão e trocado por uma função
+Python com a mesma semântica (truthiness do JS, parseFloat, new Date...).
+Um transform desconhecido faz a leitura falhar, para que mudanças no TS não
+passem despercebidas.
+
+map_item() reproduz processItem() da rota: aplica o mapeamento na ordem de
+declaração e descarta os campos que ficariam undefined.
+"""
+
+import json
+import math
+import re
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+MAPPINGS_TS = (Path(__file__).resolve().parents[2]
+               / "app" / "api" / "sync" / "direct" / "endpoint-mappings.ts")
+
+
+class _Undefined:
+    """Valor `undefined` do JS (campo ausente no registro)"""
+
+    def __repr__(self):
+        return "undefined"
+
+    def __bool__(self):
+        return False
+
+
+UNDEFINED = _Undefined()
+
+Transform = Callable[[Any, Dict[str, Any]], Any]
+
+
+@dataclass
+class FieldRule:
+    """Uma entrada do fieldMapping: campo da API -> campo do model"""
+    source: str
+    target: str
+    transform: Optional[Transform] = None
+    transform_source: Optional[str] = None
+    # Tipo do transform (chave de TRANSFORM_FACTORIES ou "custom") e argumentos
+    kind: Optional[str] = None
+    args: Tuple = ()
+
+    def apply(self, item: Dict[str, Any]) -> Any:
+        value = item.get(self.source, UNDEFINED)
+        return self.transform(value, item) if self.transform else value
+
+
+@dataclass
+class EndpointMapping:
+    endpoint: str
+    model: str
+    primary_key: str
+    rules: List[FieldRule] = field(default_factory=list)
+
+    @property
+    def targets(self) -> List[str]:
+        """Campos de destino, sem repetição, na ordem em que são gravados"""
+        return list(dict.fromkeys(rule.target for rule in self.rules))
+
+    @property
+    def primary_key_target(self) -> str:
+        """Campo do model que recebe a chave primária"""
+        for rule in self.rules:
+            if rule.source == self.primary_key:
+                return rule.target
+        return self.primary_key
+
+
+# ------------------------------------------------------------------
+# Semântica de valores do JavaScript
+# ------------------------------------------------------------------
+
+def js_truthy(value: Any) -> bool:
+    """Truthiness do JS: [] e {} são verdadeiros, NaN é falso"""
+    if value is None or value is UNDEFINED or value is False:
+        return False
+    if isinstance(value, (int, float)):
+        return value != 0 and not (isinstance(value, float) and math.isnan(value))
+    if isinstance(value, str):
+        return value != ""
+    return True
+
+
+def js_string(value: Any) -> str:
+    """String(value) do JS para os tipos que vêm do JSON"""
+    if value is None:
+        return "null"
+    if value is UNDEFINED:
+        return "undefined"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, float):
+        if math.isnan(value):
+            return "NaN"
+        if math.isinf(value):
+            return "Infinity" if value > 0 else "-Infinity"
+        if value.is_integer() and abs(value) < 1e21:
+            return str(int(value))
+        return repr(value)
+    if isinstance(value, list):
+        return ",".join("" if v is None else js_string(v) for v in value)
+    if isinstance(value, dict):
+        return "[object Object]"
+    return str(value)
+
+
+_FLOAT_PREFIX = re.compile(r"[+-]?(?:Infinity|\d+\.?\d*(?:[eE][+-]?\d+)?|\.\d+(?:[eE][+-]?\d+)?)")
+_INT_PREFIX = re.compile(r"[+-]?\d+")
+
+
+def parse_float(value: Any) -> float:
+    """parseFloat(): prefixo numérico da string, NaN se não houver"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    match = _FLOAT_PREFIX.match(js_string(value).lstrip())
+    if not match:
+        return math.nan
+    text = match.group(0)
+    return float(text.replace("Infinity", "inf"))
+
+
+def parse_int(value: Any) -> float:
+    """parseInt() em base 10 (NaN como float, inteiros como int)"""
+    match = _INT_PREFIX.match(js_string(value).lstrip())
+    return int(match.group(0)) if match else math.nan
+
+
+class _InvalidDate:
+    """`Invalid Date` do JS: new Date() com texto que não é data"""
+
+    def __repr__(self):
+        return "Invalid Date"
+
+
+INVALID_DATE = _InvalidDate()
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+# Formato de data/hora do ECMAScript, com as variações que o V8 também aceita
+_JS_DATE = re.compile(
+    r"\s*([+-]\d{6}|\d{4})(?:-(\d{2})(?:-(\d{2}))?)?"
+    r"(?:(?:[Tt]|\s+)(\d{2}):(\d{2})(?::(\d{2})(?:\.(\d+))?)?)?"
+    r"\s*([Zz]|[+-]\d{2}:?\d{2})?\s*")
+
+
+def _js_date_string(text: str) -> Any:
+    match = _JS_DATE.fullmatch(text)
+    if not match:
+        return INVALID_DATE
+    year, month, day, hour, minute, second, fraction, offset = match.groups()
+    month, day = int(month or 1), int(day or 1)
+    hour, minute, second = int(hour or 0), int(minute or 0), int(second or 0)
+    millis = int((fraction or "0")[:3].ljust(3, "0"))
+    if not (1 <= month <= 12 and 1 <= day <= 31 and minute <= 59 and second <= 59):
+        return INVALID_DATE
+    if hour > 24 or (hour == 24 and (minute or second or millis)):
+        return INVALID_DATE
+    try:
+        # Dia além do fim do mês avança para o mês seguinte, como no V8
+        moment = datetime(int(year), month, 1) + timedelta(
+            days=day - 1, hours=hour, minutes=minute, seconds=second, milliseconds=millis)
+    except (ValueError, OverflowError):
+        return INVALID_DATE
+    if offset:
+        if offset in "Zz":
+            return moment.replace(tzinfo=timezone.utc)
+        sign = -1 if offset[0] == "-" else 1
+        digits = offset[1:].replace(":", "")
+        shift = timedelta(hours=int(digits[:2]), minutes=int(digits[2:]))
+        return (moment - sign * shift).replace(tzinfo=timezone.utc)
+    if match.group(4) is None:
+        # Só data: meia-noite UTC
+        return moment.replace(tzinfo=timezone.utc)
+    # Data-hora sem fuso é hora local no JS
+    return moment.astimezone(timezone.utc)
+
+
+@lru_cache(maxsize=65536)
+def js_date_text(text: str) -> Any:
+    """new Date(texto), com cache (datas se repetem muito entre registros)"""
+    return _js_date_string(text)
+
+
+def js_date(value: Any) -> Any:
+    """
+    new Date(value) em UTC, com precisão de milissegundos
+
+    Texto fora do formato de data do ECMAScript vira INVALID_DATE (o parser
+    legado do V8, que aceita coisas como "12" ou "abc-5333", não é imitado).
+    """
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, str):
+        return js_date_text(value)
+    if isinstance(value, (list, dict)):
+        # Objetos viram texto antes da conversão: [] -> "", {} -> "[object Object]"
+        return js_date_text(js_string(value))
+    if isinstance(value, (int, float)):
+        # true/false contam como 1/0 milissegundo
+        if not math.isfinite(value):
+            return INVALID_DATE
+        try:
+            return _EPOCH + timedelta(milliseconds=int(value))
+        except OverflowError:
+            return INVALID_DATE
+    return INVALID_DATE
+
+
+def utc_now() -> datetime:
+    now = datetime.now(timezone.utc)
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+
+def sao_paulo_now() -> datetime:
+    """getSaoPauloNow() de lib/date-helper.ts: agora menos 3 horas"""
+    return utc_now() - timedelta(hours=3)
+
+
+def _literal(text: str) -> Any:
+    """Literal JS simples: true/false/null, número ou string entre aspas"""
+    if text in ("true", "false"):
+        return text == "true"
+    if text == "null":
+        return None
+    if text[:1] in "'\"":
+        return text[1:-1]
+    return json.loads(text)
+
+
+def _attr(obj: Any, key: str) -> Any:
+    """obj.key do JS (TypeError em null/undefined, como no TS)"""
+    if obj is None or obj is UNDEFINED:
+        raise TypeError(f"Cannot read properties of {js_string(obj)} (reading '{key}')")
+    return obj.get(key, UNDEFINED) if isinstance(obj, dict) else UNDEFINED
+
+
+# ------------------------------------------------------------------
+# Transforms reconhecidos por padrão (corpo normalizado, sem espaços)
+# ------------------------------------------------------------------
+
+def _date_or(fallback: Callable[[], Any]) -> Transform:
+    return lambda val, item: js_date(val) if js_truthy(val) else fallback()
+
+
+def _number_or(parse: Callable[[Any], Any], default: Any) -> Transform:
+    return lambda val, item: parse(val) if js_truthy(val) else default
+
+
+def _or_default(default: Any) -> Transform:
+    # Lista nova a cada chamada, como o literal [] do JS
+    if isinstance(default, list):
+        return lambda val, item: val if js_truthy(val) else []
+    return lambda val, item: val if js_truthy(val) else default
+
+
+def _strict_equals(a: Any, b: Any) -> bool:
+    """=== do JS: booleanos só se igualam a booleanos"""
+    if isinstance(a, bool) or isinstance(b, bool):
+        return a is b
+    return type(a) is type(b) and a == b or (
+        isinstance(a, (int, float)) and isinstance(b, (int, float)) and a == b)
+
+
+def _equals_any(literals: Tuple[Any, ...]) -> Transform:
+    return lambda val, item: any(_strict_equals(val, lit) for lit in literals)
+
+
+def _optional_attr(key: str) -> Transform:
+    """val?.key || null"""
+    def transform(val, item):
+        found = None if val is None or val is UNDEFINED else _attr(val, key)
+        return found if js_truthy(found) else None
+    return transform
+
+
+def _first_of(keys: Tuple[str, ...]) -> Transform:
+    """Primeiro endereço da lista: first.a || first.b || null"""
+    def transform(val, item):
+        if isinstance(val, list) and val:
+            for key in keys:
+                found = _attr(val[0], key)
+                if js_truthy(found):
+                    return found
+            return None
+        return None
+    return transform
+
+
+def _nullish_default(default: Any) -> Transform:
+    """val !== undefined && val !== null ? val : default"""
+    return lambda val, item: val if val is not UNDEFINED and val is not None else default
+
+
+# Tipos de transform: padrão do corpo normalizado, conversão dos grupos
+# capturados em argumentos e fábrica da função Python
+_PATTERNS: List[Tuple[str, re.Pattern, Callable[..., Tuple]]] = [
+    ("date_or_null", re.compile(r"val\?newDate\(val\):null"), lambda: ()),
+    ("date_or_now", re.compile(r"val\?newDate\(val\):newDate\(\)"), lambda: ()),
+    ("now", re.compile(r"newDate\(\)"), lambda: ()),
+    ("sao_paulo_now", re.compile(r"getSaoPauloNow\(\)"), lambda: ()),
+    ("float_or", re.compile(r"val\?parseFloat\(val\):(null|0)"), lambda d: (_literal(d),)),
+    ("int_or", re.compile(r"val\?parseInt\(val\):(null|0)"), lambda d: (_literal(d),)),
+    ("or_default", re.compile(r"val\|\|(\[\]|null)"),
+     lambda d: ([] if d == "[]" else None,)),
+    ("or_default", re.compile(r"val&&val!==undefined\?val:null"), lambda: (None,)),
+    ("or_default", re.compile(r"\{if\(!val\)returnnull;returnval;\}"), lambda: (None,)),
+    ("nullish_default", re.compile(r"val!==undefined&&val!==null\?val:(.+)"),
+     lambda d: (_literal(d),)),
+    ("not_false", re.compile(r"val!==false"), lambda: ()),
+    ("truthy", re.compile(r"!!val"), lambda: ()),
+    ("optional_attr", re.compile(r"val\?\.(\w+)\|\|null"), lambda key: (key,)),
+    ("equals_any", re.compile(r"((?:val===[^|]+)(?:\|\|val===[^|]+)*)"),
+     lambda expr: (tuple(_literal(part.split("===", 1)[1]) for part in expr.split("||")),)),
+    ("first_of", re.compile(r"\{if\(Array\.isArray\(val\)&&val\.length>0\)\{constfirstAddress=val\[0\];"
+                            r"return((?:firstAddress\.\w+\|\|)+)null;\}returnnull;\}"),
+     lambda chain: (tuple(part.split(".", 1)[1] for part in chain.strip("|").split("||")),)),
+]
+
+TRANSFORM_FACTORIES: Dict[str, Callable[..., Transform]] = {
+    "date_or_null": lambda: _date_or(lambda: None),
+    "date_or_now": lambda: _date_or(utc_now),
+    "now": lambda: (lambda val, item: utc_now()),
+    "sao_paulo_now": lambda: (lambda val, item: sao_paulo_now()),
+    "float_or": lambda default: _number_or(parse_float, default),
+    "int_or": lambda default: _number_or(parse_int, default),
+    "or_default": _or_default,
+    "nullish_default": _nullish_default,
+    "not_false": lambda: (lambda val, item: val is not False),
+    "truthy": lambda: (lambda val, item: js_truthy(val)),
+    "optional_attr": _optional_attr,
+    "equals_any": _equals_any,
+    "first_of": _first_of,
+}
+
+
+# Transforms com várias instruções, escritos à mão (endpoint, campo de origem).
+# Seguem a assinatura (value, data) da interface FieldMapping.
+
+def _customer_cpf(val, item):
+    return val if item.get("personType") == "PHYSICAL" and js_truthy(val) else None
+
+
+def _customer_cnpj(val, item):
+    if item.get("personType") == "LEGAL" and js_truthy(val):
+        return val
+    if item.get("personType") == "LEGAL" and js_truthy(item.get("cpf")):
+        return item["cpf"]
+    return None
+
+
+def _or_empty(*values) -> Any:
+    for value in values:
+        if js_truthy(value):
+            return value
+    return ""
+
+
+def _main_address(val, item):
+    if isinstance(val, list) and val:
+        first = val[0]
+        street = _or_empty(_attr(first, "street"), _attr(first, "logradouro"))
+        number = _or_empty(_attr(first, "number"), _attr(first, "numero"))
+        complement = _or_empty(_attr(first, "complement"), _attr(first, "complemento"))
+        text = (js_string(street) + (", " + js_string(number) if js_truthy(number) else "")
+                + (" - " + js_string(complement) if js_truthy(complement) else ""))
+        return text.strip() or None
+    return None
+
+
+def _main_address_type(val, item):
+    if isinstance(val, list) and val:
+        kind = _or_empty(_attr(val[0], "type"), _attr(val[0], "tipo"))
+        return {"R": "Residencial", "C": "Comercial"}.get(kind, kind) if isinstance(kind, str) else kind
+    return None
+
+
+CUSTOM_TRANSFORMS: Dict[Tuple[str, str], Transform] = {
+    ("customers", "cpf"): _customer_cpf,
+    ("customers", "cnpj"): _customer_cnpj,
+    ("customers", "mainAddress"): _main_address,
+    ("customers", "mainAddressType"): _main_address_type,
+}
+
+
+def _normalize(body: str) -> str:
+    body = re.sub(r"\s+", "", body).rstrip(";")
+    while body.startswith("(") and body.endswith(")") and _balanced(body[1:-1]):
+        body = body[1:-1]
+    return body
+
+
+def _balanced(text: str) -> bool:
+    depth = 0
+    for char in text:
+        depth += {"(": 1, ")": -1}.get(char, 0)
+        if depth < 0:
+            return False
+    return depth == 0
+
+
+def match_transform(endpoint: str, source: str, code: str) -> Tuple[str, Tuple]:
+    """Tipo e argumentos do arrow function do TS ("custom" para os escritos à mão)"""
+    if (endpoint, source) in CUSTOM_TRANSFORMS:
+        return "custom", ()
+    match = re.match(r"\s*\(([^)]*)\)\s*=>(.*)$", code, re.S)
+    if not match:
+        raise ValueError(f"{endpoint}.{source}: transform não reconhecido: {code}")
+    params = [p.split(":")[0].strip() for p in match.group(1).split(",") if p.strip()]
+    body = _normalize(match.group(2))
+    if params and params[0] != "val":
+        body = re.sub(rf"\b{params[0]}\b", "val", body)
+    for kind, pattern, arguments in _PATTERNS:
+        found = pattern.fullmatch(body)
+        if found:
+            return kind, arguments(*found.groups())
+    raise ValueError(f"{endpoint}.{source}: transform não reconhecido: {code.strip()}")
+
+
+def compile_transform(endpoint: str, source: str, code: str) -> Transform:
+    """Função Python equivalente ao arrow function do TS"""
+    kind, args = match_transform(endpoint, source, code)
+    if kind == "custom":
+        return CUSTOM_TRANSFORMS[(endpoint, source)]
+    return TRANSFORM_FACTORIES[kind](*args)
+
+
+# ------------------------------------------------------------------
+# Leitura do objeto literal ENDPOINT_MAPPINGS
+# ------------------------------------------------------------------
+
+def _strip_comments(text: str) -> str:
+    out, index, quote = [], 0, None
+    while index < len(text):
+        char = text[index]
+        if quote:
+            out.append(char)
+            if char == "\\":
+                out.append(text[index + 1])
+                index += 1
+            elif char == quote:
+                quote = None
+        elif char in "'\"`":
+            quote = char
+            out.append(char)
+        elif text.startswith("//", index):
+            index = text.find("\n", index)
+            if index < 0:
+                break
+            continue
+        elif text.startswith("/*", index):
+            index = text.find("*/", index) + 2
+            continue
+        else:
+            out.append(char)
+        index += 1
+    return "".join(out)
+
+
+class _Parser:
+    """Objeto literal TS: chaves, strings e expressões (guardadas como texto)"""
+
+    def __init__(self, text: str, pos: int):
+        self.text = text
+        self.pos = pos
+
+    def skip(self):
+        while self.pos < len(self.text) and self.text[self.pos].isspace():
+            self.pos += 1
+
+    def string(self) -> str:
+        quote = self.text[self.pos]
+        end = self.text.index(quote, self.pos + 1)
+        value = self.text[self.pos + 1:end]
+        self.pos = end + 1
+        return value
+
+    def key(self) -> str:
+        self.skip()
+        if self.text[self.pos] in "'\"":
+            return self.string()
+        match = re.compile(r"[\w$]+").match(self.text, self.pos)
+        self.pos = match.end()
+        return match.group(0)
+
+    def expression(self) -> str:
+        start, depth, quote = self.pos, 0, None
+        while self.pos < len(self.text):
+            char = self.text[self.pos]
+            if quote:
+                if char == "\\":
+                    self.pos += 1
+                elif char == quote:
+                    quote = None
+            elif char in "'\"`":
+                quote = char
+            elif char in "([{":
+                depth += 1
+            elif char in ")]}":
+                if depth == 0:
+                    break
+                depth -= 1
+            elif char == "," and depth == 0:
+                break
+            self.pos += 1
+        return self.text[start:self.pos].strip()
+
+    def value(self) -> Any:
+        self.skip()
+        char = self.text[self.pos]
+        if char == "{":
+            return self.object()
+        if char in "'\"":
+            return self.string()
+        return _Code(self.expression())
+
+    def object(self) -> Dict[str, Any]:
+        self.pos += 1
+        result: Dict[str, Any] = {}
+        while True:
+            self.skip()
+            if self.text[self.pos] == "}":
+                self.pos += 1
+                return result
+            if self.text[self.pos] == ",":
+                self.pos += 1
+                continue
+            key = self.key()
+            self.skip()
+            if self.text[self.pos] != ":":
+                raise ValueError(f"':' esperado após {key!r} na posição {self.pos}")
+            self.pos += 1
+            result[key] = self.value()
+
+
+class _Code(str):
+    """Trecho de código TS não interpretado"""
+
+
+def parse_mappings(text: str) -> Dict[str, EndpointMapping]:
+    """Mapeamentos do conteúdo de endpoint-mappings.ts"""
+    text = _strip_comments(text)
+    start = re.search(r"ENDPOINT_MAPPINGS\s*:[^=]*=\s*", text)
+    if not start:
+        raise ValueError("ENDPOINT_MAPPINGS não encontrado")
+    raw = _Parser(text, start.end()).object()
+
+    mappings = {}
+    for endpoint, spec in raw.items():
+        rules = []
+        for source, target in spec["fieldMapping"].items():
+            if isinstance(target, dict) and target.get("transform"):
+                code = target["transform"]
+                kind, args = match_transform(endpoint, source, code)
+                transform = (CUSTOM_TRANSFORMS[(endpoint, source)] if kind == "custom"
+                             else TRANSFORM_FACTORIES[kind](*args))
+                rules.append(FieldRule(source, target["field"], transform, str(code), kind, args))
+            elif isinstance(target, dict):
+                rules.append(FieldRule(source, target["field"]))
+            else:
+                rules.append(FieldRule(source, target))
+        mappings[endpoint] = EndpointMapping(endpoint, spec["model"], spec["primaryKey"], rules)
+    return mappings
+
+
+def load_mappings(path: Path = MAPPINGS_TS) -> Dict[str, EndpointMapping]:
+    return parse_mappings(Path(path).read_text(encoding="utf-8"))
+
+
+def map_item(mapping: EndpointMapping, item: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Aplica o fieldMapping a um registro da API, como processItem() da rota
+
+    Campos que ficariam undefined são descartados; com alvos repetidos vale o
+    último declarado. Transforms com erro (ex.: data inválida) propagam a
+    exceção, e o registro deve ser tratado como erro.
+    """
+    mapped: Dict[str, Any] = {}
+    for rule in mapping.rules:
+        mapped[rule.target] = rule.apply(item)
+    return {key: value for key, value in mapped.items() if value is not UNDEFINED}
+
+
+def primary_key_value(mapping: EndpointMapping, item: Dict[str, Any]) -> Any:
+    """item[primaryKey] || item.id, como na rota"""
+    value = item.get(mapping.primary_key)
+    return value if js_truthy(value) else item.get("id")
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Fan-out de endpoints que exigem um id pai (companyId, enterpriseId)
+
+/accountancy/entries exige companyId e o bulk /sales exige enterpriseId. Em
+vez de um id fixo, resolve a coleção pai uma vez (/companies, /enterprises,
+com cache em disco) e agenda a consulta filha de cada pai num único pool com
+orçamento global de concorrência e um token bucket compartilhado por todas
+as requisições. Cada pai tem o próprio cursor no checkpoints.py, então um
+filho que falha é repetido sozinho, a partir da última página confirmada.
+
+Uso:
+    python fanout.py /accountancy/entries --output entries.jsonl
+    python fanout.py /sales --bulk --param situation=SOLD --since 2024-01-01 --output sales.jsonl
+    python fanout.py /accountancy/entries --parents 1,2 --concurrency 4
+    python fanout.py --status
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+
+from checkpoints import CHECKPOINT_DB, CheckpointStore, endpoint_key, incremental_records
+from http_cache import HttpCache
+from openapi_specs import BASE_BULK, BASE_V1
+from pagination import PageError, fetch_all
+from probe_engine import MAX_CONCURRENCY, TokenBucket
+from spec_index import load_index
+
+# Parâmetro obrigatório -> coleção que lista os ids possíveis
+PARENTS = {
+    "companyId": "/companies",
+    "enterpriseId": "/enterprises",
+}
+
+MAX_ATTEMPTS = 3
+RETRY_DELAY = 2.0
+# Cache dos pais quando SIENGE_CACHE_DIR não está definida
+DEFAULT_CACHE_DIR = ".sienge_cache"
+
+
+@dataclass
+class ChildResult:
+    """Resultado da consulta filha de um pai"""
+    parent_id: Any
+    records: int = 0
+    attempts: int = 0
+    seconds: float = 0.0
+    error: Optional[str] = None
+
+
+@dataclass
+class FanOutReport:
+    path: str
+    parent_param: str
+    parents: int
+    seconds: float
+    children: List[ChildResult] = field(default_factory=list)
+
+    @property
+    def records(self) -> int:
+        return sum(child.records for child in self.children)
+
+    @property
+    def failed(self) -> List[ChildResult]:
+        return [child for child in self.children if child.error]
+
+
+def parent_param(path: str, bulk: bool = False) -> str:
+    """Parâmetro pai obrigatório do endpoint, segundo os YAMLs"""
+    spec = load_index().get(path, BASE_BULK if bulk else BASE_V1)
+    if spec is None:
+        raise ValueError(f"Endpoint fora dos YAMLs: {path}")
+    required = [param.name for param in spec.required_query if param.name in PARENTS]
+    if not required:
+        raise ValueError(f"{path} não exige {' nem '.join(PARENTS)}")
+    return required[0]
+
+
+def child_key(path: str, bulk: bool, param: str, parent_id: Any) -> str:
+    """Chave do cursor de um pai no banco de checkpoints"""
+    return f"{endpoint_key(path, bulk)}?{param}={parent_id}"
+
+
+class ParentResolver:
+    """Ids das coleções pai, buscados uma vez por execução (e cacheados no disco)"""
+
+    def __init__(self, client):
+        self.client = client
+        self._ids: Dict[str, List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def ids(self, param: str) -> List[Any]:
+        with self._lock:
+            if param not in self._ids:
+                records = fetch_all(self.client, PARENTS[param])
+                self._ids[param] = sorted({record["id"] for record in records
+                                           if isinstance(record, dict) and "id" in record})
+            return self._ids[param]
+
+
+class FanOut:
+    """Agenda a consulta filha de cada pai sob um orçamento global de concorrência"""
+
+    def __init__(self, client, store: CheckpointStore, concurrency: int = MAX_CONCURRENCY,
+                 max_attempts: int = MAX_ATTEMPTS, retry_delay: float = RETRY_DELAY):
+        self.client = client
+        self.store = store
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.parents = ParentResolver(client)
+
+    def _child(self, path: str, bulk: bool, param: str, parent_id: Any,
+               params: Dict[str, Any], sink: Callable[[Dict[str, Any]], None],
+               initial_start: Optional[date]) -> ChildResult:
+        result = ChildResult(parent_id)
+        key = child_key(path, bulk, param, parent_id)
+        query = {**params, param: parent_id}
+        start = time.perf_counter()
+        while True:
+            result.attempts += 1
+            try:
+                # incremental_records só entrega páginas já lidas inteiras e confirma o offset
+                # antes de pedir a próxima: a nova tentativa não repete registros já gravados
+                for record in incremental_records(self.client, self.store, path, query, bulk=bulk,
+                                                  initial_start=initial_start, key=key):
+                    if isinstance(record, dict) and param not in record:
+                        record = {**record, param: parent_id}
+                    sink(record)
+                    result.records += 1
+                result.error = None
+                break
+            except (PageError, requests.RequestException, ValueError) as e:
+                # O cursor ficou na última página confirmada: a nova tentativa continua dali
+                result.error = f"{type(e).__name__}: {e}"[:300]
+                retryable = not isinstance(e, PageError) or e.status_code >= 500 \
+                    or e.status_code == 429
+                if not retryable or result.attempts >= self.max_attempts:
+                    break
+                time.sleep(self.retry_delay * 2 ** (result.attempts - 1))
+        result.seconds = time.perf_counter() - start
+        return result
+
+    def run(self, path: str, sink: Callable[[Dict[str, Any]], None],
+            params: Optional[Dict[str, Any]] = None, bulk: bool = False,
+            parent_ids: Optional[List[Any]] = None, initial_start: Optional[date] = None,
+            on_child: Optional[Callable[[ChildResult], None]] = None) -> FanOutReport:
+        """Extrai o endpoint para todos os pais (ou para parent_ids)"""
+        param = parent_param(path, bulk)
+        ids = parent_ids if parent_ids is not None else self.parents.ids(param)
+        params = {k: v for k, v in (params or {}).items() if k != param}
+        start = time.perf_counter()
+        report = FanOutReport(path, param, len(ids), 0.0)
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            futures = [executor.submit(self._child, path, bulk, param, parent_id, params, sink,
+                                       initial_start) for parent_id in ids]
+            for future in as_completed(futures):
+                child = future.result()
+                report.children.append(child)
+                if on_child:
+                    on_child(child)
+        report.children.sort(key=lambda child: str(child.parent_id))
+        report.seconds = time.perf_counter() - start
+        return report
+
+
+class JsonlSink:
+    """Arquivo JSONL compartilhado pelas threads (uma linha por registro)"""
+
+    def __init__(self, path: Optional[str]):
+        self._file = open(path, "a", encoding="utf-8", buffering=1024 * 1024) if path else None
+        self._lock = threading.Lock()
+
+    def __call__(self, record: Dict[str, Any]):
+        if self._file is not None:
+            line = json.dumps(record, ensure_ascii=False) + "\n"
+            with self._lock:
+                self._file.write(line)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+
+def print_child(child: ChildResult):
+    symbol = "[ERRO]" if child.error else "[OK]"
+    retries = f" | {child.attempts} tentativas" if child.attempts > 1 else ""
+    print(f"{symbol:7} pai {str(child.parent_id):>8} | {child.records:7} registros | "
+          f"{child.seconds:6.2f}s{retries}" + (f" | {child.error}" if child.error else ""))
+
+
+def main(argv=None) -> int:
+    from sienge_client import SiengeClient
+
+    parser = argparse.ArgumentParser(description="Fan-out por empresa/empreendimento")
+    parser.add_argument("endpoint", nargs="?", help="Endpoint relativo, ex. /accountancy/entries")
+    parser.add_argument("--bulk", action="store_true", help="Usa a base bulk-data/v1")
+    parser.add_argument("--db", default=CHECKPOINT_DB)
+    parser.add_argument("--tenant", default=os.getenv("SIENGE_SUBDOMAIN", "abf"))
+    parser.add_argument("--output", help="Arquivo JSONL (acrescenta ao existente)")
+    parser.add_argument("--param", action="append", default=[], metavar="NOME=VALOR",
+                        help="Parâmetro fixo das consultas filhas (pode repetir)")
+    parser.add_argument("--parents", help="Ids pai separados por vírgula (padrão: todos)")
+    parser.add_argument("--since", help="Data inicial quando não há checkpoint (yyyy-MM-dd)")
+    parser.add_argument("--concurrency", type=int, default=MAX_CONCURRENCY,
+                        help="Consultas filhas simultâneas (orçamento global)")
+    parser.add_argument("--status", action="store_true", help="Mostra os cursores por pai")
+    args = parser.parse_args(argv)
+
+    with CheckpointStore(args.db, args.tenant) as store:
+        if args.status:
+            for cp in store.all():
+                if "?" in cp.endpoint:
+                    print(f"{cp.endpoint:55} | {cp.status:7} | offset {cp.next_offset:6} | "
+                          f"{cp.records:7} registros | marca {cp.watermark or '-'}")
+            return 0
+        if not args.endpoint:
+            parser.error("informe o endpoint (ou --status)")
+
+        client = SiengeClient.from_env(args.tenant, pool_size=args.concurrency,
+                                       rate_limiter=TokenBucket(),
+                                       cache=HttpCache.from_env() or HttpCache(DEFAULT_CACHE_DIR))
+        sink = JsonlSink(args.output)
+        parents = [item.strip() for item in args.parents.split(",")] if args.parents else None
+        try:
+            report = FanOut(client, store, args.concurrency).run(
+                args.endpoint, sink, dict(item.split("=", 1) for item in args.param),
+                bulk=args.bulk, parent_ids=parents,
+                initial_start=date.fromisoformat(args.since) if args.since else None,
+                on_child=print_child)
+        except (ValueError, PageError, requests.RequestException) as e:
+            print(f"[ERRO] {e}")
+            return 1
+        finally:
+            sink.close()
+            client.close()
+
+    failed = report.failed
+    print(f"\n{args.endpoint}: {report.parents} pai(s) por {report.parent_param} | "
+          f"{report.records} registros em {report.seconds:.1f}s | concorrência {args.concurrency}")
+    if failed:
+        print(f"[AVISO] {len(failed)} pai(s) com falha, retomados do último offset confirmado "
+              f"na próxima execução: {', '.join(str(c.parent_id) for c in failed)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Requisições GET "hedged" para cortar a cauda de latência
+
+Cada endpoint mantém uma janela das latências recentes. Quando um GET passa
+do percentil configurado dessa janela (p95 por padrão) sem resposta, uma
+cópia é enviada; a primeira resposta vence e a outra é descartada (cancelada
+se ainda não saiu da fila; uma requisição já em voo termina em segundo plano,
+porque requests/httpx síncronos não têm como abortá-la). A cópia só sai se
+houver token livre no rate limiter do cliente (try_acquire, sem esperar) e
+se as cópias não passarem de uma fração das requisições.
+
+A requisição original continua sendo medida até o fim mesmo quando perde,
+então as estatísticas comparam a latência sem hedge (a original) com a
+latência entregue (a vencedora) e o custo em requisições extras.
+
+Ativado no SiengeClient com hedge=HedgePolicy() ou pela variável de ambiente
+SIENGE_HEDGE (ex.: "p95", "0.99"); com a variável o resumo é impresso no fim
+do processo. Streams (client.stream) não são duplicados.
+
+Uso:
+    SIENGE_HEDGE=p95 python test_all_sienge_endpoints.py
+    python hedging.py /customers --requests 400 --quantile 0.9
+"""
+
+import argparse
+import atexit
+import os
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+HEDGE_ENV = "SIENGE_HEDGE"
+
+DEFAULT_QUANTILE = 0.95
+# Latências guardadas por endpoint e mínimo antes de começar a duplicar
+WINDOW = 256
+MIN_SAMPLES = 20
+# Nunca duplica antes disso, mesmo em endpoints muito rápidos
+MIN_DELAY = 0.02
+# Cópias permitidas, como fração das requisições
+MAX_EXTRA = 0.10
+WORKERS = 32
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Percentil por posição (nearest-rank) de uma lista não vazia"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(q * len(ordered) + 0.5) - 1))]
+
+
+def parse_quantile(value: str) -> float:
+    """"p95", "95" ou "0.95" -> 0.95"""
+    value = value.strip().lower().lstrip("p")
+    number = float(value)
+    return number / 100 if number > 1 else number
+
+
+@dataclass
+class EndpointStats:
+    """Contagens e latências de um endpoint"""
+    requests: int = 0
+    hedged: int = 0
+    hedge_wins: int = 0
+    # Latência da requisição original (o que teria sido sem hedge) e a entregue
+    primary: List[float] = field(default_factory=list)
+    delivered: List[float] = field(default_factory=list)
+
+
+class HedgePolicy:
+    """Decide quando duplicar um GET e executa a corrida entre as duas cópias"""
+
+    def __init__(self, quantile: float = DEFAULT_QUANTILE, min_samples: int = MIN_SAMPLES,
+                 min_delay: float = MIN_DELAY, max_extra: float = MAX_EXTRA,
+                 window: int = WINDOW, workers: int = WORKERS):
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.max_extra = max_extra
+        self._latencies: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=window))
+        self._stats: Dict[str, EndpointStats] = defaultdict(EndpointStats)
+        self._requests = 0
+        self._hedged = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="hedge")
+
+    @classmethod
+    def from_env(cls) -> Optional["HedgePolicy"]:
+        """Política do processo quando SIENGE_HEDGE está definida (resumo impresso no atexit)"""
+        global _env_policy
+        value = os.environ.get(HEDGE_ENV)
+        if not value:
+            return None
+        with _env_lock:
+            if _env_policy is None:
+                _env_policy = cls(parse_quantile(value))
+                atexit.register(_env_policy.print_summary)
+        return _env_policy
+
+    def delay_for(self, endpoint: str) -> Optional[float]:
+        """Espera antes da cópia, ou None enquanto a janela ainda é pequena"""
+        with self._lock:
+            samples = list(self._latencies[endpoint])
+        if len(samples) < self.min_samples:
+            return None
+        return max(self.min_delay, percentile(samples, self.quantile))
+
+    def _observe(self, endpoint: str, seconds: float, primary: bool, ok: bool = True):
+        with self._lock:
+            # Só respostas válidas alimentam o percentil; a original entra sempre no "sem hedge"
+            if ok:
+                self._latencies[endpoint].append(seconds)
+            if primary:
+                self._stats[endpoint].primary.append(seconds)
+
+    def _take_budget(self, rate_limiter) -> bool:
+        with self._lock:
+            if self._hedged + 1 > self.max_extra * self._requests:
+                return False
+            if rate_limiter is not None and not rate_limiter.try_acquire():
+                return False
+            self._hedged += 1
+            return True
+
+    def _timed(self, endpoint: str, send: Callable[[], Any], primary: bool) -> Callable[[], Any]:
+        def attempt():
+            start = time.perf_counter()
+            try:
+                response = send()
+            except Exception:
+                self._observe(endpoint, time.perf_counter() - start, primary, ok=False)
+                raise
+            status = getattr(response, "status_code", 200)
+            self._observe(endpoint, time.perf_counter() - start, primary,
+                          ok=status < 500 and status != 429)
+            return response
+        return attempt
+
+    def run(self, endpoint: str, send: Callable[[], Any], rate_limiter=None,
+            metrics=None) -> Any:
+        """
+        Executa `send` (o GET já com token do rate limiter) e, se ele demorar
+        além do percentil do endpoint, uma cópia; devolve a primeira resposta
+        bem-sucedida, ou o erro da original se as duas falharem
+        """
+        start = time.perf_counter()
+        with self._lock:
+            self._requests += 1
+            stats = self._stats[endpoint]
+            stats.requests += 1
+        delay = self.delay_for(endpoint)
+        primary = self._executor.submit(self._timed(endpoint, send, True))
+        futures: List[Future] = [primary]
+
+        if delay is not None:
+            done, _ = wait(futures, timeout=delay)
+            if not done:
+                if self._take_budget(rate_limiter):
+                    futures.append(self._executor.submit(self._timed(endpoint, send, False)))
+                    with self._lock:
+                        stats.hedged += 1
+                    if metrics is not None:
+                        metrics.observe_hedge(endpoint, "sent")
+                elif metrics is not None:
+                    metrics.observe_hedge(endpoint, "skipped")
+
+        winner = self._first_success(futures)
+        for future in futures:
+            if future is not winner:
+                future.cancel()
+        with self._lock:
+            stats.delivered.append(time.perf_counter() - start)
+            if winner is not primary:
+                stats.hedge_wins += 1
+        if winner is not primary and metrics is not None:
+            metrics.observe_hedge(endpoint, "won")
+        return winner.result()
+
+    @staticmethod
+    def _first_success(futures: List[Future]) -> Future:
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    status = getattr(future.result(), "status_code", 200)
+                    if status < 500 or not pending:
+                        return future
+        # Todas falharam: devolve a original (com a exceção dela)
+        return futures[0]
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """Por endpoint: p50/p99 sem e com hedge, cópias enviadas e vencedoras"""
+        with self._lock:
+            items = [(endpoint, EndpointStats(s.requests, s.hedged, s.hedge_wins,
+                                              list(s.primary), list(s.delivered)))
+                     for endpoint, s in self._stats.items()]
+        result = {}
+        for endpoint, stats in sorted(items):
+            result[endpoint] = {
+                "requests": stats.requests,
+                "hedged": stats.hedged,
+                "hedge_wins": stats.hedge_wins,
+                "extra_pct": 100.0 * stats.hedged / stats.requests if stats.requests else 0.0,
+                "p50_without": percentile(stats.primary, 0.5),
+                "p99_without": percentile(stats.primary, 0.99),
+                "p50_with": percentile(stats.delivered, 0.5),
+                "p99_with": percentile(stats.delivered, 0.99),
+            }
+        return result
+
+    def print_summary(self):
+        summary = self.summary()
+        if not summary:
+            return
+        print(f"\nHedging (p{self.quantile * 100:g} da janela, até {self.max_extra:.0%} de cópias):")
+        for endpoint, row in summary.items():
+            print_row(endpoint, row)
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_env_policy: Optional[HedgePolicy] = None
+_env_lock = threading.Lock()
+
+
+def _ms(seconds: Optional[float]) -> str:
+    return f"{seconds * 1000:7.1f}ms" if seconds is not None else f"{'-':>9}"
+
+
+def print_row(endpoint: str, row: Dict[str, Any]):
+    gain = ""
+    if row["p99_without"] and row["p99_with"] is not None:
+        gain = f" | p99 {row['p99_with'] / row['p99_without'] - 1:+.0%}"
+    print(f"  {endpoint:40} | {row['requests']:5} reqs | +{row['hedged']:4} cópias "
+          f"({row['extra_pct']:4.1f}%, {row['hedge_wins']} venceram) | "
+          f"p50 {_ms(row['p50_without'])} -> {_ms(row['p50_with'])} | "
+          f"p99 {_ms(row['p99_without'])} -> {_ms(row['p99_with'])}{gain}")
+
+
+def main(argv=None) -> int:
+    from sienge_client import SiengeClient
+    from probe_engine import TokenBucket
+
+    parser = argparse.ArgumentParser(description="Mede o efeito do hedging num endpoint")
+    parser.add_argument("endpoint", help="Endpoint relativo, ex. /customers")
+    parser.add_argument("--bulk", action="store_true", help="Usa a base bulk-data/v1")
+    parser.add_argument("--requests", type=int, default=300, help="GETs enviados")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--quantile", type=parse_quantile, default=DEFAULT_QUANTILE)
+    parser.add_argument("--max-extra", type=float, default=MAX_EXTRA,
+                        help="Fração máxima de cópias")
+    parser.add_argument("--param", action="append", default=[], metavar="NOME=VALOR")
+    args = parser.parse_args(argv)
+
+    policy = HedgePolicy(args.quantile, max_extra=args.max_extra)
+    client = SiengeClient.from_env(pool_size=args.concurrency * 2,
+                                   rate_limiter=TokenBucket(), hedge=policy)
+    params = dict(item.split("=", 1) for item in args.param)
+    params.setdefault("limit", 1)
+    errors = 0
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            for response in executor.map(
+                    lambda _: client.get(args.endpoint, params=params, bulk=args.bulk),
+                    range(args.requests)):
+                errors += response.status_code != 200
+    except Exception as e:
+        print(f"[ERRO] {type(e).__name__}: {e}")
+        return 1
+    finally:
+        client.close()
+        policy.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"{args.requests} GETs em {elapsed:.1f}s ({errors} com status diferente de 200)")
+    for endpoint, row in policy.summary().items():
+        print_row(endpoint, row)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
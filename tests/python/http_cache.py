@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+Cache em disco das respostas GET da API Sienge
+
+Chave = método + URL + parâmetros normalizados (e o usuário autenticado). Os
+corpos ficam em arquivos nomeados pelo SHA-256 do conteúdo e o índice em
+SQLite, com TTL por endpoint, limite de tamanho com despejo LRU, revalidação
+condicional (ETag / Last-Modified) e estatísticas de acerto, acumuladas no
+próprio índice entre execuções.
+
+Ativado no SiengeClient com cache=HttpCache(...) ou pela variável de ambiente
+SIENGE_CACHE_DIR.
+
+Uso:
+    python http_cache.py --stats
+    python http_cache.py --clear
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+CACHE_DIR_ENV = "SIENGE_CACHE_DIR"
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+
+# TTL (segundos) dos endpoints de referência, que quase nunca mudam
+DAY = 24 * 60 * 60
+DEFAULT_TTLS = {
+    "/customer-types": DAY,
+    "/indexers": DAY,
+    "/units/situations": DAY,
+    "/units/characteristics": DAY,
+    "/construction-daily-report/types": DAY,
+    "/construction-daily-report/event-type": DAY,
+    # Pais do fan-out por empresa/empreendimento (fanout.py)
+    "/companies": DAY // 4,
+    "/enterprises": DAY // 4,
+}
+
+# Headers da resposta guardados junto com o corpo (em minúsculas)
+KEPT_HEADERS = ("content-type", "etag", "last-modified", "cache-control")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    body_hash TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    headers TEXT NOT NULL,
+    stored_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS stats (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+STAT_NAMES = ("hits", "misses", "revalidated", "stores", "evictions")
+
+
+@dataclass
+class CacheEntry:
+    """Resposta guardada no cache"""
+    key: str
+    url: str
+    body_hash: str
+    size: int
+    headers: Dict[str, str]
+    stored_at: float
+    expires_at: float
+
+    @property
+    def fresh(self) -> bool:
+        return time.time() < self.expires_at
+
+    @property
+    def validators(self) -> Dict[str, str]:
+        """Headers condicionais para revalidar a entrada no servidor"""
+        conditional = {}
+        if self.headers.get("etag"):
+            conditional["If-None-Match"] = self.headers["etag"]
+        if self.headers.get("last-modified"):
+            conditional["If-Modified-Since"] = self.headers["last-modified"]
+        return conditional
+
+
+def kept_headers(headers: Dict[str, str]) -> Dict[str, str]:
+    """Headers relevantes para o cache, com nomes normalizados"""
+    lowered = {name.lower(): value for name, value in headers.items()}
+    return {name: lowered[name] for name in KEPT_HEADERS if lowered.get(name)}
+
+
+def cache_key(method: str, url: str, params: Optional[Dict[str, Any]] = None,
+              user: str = "") -> str:
+    """Chave estável: ordem dos parâmetros e None não importam"""
+    normalized = sorted((str(k), str(v)) for k, v in (params or {}).items() if v is not None)
+    raw = json.dumps([method.upper(), url, normalized, user], separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class HttpCache:
+    """Cache de respostas endereçado por conteúdo, com índice SQLite"""
+
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_MAX_BYTES,
+                 ttls: Optional[Dict[str, float]] = None, default_ttl: float = 0):
+        self.directory = Path(directory)
+        self.blobs = self.directory / "blobs"
+        self.blobs.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.ttls = DEFAULT_TTLS if ttls is None else ttls
+        self.default_ttl = default_ttl
+        # Contadores desta instância; os acumulados ficam na tabela stats
+        self.stats = {name: 0 for name in STAT_NAMES}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.directory / "index.db"),
+                                     check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    @classmethod
+    def from_env(cls) -> Optional["HttpCache"]:
+        directory = os.environ.get(CACHE_DIR_ENV)
+        return cls(directory) if directory else None
+
+    def ttl_for(self, url: str) -> float:
+        """TTL do endpoint mais específico cujo path termina a URL"""
+        path = urlsplit(url).path.rstrip("/")
+        matches = [p for p in self.ttls if path.endswith(p)]
+        return self.ttls[max(matches, key=len)] if matches else self.default_ttl
+
+    def lookup(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT key, url, body_hash, size, headers, stored_at, expires_at "
+                "FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        entry = CacheEntry(row[0], row[1], row[2], row[3], json.loads(row[4]), row[5], row[6])
+        if not (self.blobs / entry.body_hash).exists():
+            self._delete(key)
+            return None
+        return entry
+
+    def read_body(self, entry: CacheEntry) -> Optional[bytes]:
+        """Corpo da entrada; None se um evict concorrente apagou o arquivo depois do lookup"""
+        with self._lock:
+            self._conn.execute("UPDATE entries SET last_access = ? WHERE key = ?",
+                               (time.time(), entry.key))
+        try:
+            return (self.blobs / entry.body_hash).read_bytes()
+        except FileNotFoundError:
+            self._delete(entry.key)
+            return None
+
+    def _count(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
+            self._conn.execute(
+                "INSERT INTO stats (name, value) VALUES (?, 1) "
+                "ON CONFLICT (name) DO UPDATE SET value = value + 1", (name,))
+
+    def hit(self, entry: CacheEntry) -> Optional[bytes]:
+        content = self.read_body(entry)
+        if content is not None:
+            self._count("hits")
+        return content
+
+    def miss(self):
+        self._count("misses")
+
+    def cacheable(self, url: str, status_code: int, headers: Dict[str, str]) -> bool:
+        """200 sem no-store, com TTL configurado ou validadores para revalidar"""
+        if status_code != 200:
+            return False
+        kept = kept_headers(headers)
+        if "no-store" in kept.get("cache-control", "").lower():
+            return False
+        return self.ttl_for(url) > 0 or "etag" in kept or "last-modified" in kept
+
+    def store(self, key: str, url: str, content: bytes, headers: Dict[str, str]):
+        body_hash = hashlib.sha256(content).hexdigest()
+        blob = self.blobs / body_hash
+        if not blob.exists():
+            self._write_blob(blob, content)
+
+        kept = kept_headers(headers)
+        now = time.time()
+        with self._lock:
+            # Um _drop_blob_if_orphan concorrente pode ter apagado o arquivo antes da entrada existir
+            if not blob.exists():
+                self._write_blob(blob, content)
+            old = self._conn.execute("SELECT body_hash FROM entries WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, url, body_hash, size, headers, "
+                "stored_at, expires_at, last_access) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, url, body_hash, len(content), json.dumps(kept), now,
+                 now + self.ttl_for(url), now))
+        if old and old[0] != body_hash:
+            self._drop_blob_if_orphan(old[0])
+        self._count("stores")
+        self.evict()
+
+    @staticmethod
+    def _write_blob(blob: Path, content: bytes):
+        tmp = blob.with_suffix(f".{threading.get_ident()}.tmp")
+        tmp.write_bytes(content)
+        os.replace(tmp, blob)
+
+    def revalidated(self, entry: CacheEntry, headers: Dict[str, str]) -> Optional[bytes]:
+        """304: renova a validade da entrada e devolve o corpo guardado (None se foi despejado)"""
+        merged = {**entry.headers, **kept_headers(headers)}
+        with self._lock:
+            self._conn.execute("UPDATE entries SET headers = ?, expires_at = ? WHERE key = ?",
+                               (json.dumps(merged), time.time() + self.ttl_for(entry.url), entry.key))
+        content = self.read_body(entry)
+        if content is not None:
+            self._count("revalidated")
+        return content
+
+    def _delete(self, key: str):
+        with self._lock:
+            row = self._conn.execute("SELECT body_hash FROM entries WHERE key = ?", (key,)).fetchone()
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+        if row:
+            self._drop_blob_if_orphan(row[0])
+
+    def _drop_blob_if_orphan(self, body_hash: str):
+        # Verificação e remoção sob o mesmo lock que store() usa para gravar a entrada
+        with self._lock:
+            used = self._conn.execute("SELECT 1 FROM entries WHERE body_hash = ? LIMIT 1",
+                                      (body_hash,)).fetchone()
+            if not used:
+                try:
+                    (self.blobs / body_hash).unlink()
+                except FileNotFoundError:
+                    pass
+
+    def total_bytes(self) -> int:
+        """Bytes em disco (corpos idênticos contam uma vez)"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM "
+                "(SELECT body_hash, MAX(size) AS size FROM entries GROUP BY body_hash)").fetchone()
+        return row[0]
+
+    def evict(self):
+        """Despeja as entradas menos usadas até caber no limite"""
+        if self.total_bytes() <= self.max_bytes:
+            return
+        with self._lock:
+            keys = [row[0] for row in self._conn.execute(
+                "SELECT key FROM entries ORDER BY last_access")]
+        for key in keys:
+            self._delete(key)
+            self._count("evictions")
+            if self.total_bytes() <= self.max_bytes:
+                break
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.execute("DELETE FROM stats")
+            for blob in self.blobs.iterdir():
+                blob.unlink()
+
+    def totals(self) -> Dict[str, int]:
+        """Contadores acumulados de todas as execuções que usaram este diretório"""
+        with self._lock:
+            rows = dict(self._conn.execute("SELECT name, value FROM stats").fetchall())
+        return {name: rows.get(name, 0) for name in STAT_NAMES}
+
+    def summary(self, accumulated: bool = False) -> Dict[str, Any]:
+        """Acertos, tamanho e taxa de acerto desta instância (ou acumulados)"""
+        stats = self.totals() if accumulated else dict(self.stats)
+        requests_seen = stats["hits"] + stats["misses"] + stats["revalidated"]
+        served = stats["hits"] + stats["revalidated"]
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        return {
+            **stats,
+            "hit_rate": round(served / requests_seen, 4) if requests_seen else 0.0,
+            "entries": entries,
+            "bytes": self.total_bytes(),
+        }
+
+    def close(self):
+        self._conn.close()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Cache em disco das respostas da API Sienge")
+    parser.add_argument("--dir", default=os.environ.get(CACHE_DIR_ENV, ".sienge_cache"))
+    parser.add_argument("--stats", action="store_true",
+                        help="Mostra entradas, tamanho e acertos acumulados")
+    parser.add_argument("--clear", action="store_true", help="Apaga todo o cache")
+    args = parser.parse_args(argv)
+
+    cache = HttpCache(args.dir)
+    if args.clear:
+        cache.clear()
+        print(f"[OK] Cache apagado: {args.dir}")
+    summary = cache.summary(accumulated=True)
+    print(f"Cache: {args.dir} | {summary['entries']} entradas | {summary['bytes'] / 1024:.1f} KB")
+    if args.stats:
+        print(f"  {summary['hits']} acertos | {summary['revalidated']} revalidados (304) | "
+              f"{summary['misses']} faltas | taxa de acerto {summary['hit_rate']:.1%} | "
+              f"{summary['stores']} gravações | {summary['evictions']} despejos")
+        with cache._lock:
+            rows = cache._conn.execute(
+                "SELECT url, size, expires_at FROM entries ORDER BY url").fetchall()
+        for url, size, expires_at in rows:
+            status = "válido" if expires_at > time.time() else "expirado"
+            print(f"  {status:8} | {size:>9} B | {url}")
+    cache.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,184 @@
+"""
+Decodificação JSON em streaming das respostas da API Sienge
+
+Percorre o corpo pedaço a pedaço e entrega os registros do array de dados
+(data/results/records/items, ou o array raiz) um de cada vez, sem montar a
+árvore inteira nem guardar os bytes brutos. As demais chaves de topo, como
+resultSetMetadata, ficam disponíveis em `metadata` ao fim da leitura.
+
+Cada registro é decodificado com json.JSONDecoder.raw_decode (em C), então a
+vazão fica próxima à do json.loads do corpo inteiro.
+"""
+
+import codecs
+import json
+import re
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+from metrics import endpoint_label
+from pagination import RECORD_KEYS, PageError
+from profiling import phased
+
+CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+# Caracteres que podem vir logo depois de um número completo
+_NUMBER_END = ",]} \t\n\r"
+_decoder = json.JSONDecoder()
+
+
+class RecordStream:
+    """Iterável de registros sobre pedaços de bytes de uma resposta JSON"""
+
+    def __init__(self, chunks: Iterable[bytes], record_keys: Tuple[str, ...] = RECORD_KEYS):
+        self.record_keys = record_keys
+        # Chaves de topo fora do array de registros (ex.: resultSetMetadata)
+        self.metadata: Dict[str, Any] = {}
+        self.record_key: Optional[str] = None
+        self.is_array = False
+        self.count = 0
+        self._chunks = chunks
+        self._consumed = False
+
+    @property
+    def result_set_metadata(self) -> Dict[str, Any]:
+        return self.metadata.get("resultSetMetadata") or {}
+
+    @property
+    def structure(self) -> str:
+        """Mesma descrição de estrutura usada por test_all_sienge_endpoints"""
+        if self.is_array:
+            return "array"
+        if self.record_key == "results":
+            return "results + metadata"
+        if self.record_key:
+            return self.record_key
+        return f"object with keys: {list(self.metadata.keys())[:5]}"
+
+    def __iter__(self) -> Iterator[Any]:
+        if self._consumed:
+            raise RuntimeError("RecordStream só pode ser percorrido uma vez")
+        self._consumed = True
+        for record in phased("decode", _iter_scan(self._chunks, self)):
+            self.count += 1
+            yield record
+
+    def drain(self) -> int:
+        """Consome o restante do stream e devolve o total de registros"""
+        for _ in self:
+            pass
+        return self.count
+
+
+class _TextBuffer:
+    """Texto decodificado sob demanda, descartando o que já foi consumido"""
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self.text = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        """Lê o próximo pedaço; False quando o corpo acabou"""
+        if self.eof:
+            return False
+        for chunk in self._chunks:
+            decoded = self._utf8.decode(chunk)
+            if decoded:
+                self.text = self.text[self.pos:] + decoded
+                self.pos = 0
+                return True
+        self.text = self.text[self.pos:] + self._utf8.decode(b"", final=True)
+        self.pos = 0
+        self.eof = True
+        return False
+
+    def peek(self) -> Optional[str]:
+        """Próximo caractere não branco (None no fim do corpo)"""
+        while True:
+            self.pos = _WHITESPACE.match(self.text, self.pos).end()
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self.fill():
+                return None
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise ValueError(f"JSON inválido: esperado {char!r} na posição {self.pos}")
+        self.pos += 1
+
+    def value(self) -> Any:
+        """Decodifica o próximo valor JSON completo"""
+        self.peek()
+        while True:
+            try:
+                obj, end = _decoder.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            # Número no fim do buffer, ou seguido de algo que não o encerra ("1." ou
+            # "2.5E+" antes de "5]"), pode estar cortado: o raw_decode aceita o prefixo
+            if isinstance(obj, (int, float)) and not isinstance(obj, bool) \
+                    and (end == len(self.text) or self.text[end] not in _NUMBER_END) \
+                    and self.fill():
+                continue
+            self.pos = end
+            return obj
+
+
+def _scan_items(buffer: _TextBuffer) -> Iterator[Any]:
+    buffer.expect("[")
+    if buffer.peek() == "]":
+        buffer.pos += 1
+        return
+    while True:
+        yield buffer.value()
+        char = buffer.peek()
+        buffer.pos += 1
+        if char == "]":
+            return
+        if char != ",":
+            raise ValueError(f"JSON inválido: esperado ',' ou ']' na posição {buffer.pos - 1}")
+
+
+def _iter_scan(chunks: Iterable[bytes], stream: RecordStream) -> Iterator[Any]:
+    buffer = _TextBuffer(chunks)
+    first = buffer.peek()
+    if first == "[":
+        stream.is_array = True
+        yield from _scan_items(buffer)
+        return
+    buffer.expect("{")
+    while True:
+        char = buffer.peek()
+        if char == "}":
+            buffer.pos += 1
+            return
+        if char == ",":
+            buffer.pos += 1
+            continue
+        key = buffer.value()
+        buffer.expect(":")
+        if stream.record_key is None and key in stream.record_keys and buffer.peek() == "[":
+            stream.record_key = key
+            yield from _scan_items(buffer)
+        else:
+            stream.metadata[key] = buffer.value()
+
+
+def stream_records(client, path: str, params: Optional[Dict[str, Any]] = None,
+                   bulk: bool = False, chunk_size: int = CHUNK_SIZE) -> Iterator[Any]:
+    """Gera os registros de uma única requisição GET sem carregar o corpo inteiro"""
+    with client.stream("GET", path, params=params, bulk=bulk) as response:
+        if response.status_code != 200:
+            raise PageError(response.url, response.status_code, response.read().decode("utf-8", "replace"))
+        records = RecordStream(response.iter_bytes(chunk_size))
+        count = 0
+        for record in records:
+            count += 1
+            yield record
+        if getattr(client, "metrics", None) is not None:
+            client.metrics.observe_records(endpoint_label(response.url), count)
@@ -0,0 +1,201 @@
+"""
+Motor de mapeamento compilado (registro da API -> linha do model)
+
+Em vez de percorrer o fieldMapping a cada registro, como processItem() da
+rota, cada endpoint é compilado uma vez em código Python especializado: os
+campos de origem são lidos uma vez, as cópias simples viram atribuições
+diretas e os transforms reconhecidos (datas, parseFloat, `val || []`...) são
+escritos em linha. Transforms escritos à mão continuam como chamadas.
+
+Dois modos de aplicação sobre uma página inteira:
+    rows(items)     lista de dicts, como map_item() para cada registro
+    columns(items)  dict campo -> lista de valores (UNDEFINED onde ausente)
+
+`new Date()` e getSaoPauloNow() são avaliados uma vez por chamada, então
+todos os registros de uma página recebem o mesmo instante.
+"""
+
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from endpoint_mappings import (UNDEFINED, EndpointMapping, FieldRule, js_date, js_date_text,
+                               parse_float, parse_int, utc_now)
+
+# Truthiness do JS em linha: [] e {} são verdadeiros, NaN é falso
+_TRUTHY = "(({v} or {v}.__class__ is list or {v}.__class__ is dict) and {v} == {v})"
+_DATE = "(js_date_text({v}) if {v}.__class__ is str else js_date({v}))"
+
+# Transforms sem efeito colateral nem exceção: repetidos para o mesmo alvo,
+# só o último precisa ser avaliado
+_PURE_KINDS = {"date_or_null", "date_or_now", "now", "sao_paulo_now", "float_or", "int_or",
+               "or_default", "nullish_default", "not_false", "truthy", "equals_any"}
+
+
+def _inline(rule: FieldRule, index: int, v: str = "v") -> str:
+    """Expressão Python do transform sobre a variável `v` (ou chamada da função original)"""
+    kind, args = rule.kind, rule.args
+    truthy, date = _TRUTHY.format(v=v), _DATE.format(v=v)
+    if kind == "date_or_null":
+        return f"({date} if {truthy} else None)"
+    if kind == "date_or_now":
+        return f"({date} if {truthy} else now)"
+    if kind == "now":
+        return "now"
+    if kind == "sao_paulo_now":
+        return "sp_now"
+    if kind == "float_or":
+        # Números do JSON já são float: parseFloat() os devolve como estão
+        number = f"({v} if {v}.__class__ is float else parse_float({v}))"
+        return f"({number} if {truthy} else {args[0]!r})"
+    if kind == "int_or":
+        return f"(parse_int({v}) if {truthy} else {args[0]!r})"
+    if kind == "or_default":
+        return f"({v} if {truthy} else {'[]' if isinstance(args[0], list) else repr(args[0])})"
+    if kind == "nullish_default":
+        return f"({v} if {v} is not U and {v} is not None else {args[0]!r})"
+    if kind == "not_false":
+        return f"({v} is not False)"
+    if kind == "truthy":
+        return f"bool({truthy})"
+    if kind == "equals_any" and all(isinstance(lit, (bool, str)) for lit in args[0]):
+        tests = [f"{v} is {lit!r}" if isinstance(lit, bool) else f"{v} == {lit!r}"
+                 for lit in args[0]]
+        return f"({' or '.join(tests)})"
+    return f"_f{index}({v}, item)"
+
+
+def _plan(mapping: EndpointMapping) -> Tuple[List[str], List[Tuple[str, List[int]]]]:
+    """Campos de origem distintos e, por alvo, os índices das regras que o escrevem"""
+    sources = list(dict.fromkeys(rule.source for rule in mapping.rules))
+    targets: Dict[str, List[int]] = {}
+    for index, rule in enumerate(mapping.rules):
+        targets.setdefault(rule.target, []).append(index)
+    return sources, list(targets.items())
+
+
+def _row_body(mapping: EndpointMapping, indent: str) -> List[str]:
+    """Corpo que monta `out` para um `item`: um dict literal e a remoção dos undefined"""
+    sources, targets = _plan(mapping)
+    slot = {source: f"s{i}" for i, source in enumerate(sources)}
+    lines = [f"{indent}g = item.get"]
+    lines += [f"{indent}{slot[source]} = g({source!r}, U)" for source in sources]
+    entries, copies = [], []
+    for target, indexes in targets:
+        for index in indexes[:-1]:
+            rule = mapping.rules[index]
+            # Regra sobrescrita pela última, mas que pode lançar exceção como no TS
+            if rule.transform is not None and rule.kind not in _PURE_KINDS:
+                lines.append(f"{indent}_f{index}({slot[rule.source]}, item)")
+        index = indexes[-1]
+        rule = mapping.rules[index]
+        if rule.transform is None:
+            entries.append(f"{target!r}: {slot[rule.source]}")
+            copies.append((target, slot[rule.source]))
+        else:
+            entries.append(f"{target!r}: {_inline(rule, index, slot[rule.source])}")
+    lines.append(f"{indent}out = {{")
+    lines += [f"{indent}    {entry}," for entry in entries]
+    lines.append(f"{indent}}}")
+    for target, variable in copies:
+        lines.append(f"{indent}if {variable} is U:")
+        lines.append(f"{indent}    del out[{target!r}]")
+    return lines
+
+
+def _columns_body(mapping: EndpointMapping) -> List[str]:
+    sources, targets = _plan(mapping)
+    slot = {source: f"s{i}" for i, source in enumerate(sources)}
+    lines = ["    cols = {}"]
+    lines += [f"    {slot[source]} = [item.get({source!r}, U) for item in items]"
+              for source in sources]
+    for target, indexes in targets:
+        for index in indexes[:-1]:
+            rule = mapping.rules[index]
+            if rule.transform is not None and rule.kind not in _PURE_KINDS:
+                lines.append(f"    for v, item in zip({slot[rule.source]}, items): _f{index}(v, item)")
+        index = indexes[-1]
+        rule = mapping.rules[index]
+        column = slot[rule.source]
+        if rule.transform is None:
+            lines.append(f"    cols[{target!r}] = {column}")
+        elif rule.kind in ("now", "sao_paulo_now"):
+            lines.append(f"    cols[{target!r}] = [{_inline(rule, index)}] * len(items)")
+        else:
+            expression = _inline(rule, index)
+            if "item" in expression:
+                lines.append(f"    cols[{target!r}] = [{expression} for v, item in zip({column}, items)]")
+            else:
+                lines.append(f"    cols[{target!r}] = [{expression} for v in {column}]")
+    lines.append("    return cols")
+    return lines
+
+
+def generate_source(mapping: EndpointMapping) -> str:
+    """Código Python gerado para o endpoint (útil para inspeção)"""
+    lines = ["def map_rows(items, now, sp_now, errors):",
+             "    result = []",
+             "    append = result.append",
+             "    for position, item in enumerate(items):",
+             "        try:"]
+    lines += _row_body(mapping, " " * 12)
+    lines += ["        except (TypeError, ValueError, AttributeError) as e:",
+              "            if errors is None:",
+              "                raise",
+              "            errors.append((position, e))",
+              "            out = None",
+              "        append(out)",
+              "    return result",
+              "",
+              "",
+              "def map_columns(items, now, sp_now):"]
+    lines += _columns_body(mapping)
+    return "\n".join(lines) + "\n"
+
+
+class CompiledMapping:
+    """fieldMapping de um endpoint compilado em funções Python especializadas"""
+
+    def __init__(self, mapping: EndpointMapping, clock: Callable[[], datetime] = utc_now):
+        self.mapping = mapping
+        self.clock = clock
+        self.source = generate_source(mapping)
+        namespace: Dict[str, Any] = {
+            "U": UNDEFINED, "js_date": js_date, "js_date_text": js_date_text,
+            "parse_float": parse_float, "parse_int": parse_int,
+        }
+        for index, rule in enumerate(mapping.rules):
+            if rule.transform is not None:
+                namespace[f"_f{index}"] = rule.transform
+        filename = f"<mapping {mapping.endpoint}>"
+        exec(compile(self.source, filename, "exec"), namespace)
+        self._rows = namespace["map_rows"]
+        self._columns = namespace["map_columns"]
+
+    def _instants(self, now: Optional[datetime]) -> Tuple[datetime, datetime]:
+        now = now or self.clock()
+        # getSaoPauloNow(): agora menos 3 horas
+        return now, now - timedelta(hours=3)
+
+    def __call__(self, item: Dict[str, Any], now: Optional[datetime] = None) -> Dict[str, Any]:
+        """Um registro mapeado (exceções do transform propagam, como map_item)"""
+        return self._rows((item,), *self._instants(now), None)[0]
+
+    def rows(self, items: List[Dict[str, Any]], now: Optional[datetime] = None,
+             errors: Optional[List[Tuple[int, Exception]]] = None) -> List[Optional[Dict[str, Any]]]:
+        """
+        Página mapeada registro a registro
+
+        Com `errors`, registros cujo transform lança exceção viram None e o par
+        (posição, exceção) é acrescentado à lista; sem ela, a exceção propaga.
+        """
+        return self._rows(items, *self._instants(now), errors)
+
+    def columns(self, items: List[Dict[str, Any]],
+                now: Optional[datetime] = None) -> Dict[str, List[Any]]:
+        """Página mapeada por coluna; campos ausentes ficam como UNDEFINED"""
+        return self._columns(items, *self._instants(now))
+
+
+def compile_all(mappings: Dict[str, EndpointMapping]) -> Dict[str, CompiledMapping]:
+    """Compila o fieldMapping de todos os endpoints"""
+    return {endpoint: CompiledMapping(mapping) for endpoint, mapping in mappings.items()}
@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""
+Paridade do motor de mapeamento compilado com o endpoint-mappings.ts
+
+Transpila o ENDPOINT_MAPPINGS do TypeScript para JavaScript (só removendo as
+anotações de tipo), roda no node o mesmo laço de processItem() da rota e
+compara, campo a campo, com CompiledMapping.rows() e .columns() para os mesmos
+registros: os gerados pelo mock_server e variações de borda de cada campo de
+origem (null, "", 0, "0", listas, objetos, datas ISO...).
+
+Diferenças conhecidas, fora da comparação:
+- A rota chama transform(valor) com um só argumento; aqui os dois lados usam
+  transform(valor, item), como declara a interface FieldMapping.
+- Strings de data fora do formato ISO não são geradas: o parser legado do V8
+  aceita quase qualquer texto ("12" vira 2001-12-01), e o lado Python as trata
+  como Invalid Date de propósito.
+
+O relógio é congelado nos dois lados e o node roda com TZ=UTC. Requer node.
+
+Uso:
+    python mapping_parity.py
+    python mapping_parity.py --records 2000 --endpoint bills --endpoint units
+    python mapping_parity.py --jsonl registros.jsonl --endpoint customers
+"""
+
+import argparse
+import json
+import math
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from endpoint_mappings import INVALID_DATE, UNDEFINED, MAPPINGS_TS, EndpointMapping, load_mappings
+from mapping_engine import CompiledMapping
+
+FROZEN_NOW = datetime(2025, 6, 15, 12, 34, 56, 789000, tzinfo=timezone.utc)
+
+_DATE_KINDS = ("date_or_null", "date_or_now")
+# Valores de borda aplicados a cada campo de origem mapeado
+EDGE_VALUES: List[Any] = [
+    None, "", " ", 0, 1, -1, 0.0, 2.5, "0", "1", "12.5abc", "  7", "-3.2e2", "Infinity",
+    "S", "N", "true", "false", True, False, [], [1, 2], {}, {"cityId": 3},
+    [{"street": "Rua A", "number": 10, "complement": "", "city": "X", "type": "R"}],
+    [{"logradouro": "Rua B", "numero": "", "cidade": "Y", "tipo": "C", "cep": "01000"}],
+]
+# Só ISO (e variações que o V8 trata pelo mesmo caminho): ver docstring
+EDGE_DATES: List[Any] = [
+    "2024-01-15", "2024-01-15T10:20:30", "2024-01-15T10:20:30.123456Z",
+    "2024-01-15T10:20:30-03:00", "2024-02-30", "2024-13-01", "2024-01-15T24:00:00Z",
+    "2024-01", "2024", "2024-01-15 10:20", "", None, 0, 1700000000000, True, [], {},
+]
+
+_RUNNER = r"""
+const { ENDPOINT_MAPPINGS } = require(process.env.MAPPINGS_JS);
+const FROZEN = Number(process.env.FROZEN_NOW_MS);
+const RealDate = Date;
+class FrozenDate extends RealDate {
+  constructor(...args) { if (args.length === 0) super(FROZEN); else super(...args); }
+  static now() { return FROZEN; }
+}
+globalThis.Date = FrozenDate;
+
+function canonical(value) {
+  if (value === undefined) return { $undefined: true };
+  if (value instanceof RealDate) {
+    const time = value.getTime();
+    return { $date: Number.isNaN(time) ? 'Invalid' : value.toISOString() };
+  }
+  if (typeof value === 'number' && !Number.isFinite(value)) return { $num: String(value) };
+  if (Array.isArray(value)) return value.map(canonical);
+  if (value !== null && typeof value === 'object') {
+    const out = {};
+    for (const [k, v] of Object.entries(value)) out[k] = canonical(v);
+    return out;
+  }
+  return value;
+}
+
+// Mesmo laço de processItem() (app/api/sync/direct/[endpoint]/route.ts)
+function processItem(mapping, item) {
+  const mapped = {};
+  for (const [sourceField, config] of Object.entries(mapping.fieldMapping)) {
+    const sourceValue = item[sourceField];
+    if (typeof config === 'string') {
+      mapped[config] = sourceValue;
+    } else {
+      const target = config.field || sourceField;
+      mapped[target] = config.transform ? config.transform(sourceValue, item) : sourceValue;
+    }
+  }
+  for (const key of Object.keys(mapped)) if (mapped[key] === undefined) delete mapped[key];
+  return mapped;
+}
+
+const input = JSON.parse(require('fs').readFileSync(0, 'utf8'));
+const output = {};
+for (const [endpoint, items] of Object.entries(input)) {
+  output[endpoint] = items.map((item) => {
+    try {
+      return canonical(processItem(ENDPOINT_MAPPINGS[endpoint], item));
+    } catch (e) {
+      return { $error: String(e && e.name) };
+    }
+  });
+}
+process.stdout.write(JSON.stringify(output));
+"""
+
+_SAO_PAULO_NOW = """
+function getSaoPauloNow() {
+  const now = new Date();
+  now.setHours(now.getHours() - 3);
+  return now;
+}
+"""
+
+
+def _strip_params(params: str) -> str:
+    """`val: any, data?: any` -> `val, data`"""
+    names = []
+    for param in params.split(","):
+        name = param.split(":", 1)[0].strip().rstrip("?")
+        if name:
+            names.append(name)
+    return ", ".join(names)
+
+
+def transpile(source: str) -> str:
+    """ENDPOINT_MAPPINGS do .ts como módulo CommonJS (sem tipos nem imports)"""
+    text = re.sub(r"^import .*?;\s*$", "", source, flags=re.M)
+    text = re.sub(r"export interface \w+\s*\{[^}]*\}", "", text)
+    text = re.sub(r"export const (\w+)\s*:\s*[^=]+=", r"const \1 =", text)
+    text = re.sub(r"\(([^()]*)\)\s*=>", lambda m: f"({_strip_params(m.group(1))}) =>", text)
+    # As funções utilitárias do final não interessam à comparação
+    cut = text.find("\nexport function")
+    if cut >= 0:
+        text = text[:cut]
+    return _SAO_PAULO_NOW + text + "\nmodule.exports = { ENDPOINT_MAPPINGS };\n"
+
+
+def canonical(value: Any) -> Any:
+    """Valor do lado Python na mesma forma que o runner do node serializa"""
+    if value is UNDEFINED:
+        return {"$undefined": True}
+    if value is INVALID_DATE:
+        return {"$date": "Invalid"}
+    if isinstance(value, datetime):
+        moment = value.astimezone(timezone.utc)
+        return {"$date": moment.strftime("%Y-%m-%dT%H:%M:%S.") + f"{moment.microsecond // 1000:03d}Z"}
+    if isinstance(value, bool) or value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)):
+        if isinstance(value, float) and not math.isfinite(value):
+            return {"$num": "NaN" if math.isnan(value) else ("Infinity" if value > 0 else "-Infinity")}
+        return value
+    if isinstance(value, list):
+        return [canonical(v) for v in value]
+    if isinstance(value, dict):
+        return {k: canonical(v) for k, v in value.items()}
+    return repr(value)
+
+
+def same(a: Any, b: Any) -> bool:
+    """Igualdade estrita: bool não é número, e 1 == 1.0 (JS só tem number)"""
+    if isinstance(a, bool) or isinstance(b, bool):
+        return a is b
+    if isinstance(a, (int, float)) and isinstance(b, (int, float)):
+        return a == b
+    if isinstance(a, list) and isinstance(b, list):
+        return len(a) == len(b) and all(same(x, y) for x, y in zip(a, b))
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(same(a[k], b[k]) for k in a)
+    return type(a) is type(b) and a == b
+
+
+def run_node(mappings_ts: Path, items: Dict[str, List[Dict[str, Any]]],
+             now: datetime = FROZEN_NOW, node: str = "node") -> Dict[str, List[Any]]:
+    """Resultado de processItem() no node para os registros de cada endpoint"""
+    with tempfile.TemporaryDirectory() as tmp:
+        module = Path(tmp) / "endpoint-mappings.js"
+        module.write_text(transpile(mappings_ts.read_text(encoding="utf-8")), encoding="utf-8")
+        env = dict(os.environ, TZ="UTC", MAPPINGS_JS=str(module),
+                   FROZEN_NOW_MS=str(int(now.timestamp() * 1000)))
+        result = subprocess.run([node, "-e", _RUNNER], input=json.dumps(items),
+                                capture_output=True, text=True, env=env, check=False)
+    if result.returncode != 0:
+        raise RuntimeError(f"node falhou: {result.stderr.strip()[-500:]}")
+    return json.loads(result.stdout)
+
+
+def python_rows(mapping: EndpointMapping, items: List[Dict[str, Any]],
+                now: datetime = FROZEN_NOW) -> List[Any]:
+    """Resultado do motor compilado, registro a registro, na forma canônica"""
+    compiled = CompiledMapping(mapping, clock=lambda: now)
+    errors: List = []
+    rows = compiled.rows(items, now=now, errors=errors)
+    failed = {position: type(error).__name__ for position, error in errors}
+    return [{"$error": failed[i]} if row is None else canonical(row)
+            for i, row in enumerate(rows)]
+
+
+def python_columns(mapping: EndpointMapping, items: List[Dict[str, Any]],
+                   now: datetime = FROZEN_NOW) -> List[Any]:
+    """Resultado do modo colunar remontado em registros (página sem erros)"""
+    columns = CompiledMapping(mapping, clock=lambda: now).columns(items, now=now)
+    return [canonical({name: values[i] for name, values in columns.items()
+                       if values[i] is not UNDEFINED})
+            for i in range(len(items))]
+
+
+def edge_items(mapping: EndpointMapping, base: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """Um registro por (campo de origem, valor de borda) sobre um registro base"""
+    base = base or {}
+    date_sources = {rule.source for rule in mapping.rules if rule.kind in _DATE_KINDS}
+    items = []
+    for source in dict.fromkeys(rule.source for rule in mapping.rules):
+        values = EDGE_DATES if source in date_sources else EDGE_VALUES
+        for value in values:
+            item = dict(base)
+            item[source] = value
+            items.append(item)
+        missing = dict(base)
+        missing.pop(source, None)
+        items.append(missing)
+    # personType guia os transforms de cpf/cnpj dos clientes
+    for person_type in ("PHYSICAL", "LEGAL"):
+        for cpf, cnpj in (("123", None), (None, "456"), ("123", "456"), ("", "")):
+            items.append(dict(base, personType=person_type, cpfCnpj=cpf, cpf=cpf, cnpj=cnpj))
+    return items
+
+
+def date_overrides(spec, date_start: str, date_end: str) -> Dict[str, str]:
+    """Parâmetros de data obrigatórios cobrindo todo o período gerado pelo mock"""
+    overrides = {}
+    for param in spec.required_query:
+        if param.is_date and param.name != "monthYear":
+            lowered = param.name.lower()
+            start = "start" in lowered or lowered.endswith("after")
+            overrides[param.name] = date_start if start else date_end
+    return overrides
+
+
+def mock_records(endpoints: Iterable[str], count: int) -> Dict[str, List[Dict[str, Any]]]:
+    """Registros de cada endpoint gerados pelo mock_server"""
+    from mock_server import MockConfig, start_mock_server
+    from pagination import iter_records
+    from sienge_client import SiengeClient
+    from spec_index import load_index
+
+    config = MockConfig(records=count)
+    index = load_index()
+    server, base_url = start_mock_server(config)
+    client = SiengeClient("abf", "mock", "mock", base_url=base_url)
+    records = {}
+    try:
+        for endpoint in endpoints:
+            records[endpoint] = []
+            # Parâmetros obrigatórios (ex. contractStartDate/contractEndDate) vêm do índice
+            spec = index.resolve(f"/{endpoint}")
+            if spec is None:
+                print(f"[AVISO] {endpoint}: fora das especificações, mock sem registros")
+                continue
+            request = index.build_request(spec, date_overrides(spec, config.date_start,
+                                                               config.date_end))
+            if not request.ready:
+                print(f"[AVISO] {endpoint}: mock sem registros (falta {', '.join(request.missing)})")
+                continue
+            params = {k: v for k, v in request.params.items() if k not in ("limit", "offset")}
+            try:
+                records[endpoint] = list(iter_records(client, request.path, params, bulk=spec.bulk,
+                                                      max_records=count))
+            except Exception as e:
+                print(f"[AVISO] {endpoint}: mock sem registros ({str(e)[:80]})")
+                records[endpoint] = []
+    finally:
+        client.close()
+        server.shutdown()
+    return records
+
+
+def compare(mappings: Dict[str, EndpointMapping], items: Dict[str, List[Dict[str, Any]]],
+            mappings_ts: Path = MAPPINGS_TS, node: str = "node",
+            show: int = 3) -> int:
+    """Compara os dois lados e imprime as divergências; devolve quantas houve"""
+    expected = run_node(mappings_ts, items, node=node)
+    total = 0
+    for endpoint, records in items.items():
+        mapping = mappings[endpoint]
+        rows = python_rows(mapping, records)
+        mismatches = [i for i, (js, py) in enumerate(zip(expected[endpoint], rows))
+                      if not same(js, py)]
+        column_note = ""
+        if not any("$error" in row for row in rows):
+            columns = python_columns(mapping, records)
+            column_bad = sum(not same(js, py) for js, py in zip(expected[endpoint], columns))
+            mismatches += [-1] * column_bad
+            column_note = f", colunar {'ok' if not column_bad else f'{column_bad} divergências'}"
+        errors = sum("$error" in row for row in rows)
+        status = "[OK]" if not mismatches else "[ERRO]"
+        print(f"{status} {endpoint}: {len(records)} registros, {errors} com erro de transform"
+              f"{column_note}")
+        for i in [i for i in mismatches if i >= 0][:show]:
+            js, py = expected[endpoint][i], rows[i]
+            fields = sorted(k for k in set(js) | set(py) if not same(js.get(k), py.get(k)))
+            for key in fields[:5]:
+                print(f"    #{i} {key}: node={js.get(key)!r} python={py.get(key)!r}")
+        total += len(mismatches)
+    return total
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Compara o mapeamento compilado com o TS")
+    parser.add_argument("--endpoint", action="append", help="Endpoint (pode repetir; padrão: todos)")
+    parser.add_argument("--records", type=int, default=500, help="Registros do mock por endpoint")
+    parser.add_argument("--jsonl", help="Registros reais (JSONL) em vez do mock; exige um --endpoint")
+    parser.add_argument("--no-edges", action="store_true", help="Não gera os valores de borda")
+    parser.add_argument("--node", default=os.getenv("NODE", "node"))
+    args = parser.parse_args(argv)
+
+    if not shutil.which(args.node):
+        print(f"[ERRO] node não encontrado ({args.node})")
+        return 2
+    mappings = load_mappings()
+    endpoints = args.endpoint or list(mappings)
+    unknown = [e for e in endpoints if e not in mappings]
+    if unknown:
+        parser.error(f"sem mapeamento: {', '.join(unknown)}")
+
+    if args.jsonl:
+        if len(endpoints) != 1:
+            parser.error("--jsonl exige exatamente um --endpoint")
+        from pg_bulk_loader import read_jsonl
+        items = {endpoints[0]: list(read_jsonl(args.jsonl))}
+    else:
+        items = mock_records(endpoints, args.records)
+    if not args.no_edges:
+        for endpoint in endpoints:
+            base = items[endpoint][0] if items[endpoint] else None
+            items[endpoint] = items[endpoint] + edge_items(mappings[endpoint], base)
+
+    mismatches = compare(mappings, items, node=args.node)
+    if mismatches:
+        print(f"[ERRO] {mismatches} divergências entre o TS e o motor compilado")
+        return 1
+    print(f"[OK] Mapeamento idêntico ao TS em {sum(map(len, items.values()))} registros")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+Métricas por requisição do cliente Sienge em formato OpenMetrics
+
+O SiengeClient registra, por endpoint, histogramas das fases de cada
+requisição (dns, connect, tls, ttfb, download, decode e total), dos bytes
+recebidos e dos registros decodificados, além de um contador por status e
+outro das cópias de GET do hedging.py (enviadas, vencedoras e barradas pelo
+orçamento).
+Assim dá para separar latência do Sienge (ttfb), rede (dns/connect/tls/
+download) e custo nosso (decode) em uma execução lenta.
+
+Ativado no SiengeClient com metrics=MetricsRegistry() ou pela variável de
+ambiente SIENGE_METRICS_FILE, que grava o texto OpenMetrics ao fim do processo.
+api_metrics() devolve o mesmo conteúdo no formato do bloco "api" de
+app/api/metrics/route.ts.
+
+Uso:
+    SIENGE_METRICS_FILE=exports/sienge.prom python test_all_sienge_endpoints.py
+    python metrics.py exports/sienge.prom
+    python metrics.py exports/sienge.prom --json
+"""
+
+import argparse
+import atexit
+import json
+import os
+import re
+import sys
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from pagination import extract_page
+
+METRICS_FILE_ENV = "SIENGE_METRICS_FILE"
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+PHASES = ("dns", "connect", "tls", "ttfb", "download", "decode", "total")
+# Fases que dependem da rede (e não do Sienge nem do nosso código)
+NETWORK_PHASES = ("dns", "connect", "tls", "download")
+
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+BYTES_BUCKETS = tuple(1024 * 4 ** i for i in range(10))  # 1 KiB .. 256 MiB
+RECORDS_BUCKETS = (0, 1, 10, 50, 100, 200, 500, 1000, 5000, 10000, 50000, 100000)
+
+_NUMERIC_SEGMENT = re.compile(r"/\d+(?=/|$)")
+_API_ROOT = "/public/api"
+
+
+def endpoint_label(url: str) -> str:
+    """Path a partir da raiz da API, com ids numéricos trocados por {id}"""
+    path = urlsplit(url).path
+    root = path.find(_API_ROOT)
+    if root >= 0:
+        path = path[root + len(_API_ROOT):]
+    return _NUMERIC_SEGMENT.sub("/{id}", path) or "/"
+
+
+class Histogram:
+    """Histograma de buckets fixos (contagens não cumulativas; cumula ao exportar)"""
+
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        total, buckets = 0, []
+        for bound, count in zip(self.bounds + (float("inf"),), self.counts):
+            total += count
+            buckets.append(("+Inf" if bound == float("inf") else _number(bound), total))
+        return buckets
+
+
+def _number(value: float) -> str:
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: Dict[str, str]) -> str:
+    return ",".join(f'{key}="{_escape(str(value))}"' for key, value in labels.items())
+
+
+class MetricsRegistry:
+    """Histogramas e contadores por endpoint, compartilhados entre threads"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.created = datetime.now()
+        self._lock = threading.Lock()
+        self._phases: Dict[Tuple[str, str], Histogram] = {}
+        self._bytes: Dict[str, Histogram] = {}
+        self._records: Dict[str, Histogram] = {}
+        self._requests: Dict[Tuple[str, str, str], int] = defaultdict(int)
+        self._hedges: Dict[Tuple[str, str], int] = defaultdict(int)
+
+    @classmethod
+    def from_env(cls) -> Optional["MetricsRegistry"]:
+        """Registro do processo quando SIENGE_METRICS_FILE está definida (gravado no atexit)"""
+        global _env_registry
+        path = os.environ.get(METRICS_FILE_ENV)
+        if not path:
+            return None
+        with _env_lock:
+            if _env_registry is None or _env_registry.path != path:
+                _env_registry = cls(path)
+                atexit.register(_env_registry.write)
+        return _env_registry
+
+    def _histogram(self, table: Dict, key: Any, bounds: Tuple[float, ...]) -> Histogram:
+        histogram = table.get(key)
+        if histogram is None:
+            histogram = table[key] = Histogram(bounds)
+        return histogram
+
+    def observe_phases(self, endpoint: str, timings: Dict[str, float]):
+        with self._lock:
+            for phase, seconds in timings.items():
+                if phase in PHASES:
+                    self._histogram(self._phases, (endpoint, phase), SECONDS_BUCKETS).observe(seconds)
+
+    def observe_request(self, endpoint: str, status: int, source: str = "network",
+                        size: Optional[int] = None):
+        with self._lock:
+            self._requests[(endpoint, str(status), source)] += 1
+            if size is not None:
+                self._histogram(self._bytes, endpoint, BYTES_BUCKETS).observe(size)
+
+    def observe_decode(self, endpoint: str, seconds: float, records: Optional[int] = None):
+        with self._lock:
+            self._histogram(self._phases, (endpoint, "decode"), SECONDS_BUCKETS).observe(seconds)
+            if records is not None:
+                self._histogram(self._records, endpoint, RECORDS_BUCKETS).observe(records)
+
+    def observe_records(self, endpoint: str, records: int):
+        with self._lock:
+            self._histogram(self._records, endpoint, RECORDS_BUCKETS).observe(records)
+
+    def observe_hedge(self, endpoint: str, outcome: str):
+        """Cópia de um GET lento: sent, won (a cópia respondeu antes) ou skipped (sem orçamento)"""
+        with self._lock:
+            self._hedges[(endpoint, outcome)] += 1
+
+    def render(self) -> str:
+        """Texto OpenMetrics (termina em # EOF)"""
+        with self._lock:
+            lines: List[str] = []
+            self._render_histograms(
+                lines, "sienge_request_phase_seconds", "seconds",
+                "Duração de cada fase da requisição à API Sienge",
+                [({"endpoint": e, "phase": p}, h) for (e, p), h in sorted(self._phases.items())])
+            self._render_histograms(
+                lines, "sienge_response_bytes", "bytes", "Tamanho do corpo recebido",
+                [({"endpoint": e}, h) for e, h in sorted(self._bytes.items())])
+            self._render_histograms(
+                lines, "sienge_response_records", None, "Registros decodificados por resposta",
+                [({"endpoint": e}, h) for e, h in sorted(self._records.items())])
+            lines.append("# TYPE sienge_requests counter")
+            lines.append("# HELP sienge_requests Requisições por endpoint, status e origem")
+            for (endpoint, status, source), count in sorted(self._requests.items()):
+                labels = _labels({"endpoint": endpoint, "status": status, "source": source})
+                lines.append(f"sienge_requests_total{{{labels}}} {count}")
+            if self._hedges:
+                lines.append("# TYPE sienge_hedges counter")
+                lines.append("# HELP sienge_hedges Cópias de GET lento por endpoint e desfecho")
+                for (endpoint, outcome), count in sorted(self._hedges.items()):
+                    labels = _labels({"endpoint": endpoint, "outcome": outcome})
+                    lines.append(f"sienge_hedges_total{{{labels}}} {count}")
+            lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _render_histograms(lines: List[str], name: str, unit: Optional[str], help_text: str,
+                           series: List[Tuple[Dict[str, str], Histogram]]):
+        lines.append(f"# TYPE {name} histogram")
+        if unit:
+            lines.append(f"# UNIT {name} {unit}")
+        lines.append(f"# HELP {name} {help_text}")
+        for labels, histogram in series:
+            base = _labels(labels)
+            for bound, count in histogram.cumulative():
+                lines.append(f'{name}_bucket{{{base},le="{bound}"}} {count}')
+            lines.append(f"{name}_count{{{base}}} {histogram.count}")
+            lines.append(f"{name}_sum{{{base}}} {repr(histogram.sum)}")
+
+    def write(self, path: Optional[str] = None) -> Optional[str]:
+        """Grava o texto OpenMetrics (substituição atômica)"""
+        path = path or self.path
+        if not path:
+            return None
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(tmp, path)
+        return path
+
+    def api_metrics(self) -> Dict[str, Any]:
+        """Mesmo conteúdo no formato do bloco "api" de app/api/metrics/route.ts"""
+        return api_metrics(parse_openmetrics(self.render()))
+
+
+_env_registry: Optional[MetricsRegistry] = None
+_env_lock = threading.Lock()
+
+
+def count_records(payload: Any) -> int:
+    """Registros de uma resposta decodificada (lista de página ou objeto único)"""
+    records, _ = extract_page(payload)
+    if records or isinstance(payload, list):
+        return len(records)
+    return 1 if payload else 0
+
+
+_SAMPLE = re.compile(r'^(\w+)\{(.*)\}\s+(\S+)$')
+_LABEL = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+def parse_openmetrics(text: str) -> Dict[str, Dict[Tuple, float]]:
+    """Amostras _sum, _count e _total por nome e labels (sem os buckets)"""
+    samples: Dict[str, Dict[Tuple, float]] = defaultdict(dict)
+    for line in text.splitlines():
+        match = _SAMPLE.match(line)
+        if not match or match.group(1).endswith("_bucket"):
+            continue
+        labels = tuple(sorted(_LABEL.findall(match.group(2))))
+        samples[match.group(1)][labels] = float(match.group(3))
+    return samples
+
+
+def api_metrics(samples: Dict[str, Dict[Tuple, float]]) -> Dict[str, Any]:
+    """Resumo por endpoint: requisições por status, média e total de cada fase, bytes e registros"""
+    endpoints: Dict[str, Dict[str, Any]] = defaultdict(
+        lambda: {"requests": {}, "phases": {}, "bytes": 0, "records": 0, "hedges": {}})
+    for labels, value in samples.get("sienge_requests_total", {}).items():
+        label = dict(labels)
+        requests = endpoints[label["endpoint"]]["requests"]
+        requests[label["status"]] = requests.get(label["status"], 0) + int(value)
+    for labels, value in samples.get("sienge_hedges_total", {}).items():
+        label = dict(labels)
+        endpoints[label["endpoint"]]["hedges"][label["outcome"]] = int(value)
+    counts = samples.get("sienge_request_phase_seconds_count", {})
+    for labels, total in samples.get("sienge_request_phase_seconds_sum", {}).items():
+        label = dict(labels)
+        count = counts.get(labels, 0)
+        endpoints[label["endpoint"]]["phases"][label["phase"]] = {
+            "count": int(count), "seconds": round(total, 6),
+            "mean_ms": round(total / count * 1000, 3) if count else None,
+        }
+    for labels, value in samples.get("sienge_response_bytes_sum", {}).items():
+        endpoints[dict(labels)["endpoint"]]["bytes"] = int(value)
+    for labels, value in samples.get("sienge_response_records_sum", {}).items():
+        endpoints[dict(labels)["endpoint"]]["records"] = int(value)
+    return {"available": bool(endpoints), "endpoints": dict(sorted(endpoints.items()))}
+
+
+def diagnose(phases: Dict[str, Dict[str, Any]]) -> str:
+    """Onde o tempo foi gasto: Sienge (ttfb), rede ou decode"""
+    seconds = {name: phases.get(name, {}).get("seconds", 0.0) for name in PHASES}
+    buckets = {
+        "Sienge (ttfb)": seconds["ttfb"],
+        "rede": sum(seconds[name] for name in NETWORK_PHASES),
+        "decode": seconds["decode"],
+    }
+    spent = sum(buckets.values())
+    if not spent:
+        return "-"
+    name, value = max(buckets.items(), key=lambda item: item[1])
+    return f"{name} {value / spent:.0%}"
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Resumo de um arquivo OpenMetrics do cliente Sienge")
+    parser.add_argument("file", nargs="?", default=os.environ.get(METRICS_FILE_ENV))
+    parser.add_argument("--json", action="store_true", help="Imprime no formato de /api/metrics")
+    args = parser.parse_args(argv)
+    if not args.file:
+        parser.error(f"informe o arquivo ou defina {METRICS_FILE_ENV}")
+
+    with open(args.file, encoding="utf-8") as f:
+        summary = api_metrics(parse_openmetrics(f.read()))
+    if args.json:
+        print(json.dumps({"api": summary}, indent=2, ensure_ascii=False))
+        return 0
+
+    header = " | ".join(f"{phase:>8}" for phase in PHASES)
+    print(f"{'endpoint':45} | {'reqs':>5} | {header} | maior parcela")
+    for endpoint, data in summary["endpoints"].items():
+        means = " | ".join(
+            f"{data['phases'][phase]['mean_ms']:>6.1f}ms" if phase in data["phases"] else f"{'-':>8}"
+            for phase in PHASES)
+        requests = sum(data["requests"].values())
+        print(f"{endpoint:45} | {requests:>5} | {means} | {diagnose(data['phases'])}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,521 @@
+#!/usr/bin/env python3
+"""
+Servidor local que imita a API Sienge a partir dos YAMLs de api-docs-plus
+
+Serve respostas conformes ao schema de cada operação, com paginação e
+resultSetMetadata, e responde 400 quando falta parâmetro obrigatório.
+Latência, limite de taxa (429), 403 por endpoint e volume de dados são
+configuráveis, para testar e medir os scripts sem acessar o tenant real.
+
+WebHooks cadastrados via POST /hooks ficam em memória; com --events o mock
+envia eventos sintéticos (ex. CUSTOMER_UPDATED) para as URLs cadastradas.
+
+Uso:
+    python mock_server.py --port 8765 --latency lognormal:0.08,0.5 --forbidden /hooks
+    SIENGE_BASE_URL=http://127.0.0.1:8765/abf/public/api python test_all_sienge_endpoints.py
+    python mock_server.py --port 8765 --events 20
+"""
+
+import argparse
+import base64
+import gzip
+import hashlib
+import json
+import math
+import random
+import re
+import socket
+import threading
+import time
+import urllib.request
+import uuid
+import zlib
+from dataclasses import asdict, dataclass, field
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from openapi_specs import YAML_DIR, Operation, SpecSet, load_specs
+from probe_engine import TokenBucket
+
+# Prefixo das URLs: /{subdominio}/public/api/{v1 | bulk-data/v1}{path}
+URL_PATTERN = re.compile(r"^/(?P<tenant>[^/]+)/public/api/(?P<base>v1|bulk-data/v1)(?P<path>/.*)?$")
+
+DEFAULT_LIMIT = 100
+DATE_VALUE = re.compile(r"^\d{4}-\d{2}-\d{2}")
+
+
+@dataclass
+class MockConfig:
+    """Comportamento configurável do servidor"""
+    records: int = 500                 # registros por endpoint de listagem
+    max_limit: int = 200               # limite máximo por página (como na API real)
+    nested_items: int = 2              # itens em arrays aninhados dos registros
+    latency: str = "fixed:0"           # fixed:S | uniform:A,B | lognormal:MEDIANA,SIGMA
+    rate_limit_per_minute: int = 0     # 0 desativa o 429
+    rate_limit_burst: int = 20
+    forbidden: List[str] = field(default_factory=list)          # paths com 403
+    endpoint_records: Dict[str, int] = field(default_factory=dict)
+    endpoint_latency: Dict[str, str] = field(default_factory=dict)
+    # Datas dos registros são distribuídas neste intervalo (padrão: últimos 3 anos)
+    date_start: str = field(default_factory=lambda: (date.today() - timedelta(days=3 * 365)).isoformat())
+    date_end: str = field(default_factory=lambda: date.today().isoformat())
+    username: Optional[str] = None     # quando definido, exige Basic auth
+    password: Optional[str] = None
+    gzip: bool = True
+    etags: bool = False                # ETag + 304 para If-None-Match
+    events_per_second: float = 0.0     # eventos enviados aos webhooks cadastrados (0 desativa)
+    event_entities: int = 20           # ids sorteados (repetições exercitam o agrupamento)
+    seed: int = 42
+
+    @classmethod
+    def from_file(cls, path: str) -> "MockConfig":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(**json.load(f))
+
+
+class LatencyModel:
+    """Sorteia atrasos a partir de uma especificação textual"""
+
+    def __init__(self, spec: str, rng: random.Random):
+        kind, _, args = spec.partition(":")
+        self.kind = kind
+        self.args = [float(a) for a in args.split(",") if a] or [0.0]
+        self.rng = rng
+
+    def sample(self) -> float:
+        if self.kind == "uniform":
+            return self.rng.uniform(self.args[0], self.args[1])
+        if self.kind == "lognormal":
+            median, sigma = self.args[0], self.args[1] if len(self.args) > 1 else 0.5
+            return self.rng.lognormvariate(math.log(median), sigma) if median > 0 else 0.0
+        return self.args[0]
+
+
+def _is_date_schema(name: str, schema: Dict[str, Any]) -> bool:
+    fmt = str(schema.get("format", "")).lower()
+    return schema.get("type") == "string" and (
+        "date" in fmt or "yyyy" in fmt or name.lower().endswith("date") or name.endswith("At"))
+
+
+class DataGenerator:
+    """Gera registros determinísticos a partir dos schemas"""
+
+    def __init__(self, specs: SpecSet, config: MockConfig):
+        self.specs = specs
+        self.config = config
+        self.start = date.fromisoformat(config.date_start)
+        self.span = (date.fromisoformat(config.date_end) - self.start).days + 1
+        self._targets: Dict[Tuple, Tuple[Operation, Dict[str, Any]]] = {}
+        self._cached = lru_cache(maxsize=50_000)(self._build)
+
+    def count(self, op: Operation) -> int:
+        return self.config.endpoint_records.get(op.path, self.config.records)
+
+    def record_date(self, index: int, total: int) -> date:
+        return self.start + timedelta(days=index * self.span // max(total, 1))
+
+    def index_range(self, total: int, start: Optional[date], end: Optional[date]) -> Tuple[int, int]:
+        """Faixa [lo, hi) de índices com data dentro de [start, end]"""
+        def first_index(day: date) -> int:
+            offset = (day - self.start).days
+            if offset <= 0:
+                return 0
+            return min(total, -(-offset * total // self.span))
+
+        lo = first_index(start) if start else 0
+        hi = first_index(end + timedelta(days=1)) if end else total
+        return lo, max(lo, hi)
+
+    def generate(self, op: Operation, schema: Dict[str, Any], index: int, total: int) -> Any:
+        """Registro `index` de um conjunto de `total` (cacheado, não deve ser alterado)"""
+        key = (op.method, op.base, op.path, id(schema))
+        self._targets.setdefault(key, (op, schema))
+        return self._cached(key, index, total)
+
+    def _build(self, key: Tuple, index: int, total: int) -> Any:
+        op, schema = self._targets[key]
+        rng = random.Random(zlib.crc32(f"{op.path}:{index}:{self.config.seed}".encode()))
+        day = self.record_date(index, total)
+        return self.value(schema, op.source, rng, day, depth=0, name="", index=index)
+
+    def value(self, schema: Optional[Dict[str, Any]], source: str, rng: random.Random,
+              day: date, depth: int, name: str, index: int) -> Any:
+        schema = self.specs.resolve(schema, source) or {}
+        if "allOf" in schema:
+            merged: Dict[str, Any] = {}
+            for part in schema["allOf"]:
+                part_value = self.value(part, source, rng, day, depth, name, index)
+                if isinstance(part_value, dict):
+                    merged.update(part_value)
+            return merged
+
+        kind = schema.get("type")
+        if kind == "object" or "properties" in schema:
+            if depth > 3:
+                return {}
+            return {prop: self.value(sub, source, rng, day, depth + 1, prop, index)
+                    for prop, sub in (schema.get("properties") or {}).items()}
+        if kind == "array":
+            if depth > 3:
+                return []
+            return [self.value(schema.get("items"), source, rng, day, depth + 1, name, index)
+                    for _ in range(self.config.nested_items)]
+        if "enum" in schema:
+            return rng.choice(schema["enum"])
+        if kind == "integer":
+            if name == "id" and depth == 1:
+                return index + 1
+            return rng.randint(1, 50) if name.endswith("Id") else rng.randint(0, 1000)
+        if kind == "number":
+            return round(rng.uniform(0, 100000), 2)
+        if kind == "boolean":
+            return rng.random() < 0.5
+        if kind == "string":
+            if _is_date_schema(name, schema):
+                return day.isoformat()
+            if "example" in schema:
+                return str(schema["example"])
+            return f"{name or 'valor'}-{rng.randint(1, 9999)}"
+        return None
+
+
+class MockSienge:
+    """Estado do servidor: specs, gerador, limites e configuração"""
+
+    def __init__(self, config: Optional[MockConfig] = None, specs: Optional[SpecSet] = None):
+        self.config = config or MockConfig()
+        self.specs = specs or load_specs(YAML_DIR)
+        self.generator = DataGenerator(self.specs, self.config)
+        self.rng = random.Random(self.config.seed)
+        self.rng_lock = threading.Lock()
+        self.bucket = (TokenBucket(self.config.rate_limit_per_minute, self.config.rate_limit_burst)
+                       if self.config.rate_limit_per_minute else None)
+        self.hooks = MockHooks(self.config)
+        self.requests_served = 0
+
+    def latency_for(self, path: str) -> float:
+        spec = self.config.endpoint_latency.get(path, self.config.latency)
+        with self.rng_lock:
+            return LatencyModel(spec, self.rng).sample()
+
+    def authorized(self, header: Optional[str]) -> bool:
+        if not self.config.username:
+            return True
+        expected = base64.b64encode(
+            f"{self.config.username}:{self.config.password}".encode()).decode()
+        return header == f"Basic {expected}"
+
+    def handle(self, method: str, raw_path: str, query: Dict[str, List[str]],
+               auth_header: Optional[str],
+               body: Optional[bytes] = None) -> Tuple[int, Any, Dict[str, str]]:
+        """Resolve uma requisição em (status, corpo JSON, headers extras)"""
+        self.requests_served += 1
+        match = URL_PATTERN.match(raw_path)
+        if not match:
+            return 404, error_body(404, f"Path fora da API: {raw_path}"), {}
+        base, path = match.group("base"), match.group("path") or "/"
+
+        if not self.authorized(auth_header):
+            return 401, error_body(401, "Credenciais inválidas"), {}
+        if self.bucket is not None and not self.bucket.try_acquire():
+            return 429, error_body(429, "Limite de requisições excedido"), {"Retry-After": "1"}
+
+        op, path_params = self.specs.find(method, base, path)
+        if op is None:
+            return 404, error_body(404, f"Recurso não encontrado: {path}"), {}
+
+        delay = self.latency_for(op.path)
+        if delay > 0:
+            time.sleep(delay)
+
+        if op.path in self.config.forbidden or path in self.config.forbidden:
+            return 403, error_body(403, "Usuário sem permissão para este recurso"), {}
+
+        params = {name: values[-1] for name, values in query.items()}
+        missing = [name for name in op.required_query if name not in params]
+        if missing:
+            return 400, error_body(400, f"Parâmetros obrigatórios ausentes: {', '.join(missing)}"), {}
+
+        if op.path.startswith("/hooks"):
+            status, payload = self.hooks.handle(method, path_params.get("hookId"), body, params)
+            return status, payload, {}
+        if method != "GET":
+            return 201, {}, {}
+        return 200, self.render(op, path_params, params), {}
+
+    def render(self, op: Operation, path_params: Dict[str, str], params: Dict[str, str]) -> Any:
+        """Monta o corpo de uma resposta 200 conforme o schema da operação"""
+        schema = self.specs.resolve(op.response_schema, op.source) or {}
+        total = self.generator.count(op)
+
+        if schema.get("type") == "array":
+            items, _ = self.page(op, schema.get("items") or {}, params, total)
+            return items
+
+        properties = schema.get("properties") or {}
+        list_key = next((key for key in ("results", "data", "records", "items")
+                         if (properties.get(key) or {}).get("type") == "array"), None)
+        if list_key is None:
+            # Operação de detalhe: um único objeto, com o id pedido no path
+            index = next((int(v) - 1 for v in path_params.values() if v.isdigit()), 0)
+            return self.generator.generate(op, schema, max(index, 0), max(total, index + 1))
+
+        items, metadata = self.page(op, properties[list_key].get("items") or {}, params, total)
+        body: Dict[str, Any] = {}
+        if "resultSetMetadata" in properties or "limit" in op.query_names:
+            body["resultSetMetadata"] = metadata
+        body[list_key] = items
+        return body
+
+    def page(self, op: Operation, item_schema: Dict[str, Any], params: Dict[str, str],
+             total: int) -> Tuple[List[Any], Dict[str, int]]:
+        """Aplica filtro de datas e offset/limit sobre o conjunto do endpoint"""
+        start, end = date_bounds(params)
+        lo, hi = self.generator.index_range(total, start, end)
+        count = hi - lo
+
+        # Como a API real, operações sem limit/offset no spec ignoram os dois
+        paginated = "limit" in op.query_names or "offset" in op.query_names
+        if paginated:
+            offset = int(params.get("offset", 0) or 0)
+            limit = min(int(params.get("limit", DEFAULT_LIMIT) or DEFAULT_LIMIT), self.config.max_limit)
+        else:
+            offset, limit = 0, count
+        first, last = lo + min(offset, count), lo + min(offset + limit, count)
+        items = [self.generator.generate(op, item_schema, i, total) for i in range(first, last)]
+        return items, {"count": count, "offset": offset, "limit": limit}
+
+
+class MockHooks:
+    """WebHooks cadastrados no mock e envio de eventos sintéticos para eles"""
+
+    # Eventos sorteados quando o webhook não restringe a lista
+    EVENTS = ("CUSTOMER_CREATED", "CUSTOMER_UPDATED", "SALES_CONTRACT_UPDATED",
+              "RECEIVABLE_BILL_UPDATED", "BILL_UPDATED", "CREDITOR_UPDATED")
+
+    def __init__(self, config: MockConfig):
+        self.config = config
+        self.hooks: Dict[str, Dict[str, Any]] = {}
+        self.lock = threading.Lock()
+        self.rng = random.Random(config.seed)
+        self.events_sent = 0
+        self.delivery_errors = 0
+
+    def handle(self, method: str, hook_id: Optional[str], body: Optional[bytes],
+               params: Dict[str, str]) -> Tuple[int, Any]:
+        """CRUD de /hooks conforme hooks-v1.yaml"""
+        if hook_id is not None:
+            with self.lock:
+                hook = self.hooks.get(hook_id)
+                if hook is not None and method == "DELETE":
+                    del self.hooks[hook_id]
+            if hook is None:
+                return 404, error_body(404, f"WebHook não encontrado: {hook_id}")
+            return 200, (hook if method == "GET" else {})
+        if method == "POST":
+            try:
+                data = json.loads(body or b"{}")
+            except ValueError:
+                return 400, error_body(400, "Corpo JSON inválido")
+            missing = [name for name in ("url", "events") if not data.get(name)]
+            if missing:
+                return 400, error_body(400, f"Campos obrigatórios ausentes: {', '.join(missing)}")
+            hook = {"id": str(uuid.uuid4()), "url": data["url"], "token": data.get("token"),
+                    "events": list(data["events"])}
+            with self.lock:
+                self.hooks[hook["id"]] = hook
+            return 200, hook
+        offset = int(params.get("offset", 0) or 0)
+        limit = int(params.get("limit", DEFAULT_LIMIT) or DEFAULT_LIMIT)
+        with self.lock:
+            hooks = list(self.hooks.values())
+        return 200, {"resultSetMetadata": {"count": len(hooks), "offset": offset, "limit": limit},
+                     "results": hooks[offset:offset + limit]}
+
+    def emit(self, event: str, entity_id: Any) -> int:
+        """Envia um evento para os webhooks inscritos nele; devolve quantos receberam"""
+        with self.lock:
+            targets = [hook for hook in self.hooks.values() if event in hook["events"]]
+        payload = json.dumps({
+            "eventId": str(uuid.uuid4()),
+            "event": event,
+            "occurredAt": datetime.now().isoformat(timespec="seconds"),
+            "data": {"id": entity_id},
+        }).encode("utf-8")
+        delivered = 0
+        for hook in targets:
+            headers = {"Content-Type": "application/json"}
+            if hook.get("token"):
+                headers["Authorization"] = f"Bearer {hook['token']}"
+            request = urllib.request.Request(hook["url"], data=payload, headers=headers,
+                                             method="POST")
+            try:
+                with urllib.request.urlopen(request, timeout=5) as response:
+                    response.read()
+                delivered += 1
+            except OSError:
+                self.delivery_errors += 1
+        self.events_sent += delivered
+        return delivered
+
+    def run_emitter(self, stop: threading.Event):
+        """Sorteia eventos na taxa configurada enquanto houver webhooks cadastrados"""
+        interval = 1.0 / self.config.events_per_second
+        while not stop.wait(interval):
+            with self.lock:
+                events = sorted({event for hook in self.hooks.values() for event in hook["events"]})
+            if events:
+                self.emit(self.rng.choice(events), self.rng.randint(1, self.config.event_entities))
+
+
+def date_bounds(params: Dict[str, str]) -> Tuple[Optional[date], Optional[date]]:
+    """Extrai o intervalo de datas de parâmetros como startDate/endDate ou createdAfter/createdBefore"""
+    start = end = None
+    for name, value in params.items():
+        if not DATE_VALUE.match(str(value)):
+            continue
+        lowered = name.lower()
+        if "start" in lowered or "after" in lowered:
+            start = date.fromisoformat(value[:10])
+        elif "end" in lowered or "before" in lowered:
+            end = date.fromisoformat(value[:10])
+    return start, end
+
+
+def error_body(status: int, message: str) -> Dict[str, Any]:
+    """Corpo de erro no formato ResponseMessage da API"""
+    return {"status": status, "developerMessage": message, "clientMessage": message}
+
+
+class MockRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    mock: MockSienge = None
+
+    def setup(self):
+        super().setup()
+        # Sem isso, headers e corpo em writes separados esbarram no Nagle + ACK atrasado
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def _dispatch(self, method: str):
+        url = urlsplit(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        request_body = self.rfile.read(length) if length else None
+        status, body, extra_headers = self.mock.handle(
+            method, url.path, parse_qs(url.query), self.headers.get("Authorization"), request_body)
+        self._send_json(status, body, extra_headers)
+
+    def _send_json(self, status: int, body: Any, extra_headers: Dict[str, str]):
+        payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        accepts_gzip = "gzip" in (self.headers.get("Accept-Encoding") or "")
+        if self.mock.config.etags and status == 200:
+            etag = f'"{hashlib.sha1(payload).hexdigest()}"'
+            extra_headers = {**extra_headers, "ETag": etag}
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                for name, value in extra_headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json;charset=UTF-8")
+        if self.mock.config.gzip and accepts_gzip and len(payload) > 1024:
+            payload = gzip.compress(payload, compresslevel=1)
+            self.send_header("Content-Encoding", "gzip")
+        for name, value in extra_headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PUT(self):
+        self._dispatch("PUT")
+
+    def do_PATCH(self):
+        self._dispatch("PATCH")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_mock_server(config: Optional[MockConfig] = None, host: str = "127.0.0.1",
+                      port: int = 0, tenant: str = "abf",
+                      specs: Optional[SpecSet] = None) -> Tuple[ThreadingHTTPServer, str]:
+    """
+    Sobe o servidor em uma thread de fundo
+
+    Returns:
+        (servidor, base_url) — base_url serve como SiengeClient(base_url=...)
+    """
+    mock = MockSienge(config, specs)
+    handler = type("BoundMockHandler", (MockRequestHandler,), {"mock": mock})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    if mock.config.events_per_second > 0:
+        threading.Thread(target=mock.hooks.run_emitter, args=(threading.Event(),),
+                         daemon=True).start()
+    return server, f"http://{host}:{server.server_port}/{tenant}/public/api"
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Servidor local que imita a API Sienge")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--config", help="Arquivo JSON com os campos de MockConfig")
+    parser.add_argument("--records", type=int, help="Registros por endpoint de listagem")
+    parser.add_argument("--latency", help="fixed:S | uniform:A,B | lognormal:MEDIANA,SIGMA")
+    parser.add_argument("--rate-limit", type=int, help="Requisições por minuto antes do 429")
+    parser.add_argument("--forbidden", help="Paths que retornam 403, separados por vírgula")
+    parser.add_argument("--nested-items", type=int, help="Itens em arrays aninhados")
+    parser.add_argument("--events", type=float,
+                        help="Eventos por segundo enviados aos webhooks cadastrados")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    config = MockConfig.from_file(args.config) if args.config else MockConfig()
+    if args.records is not None:
+        config.records = args.records
+    if args.latency:
+        config.latency = args.latency
+    if args.rate_limit is not None:
+        config.rate_limit_per_minute = args.rate_limit
+    if args.forbidden:
+        config.forbidden = [p.strip() for p in args.forbidden.split(",") if p.strip()]
+    if args.nested_items is not None:
+        config.nested_items = args.nested_items
+    if args.events is not None:
+        config.events_per_second = args.events
+
+    server, base_url = start_mock_server(config, args.host, args.port)
+    print("=" * 70)
+    print("MOCK DA API SIENGE")
+    print("=" * 70)
+    print(f"Base URL: {base_url}")
+    print(f"Operações carregadas: {len(server.RequestHandlerClass.mock.specs.operations)}")
+    print(f"Configuração: {json.dumps(asdict(config), ensure_ascii=False)}")
+    print(f"\nUse: SIENGE_BASE_URL={base_url} python test_all_sienge_endpoints.py")
+    print("=" * 70)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Leitura das especificações OpenAPI/Swagger em api-docs-plus
+
+Carrega os YAMLs de api-docs-plus/sienge_yamls_updated (um por módulo da API)
+e o sienge_unified_gets.yaml, e expõe as operações com parâmetros, schema de
+resposta e a base (v1 ou bulk-data/v1) a que pertencem.
+"""
+
+import re
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import yaml
+
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
+# Diretório padrão dos YAMLs, relativo à raiz do repositório
+YAML_DIR = Path(__file__).resolve().parents[2] / "api-docs-plus" / "sienge_yamls_updated"
+UNIFIED_SPEC = "sienge_unified_gets.yaml"
+
+BASE_V1 = "v1"
+BASE_BULK = "bulk-data/v1"
+
+
+@dataclass
+class Operation:
+    """Uma operação (método + path) declarada em uma especificação"""
+    method: str
+    path: str
+    base: str
+    source: str
+    parameters: List[Dict[str, Any]] = field(default_factory=list)
+    response_schema: Optional[Dict[str, Any]] = None
+
+    @property
+    def required_query(self) -> List[str]:
+        return [p["name"] for p in self.parameters
+                if p.get("in") == "query" and p.get("required")]
+
+    @property
+    def query_names(self) -> List[str]:
+        return [p["name"] for p in self.parameters if p.get("in") == "query"]
+
+    def match(self, path: str) -> Optional[Dict[str, str]]:
+        """Casa um path concreto com o template, retornando os parâmetros de path"""
+        return match_template(self.path, path)
+
+
+@lru_cache(maxsize=None)
+def _template_pattern(template: str) -> re.Pattern:
+    regex = re.sub(r"\\\{([^}]+)\\\}", r"(?P<\1>[^/]+)", re.escape(template))
+    return re.compile(f"^{regex}$")
+
+
+def match_template(template: str, path: str) -> Optional[Dict[str, str]]:
+    """Parâmetros de path de um path concreto que casa com o template (ex.: /customers/{id})"""
+    match = _template_pattern(template).match(path)
+    return match.groupdict() if match else None
+
+
+def _base_of(spec: Dict[str, Any]) -> str:
+    base_path = spec.get("basePath") or ""
+    if not base_path and spec.get("servers"):
+        base_path = spec["servers"][0].get("url", "")
+    return BASE_BULK if "/bulk-data/" in base_path else BASE_V1
+
+
+def load_yaml(path: Path) -> Dict[str, Any]:
+    with open(path, "r", encoding="utf-8") as f:
+        return yaml.load(f, Loader=SafeLoader) or {}
+
+
+class SpecSet:
+    """Conjunto de operações e definições de todos os YAMLs"""
+
+    def __init__(self):
+        self.operations: List[Operation] = []
+        self.definitions: Dict[str, Dict[str, Any]] = {}
+        self.merged_definitions: Dict[str, Any] = {}
+
+    def add_spec(self, source: str, spec: Dict[str, Any], only_new: bool = False):
+        """Registra as operações de uma especificação já carregada"""
+        base = _base_of(spec)
+        definitions = spec.get("definitions") or {}
+        self.definitions[source] = definitions
+        for name, schema in definitions.items():
+            self.merged_definitions.setdefault(name, schema)
+
+        shared_params = spec.get("parameters") or {}
+
+        def resolve_param(param):
+            if "$ref" in param:
+                return shared_params.get(param["$ref"].rsplit("/", 1)[-1], param)
+            return param
+
+        known = {(op.method, op.base, op.path) for op in self.operations}
+        for path, item in (spec.get("paths") or {}).items():
+            for method, operation in item.items():
+                method = method.upper()
+                if method not in ("GET", "POST", "PUT", "PATCH", "DELETE"):
+                    continue
+                if only_new and (method, base, path) in known:
+                    continue
+                response = (operation.get("responses") or {}).get("200") or \
+                           (operation.get("responses") or {}).get(200) or {}
+                self.operations.append(Operation(
+                    method=method,
+                    path=path,
+                    base=base,
+                    source=source,
+                    parameters=[resolve_param(p) for p in
+                                (operation.get("parameters") or []) + (item.get("parameters") or [])],
+                    response_schema=response.get("schema"),
+                ))
+
+    def resolve(self, schema: Optional[Dict[str, Any]], source: str) -> Optional[Dict[str, Any]]:
+        """Resolve um $ref local, procurando no arquivo de origem e depois em todos"""
+        seen = 0
+        while schema and "$ref" in schema and seen < 20:
+            name = schema["$ref"].rsplit("/", 1)[-1]
+            schema = self.definitions.get(source, {}).get(name) or self.merged_definitions.get(name)
+            seen += 1
+        return schema
+
+    def find(self, method: str, base: str, path: str) -> Tuple[Optional[Operation], Dict[str, str]]:
+        """Encontra a operação de um path concreto (paths literais têm prioridade)"""
+        candidates = []
+        for op in self.operations:
+            if op.method != method or op.base != base:
+                continue
+            params = op.match(path)
+            if params is not None:
+                candidates.append((len(params), op, params))
+        if not candidates:
+            return None, {}
+        _, op, params = min(candidates, key=lambda c: c[0])
+        return op, params
+
+    def paths(self, method: str = "GET") -> List[Operation]:
+        return [op for op in self.operations if op.method == method]
+
+
+def load_specs(yaml_dir: Path = YAML_DIR) -> SpecSet:
+    """Carrega os YAMLs por módulo e completa com o sienge_unified_gets.yaml"""
+    yaml_dir = Path(yaml_dir)
+    specs = SpecSet()
+    for path in sorted(yaml_dir.glob("*.yaml")):
+        if path.name == UNIFIED_SPEC:
+            continue
+        specs.add_spec(path.name, load_yaml(path))
+
+    unified = yaml_dir / UNIFIED_SPEC
+    if unified.exists():
+        # O arquivo unificado só acrescenta paths ausentes nos YAMLs por módulo
+        specs.add_spec(unified.name, load_yaml(unified), only_new=True)
+    return specs
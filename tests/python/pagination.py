@@ -0,0 +1,121 @@
+"""
+Paginação completa de endpoints da API Sienge guiada por resultSetMetadata
+
+A primeira página revela o total (resultSetMetadata.count); as demais são
+buscadas em paralelo com uma janela limitada de requisições em voo, e os
+registros continuam saindo na ordem dos offsets.
+"""
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Mesmo tamanho de página do cliente TS (SIENGE_API_CONFIG.DEFAULT_PAGE_SIZE)
+PAGE_SIZE = 200
+PAGE_WINDOW = 4
+
+# Chaves onde a API coloca a lista de registros, em ordem de preferência
+RECORD_KEYS = ("results", "records", "data", "items")
+
+
+class PageError(Exception):
+    """Página que não retornou 200"""
+
+    def __init__(self, url: str, status_code: int, body: str = ""):
+        super().__init__(f"Status {status_code} em {url}: {body[:200]}")
+        self.url = url
+        self.status_code = status_code
+
+
+def extract_page(data: Any) -> Tuple[List[Any], Dict[str, Any]]:
+    """Separa os registros e a metadata de uma resposta de página"""
+    if isinstance(data, list):
+        return data, {}
+    if isinstance(data, dict):
+        metadata = data.get("resultSetMetadata") or {}
+        for key in RECORD_KEYS:
+            if isinstance(data.get(key), list):
+                return data[key], metadata
+    return [], {}
+
+
+def total_count(metadata: Dict[str, Any]) -> Optional[int]:
+    """Total de registros informado pela metadata (count ou totalRecords)"""
+    count = metadata.get("count", metadata.get("totalRecords"))
+    return int(count) if count is not None else None
+
+
+def fetch_page(client, path: str, params: Dict[str, Any], offset: int, limit: int,
+               bulk: bool = False) -> Tuple[List[Any], Dict[str, Any]]:
+    """Busca uma única página"""
+    response = client.get(path, params={**params, "limit": limit, "offset": offset}, bulk=bulk)
+    if response.status_code != 200:
+        raise PageError(response.url, response.status_code, response.text)
+    return extract_page(response.json())
+
+
+def iter_records(client, path: str, params: Optional[Dict[str, Any]] = None,
+                 page_size: int = PAGE_SIZE, window: int = PAGE_WINDOW,
+                 bulk: bool = False, max_records: Optional[int] = None) -> Iterator[Any]:
+    """
+    Gera todos os registros de um endpoint, em ordem
+
+    Args:
+        client: SiengeClient (ou objeto com o mesmo get)
+        path: Endpoint relativo, ex. "/customers"
+        params: Filtros adicionais (limit/offset são controlados aqui)
+        page_size: Registros por página
+        window: Máximo de páginas em voo ao mesmo tempo
+        bulk: Usa a base bulk-data/v1
+        max_records: Para após esse número de registros
+    """
+    params = dict(params or {})
+    params.pop("limit", None)
+    params.pop("offset", None)
+
+    records, metadata = fetch_page(client, path, params, 0, page_size, bulk)
+    count = total_count(metadata)
+    if max_records is not None:
+        count = min(count, max_records) if count is not None else max_records
+
+    emitted = 0
+    for record in records:
+        if count is not None and emitted >= count:
+            return
+        yield record
+        emitted += 1
+
+    if count is None:
+        # Bulk-data ignora limit/offset: a primeira resposta já é o conjunto inteiro
+        if bulk:
+            return
+        # Sem metadata: segue sequencialmente até uma página incompleta
+        offset = page_size
+        while len(records) == page_size:
+            records, _ = fetch_page(client, path, params, offset, page_size, bulk)
+            yield from records
+            offset += page_size
+        return
+
+    offsets = deque(range(page_size, count, page_size))
+    executor = ThreadPoolExecutor(max_workers=window)
+    in_flight = deque()
+    try:
+        while offsets or in_flight:
+            while offsets and len(in_flight) < window:
+                in_flight.append(executor.submit(
+                    fetch_page, client, path, params, offsets.popleft(), page_size, bulk))
+
+            records, _ = in_flight.popleft().result()
+            for record in records:
+                if emitted >= count:
+                    return
+                yield record
+                emitted += 1
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def fetch_all(client, path: str, params: Optional[Dict[str, Any]] = None, **kwargs) -> List[Any]:
+    """Atalho que materializa iter_records em uma lista"""
+    return list(iter_records(client, path, params, **kwargs))
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Exportação colunar (Parquet) de resultados de sondagem e registros extraídos
+
+Grava datasets particionados no estilo Hive (endpoint=.../run_date=...), com
+compressão zstd e dictionary encoding nas colunas de texto repetitivas
+(status, códigos de origem, situação...). O histórico de meses de execuções
+vira uma varredura colunar em vez de centenas de JSONs indentados.
+
+Requer pyarrow (opcional: sem ele os scripts continuam gravando só JSON).
+
+Uso:
+    python parquet_export.py exports/probes --summary
+    python parquet_export.py exports/records --endpoint bulk-data_v1_income
+"""
+
+import argparse
+import json
+import os
+import sys
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from profiling import phase
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    HAS_PYARROW = True
+except ImportError:
+    pa = ds = None
+    HAS_PYARROW = False
+
+EXPORT_DIR = os.getenv("SIENGE_EXPORT_DIR", "exports")
+PROBES_DATASET = "probes"
+RECORDS_DATASET = "records"
+
+PARTITION_COLUMNS = ["endpoint", "run_date"]
+# Colunas de texto com até essa fração de valores distintos usam dicionário
+DICTIONARY_RATIO = 0.5
+RECORD_BATCH_SIZE = 50_000
+TIMING_PHASES = ("connect", "tls", "ttfb", "download", "decode", "total")
+
+
+def _require_pyarrow():
+    if not HAS_PYARROW:
+        raise RuntimeError("pyarrow não instalado (pip install pyarrow)")
+
+
+def endpoint_slug(endpoint: str, bulk: bool = False) -> str:
+    """Nome de partição do endpoint: /bills -> v1_bills, /income bulk -> bulk-data_v1_income"""
+    base = "bulk-data/v1" if bulk else "v1"
+    # Templates (/customers/{id}) sem chaves no nome do diretório
+    return f"{base}/{endpoint.strip('/')}".replace("/", "_").replace("{", "").replace("}", "")
+
+
+def _flatten(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Campos escalares viram colunas; objetos e listas aninhados viram JSON"""
+    flat = {}
+    for key, value in record.items():
+        if isinstance(value, (dict, list)):
+            flat[key] = json.dumps(value, ensure_ascii=False, default=str)
+        else:
+            flat[key] = value
+    return flat
+
+
+def _column(values: List[Any], type_: Optional["pa.DataType"] = None) -> "pa.Array":
+    """Array Arrow com tipo inferido; tipos misturados caem para texto"""
+    if type_ is not None:
+        return pa.array(values, type=type_)
+    kinds = {type(v) for v in values if v is not None}
+    if kinds <= {int, float} and kinds:
+        kinds = {float} if float in kinds else {int}
+    if len(kinds) > 1:
+        values = [None if v is None else str(v) for v in values]
+    elif not kinds:
+        # Coluna toda nula: texto, para não conflitar com outros arquivos
+        return pa.array(values, type=pa.string())
+    return pa.array(values)
+
+
+def dictionary_columns(table: "pa.Table") -> List[str]:
+    """Colunas de texto repetitivas, que ganham dictionary encoding no Parquet"""
+    columns = []
+    for name in table.column_names:
+        column = table.column(name)
+        if name in PARTITION_COLUMNS or not pa.types.is_string(column.type) or not len(column):
+            continue
+        if len(column.unique()) <= max(1, len(column) * DICTIONARY_RATIO):
+            columns.append(name)
+    return columns
+
+
+def to_table(rows: List[Dict[str, Any]],
+             types: Optional[Dict[str, "pa.DataType"]] = None) -> "pa.Table":
+    """Monta a tabela a partir de dicionários com chaves possivelmente diferentes"""
+    _require_pyarrow()
+    types = types or {}
+    names: Dict[str, None] = {}
+    for row in rows:
+        names.update(dict.fromkeys(row))
+    return pa.table({name: _column([row.get(name) for row in rows], types.get(name))
+                     for name in names})
+
+
+def write_table(table: "pa.Table", root: str, run_id: Optional[str] = None):
+    """Acrescenta a tabela ao dataset particionado em `root`"""
+    _require_pyarrow()
+    run_id = run_id or uuid.uuid4().hex[:12]
+    parquet = ds.ParquetFileFormat()
+    ds.write_dataset(
+        table, root, format=parquet,
+        partitioning=PARTITION_COLUMNS, partitioning_flavor="hive",
+        basename_template=f"{run_id}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+        file_options=parquet.make_write_options(compression="zstd",
+                                                use_dictionary=dictionary_columns(table) or False),
+    )
+
+
+def probe_types() -> Dict[str, "pa.DataType"]:
+    """Tipos fixos das colunas conhecidas de sondagem (estáveis entre execuções)"""
+    types = {
+        "run_at": pa.timestamp("us"),
+        "status": pa.int64(),
+        "records": pa.int64(),
+        "total_available": pa.int64(),
+    }
+    types.update({f"{phase}_s": pa.float64() for phase in TIMING_PHASES})
+    return types
+
+
+def probe_rows(results: Iterable[Dict[str, Any]], run_at: datetime,
+               subdomain: str) -> List[Dict[str, Any]]:
+    """Linhas planas de resultados de sondagem (timings e params achatados)"""
+    rows = []
+    for result in results:
+        row = {"run_at": run_at, "run_date": run_at.date().isoformat(), "subdomain": subdomain}
+        for key, value in result.items():
+            if key == "timings":
+                for phase in TIMING_PHASES:
+                    row[f"{phase}_s"] = (value or {}).get(phase)
+            elif key == "params":
+                row[key] = json.dumps(value, ensure_ascii=False, sort_keys=True)
+            elif key == "endpoint":
+                # A partição usa o slug; o path original fica em "path"
+                row["path"] = value
+                row["endpoint"] = endpoint_slug(value, "/bulk-data/" in (result.get("url") or ""))
+            else:
+                row[key] = value
+        rows.append(row)
+    return rows
+
+
+def export_probe_results(results: Iterable[Dict[str, Any]], subdomain: str,
+                         run_at: Optional[datetime] = None,
+                         root: Optional[str] = None) -> Optional[str]:
+    """
+    Grava os resultados de uma rodada de sondagem no dataset de probes
+
+    Returns:
+        Diretório do dataset, ou None se o pyarrow não estiver instalado
+    """
+    if not HAS_PYARROW:
+        return None
+    run_at = run_at or datetime.now()
+    root = root or os.path.join(EXPORT_DIR, PROBES_DATASET)
+    rows = probe_rows(results, run_at, subdomain)
+    if rows:
+        # Tenants sondados em paralelo gravam no mesmo segundo: o subdomínio evita colisão
+        write_table(to_table(rows, probe_types()), root,
+                    f"{subdomain}-{run_at.strftime('%Y%m%dT%H%M%S')}")
+    return root
+
+
+class RecordExporter:
+    """Acumula registros de um endpoint e grava em lotes no dataset de records"""
+
+    def __init__(self, endpoint: str, root: Optional[str] = None,
+                 run_at: Optional[datetime] = None, batch_size: int = RECORD_BATCH_SIZE):
+        _require_pyarrow()
+        self.endpoint = endpoint
+        self.root = root or os.path.join(EXPORT_DIR, RECORDS_DATASET)
+        self.run_at = run_at or datetime.now()
+        self.run_id = f"{self.run_at.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        self.batch_size = batch_size
+        self.written = 0
+        self._batch: List[Dict[str, Any]] = []
+        self._batches = 0
+
+    def add(self, record: Any):
+        row = _flatten(record) if isinstance(record, dict) else {"value": record}
+        row["endpoint"] = self.endpoint
+        row["run_date"] = self.run_at.date().isoformat()
+        self._batch.append(row)
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._batch:
+            return
+        with phase("transform"):
+            table = to_table(self._batch)
+        with phase("write"):
+            write_table(table, self.root, f"{self.run_id}-{self._batches}")
+        self.written += len(self._batch)
+        self._batches += 1
+        self._batch = []
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def export_records(records: Iterable[Any], endpoint: str, root: Optional[str] = None,
+                   run_at: Optional[datetime] = None) -> int:
+    """Atalho: grava todos os registros de um endpoint e devolve quantos foram"""
+    with RecordExporter(endpoint, root, run_at) as exporter:
+        for record in records:
+            exporter.add(record)
+    return exporter.written
+
+
+def load_dataset(root: str) -> "ds.Dataset":
+    """Dataset particionado para análise (filtros por endpoint/run_date são podados)"""
+    _require_pyarrow()
+    dataset = ds.dataset(root, format="parquet", partitioning="hive")
+    # Cada lote infere seu schema; unifica (int -> double, null -> tipo real) para ler tudo
+    schemas = [fragment.physical_schema for fragment in dataset.get_fragments()]
+    if len(schemas) > 1:
+        dataset = ds.dataset(root, format="parquet", partitioning="hive",
+                             schema=_unify(schemas + [dataset.partitioning.schema]))
+    return dataset
+
+
+def _unify(schemas: List["pa.Schema"]) -> "pa.Schema":
+    """Junta schemas: números misturados viram double, demais conflitos viram texto"""
+    types: Dict[str, List["pa.DataType"]] = {}
+    for schema in schemas:
+        for field in schema:
+            if not pa.types.is_null(field.type):
+                types.setdefault(field.name, []).append(field.type)
+            else:
+                types.setdefault(field.name, [])
+    fields = []
+    for name, found in types.items():
+        distinct = set(found)
+        if not distinct:
+            type_ = pa.string()
+        elif len(distinct) == 1:
+            type_ = found[0]
+        elif all(pa.types.is_integer(t) or pa.types.is_floating(t) for t in distinct):
+            type_ = pa.float64()
+        else:
+            type_ = pa.string()
+        fields.append(pa.field(name, type_))
+    return pa.schema(fields)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Consulta os datasets Parquet exportados")
+    parser.add_argument("root", help="Diretório do dataset (ex.: exports/probes)")
+    parser.add_argument("--endpoint", help="Filtra por partição de endpoint")
+    parser.add_argument("--summary", action="store_true",
+                        help="Status por endpoint e data (dataset de probes)")
+    args = parser.parse_args(argv)
+
+    _require_pyarrow()
+    dataset = load_dataset(args.root)
+    expression = ds.field("endpoint") == args.endpoint if args.endpoint else None
+    table = dataset.to_table(filter=expression)
+    print(f"{args.root}: {table.num_rows} linhas, {len(dataset.files)} arquivos")
+    print(table.schema)
+
+    if args.summary and "status" in table.column_names:
+        grouped = table.group_by(["endpoint", "run_date", "status"]).aggregate([("status", "count")])
+        for row in sorted(grouped.to_pylist(), key=lambda r: (r["endpoint"], r["run_date"])):
+            print(f"  {row['endpoint']:40} | {row['run_date']} | {row['status']} x{row['status_count']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
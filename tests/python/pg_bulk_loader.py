@@ -0,0 +1,537 @@
+#!/usr/bin/env python3
+"""
+Carga em massa no Postgres guiada pelos mapeamentos de endpoint-mappings.ts
+
+Mesmo resultado da rota de sincronização direta (findUnique + create/update
+registro a registro), mas em lotes: os registros mapeados entram numa tabela
+temporária via COPY e uma única instrução por lote faz o upsert set-based no
+model do Prisma. Chaves estrangeiras cujo pai não existe viram NULL, como em
+validateForeignKeys(), e campos ausentes no registro (undefined) não
+sobrescrevem o valor já gravado.
+
+Registros inválidos (chave primária ausente, valor que não cabe na coluna,
+campo obrigatório sem valor em registro novo) são contados como erro sem
+derrubar o lote.
+
+Requer psycopg (3) ou psycopg2. A conexão vem de --dsn ou DATABASE_URL.
+
+Uso:
+    python pg_bulk_loader.py bills --jsonl bills.jsonl
+    python checkpoints.py /customers --output customers.jsonl
+    python pg_bulk_loader.py customers --jsonl customers.jsonl
+    python pg_bulk_loader.py creditors --api
+"""
+
+import argparse
+import io
+import json
+import math
+import os
+import sys
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from endpoint_mappings import (INVALID_DATE, UNDEFINED, EndpointMapping, js_date, js_string,
+                               js_truthy, load_mappings, primary_key_value)
+from mapping_engine import CompiledMapping
+from prisma_schema import PrismaField, PrismaModel, load_schema, model_by_delegate
+from profiling import add_profile_argument, phase, profile_session, wrap
+
+try:
+    import psycopg
+    HAS_PSYCOPG = True
+except ImportError:
+    psycopg = None
+    HAS_PSYCOPG = False
+
+try:
+    import psycopg2
+    HAS_PSYCOPG2 = True
+except ImportError:
+    psycopg2 = None
+    HAS_PSYCOPG2 = False
+
+BATCH_SIZE = 20_000
+# Tamanho dos pedaços de texto enviados ao COPY
+COPY_CHUNK = 1024 * 1024
+
+INT_RANGES = {
+    "Int": (-2 ** 31, 2 ** 31 - 1),
+    "BigInt": (-2 ** 63, 2 ** 63 - 1),
+}
+# Mesmo relógio do Prisma: UTC gravado em timestamp sem fuso
+NOW_SQL = "(now() AT TIME ZONE 'UTC')"
+
+
+class RowError(ValueError):
+    """Registro que não pode ser gravado (equivale a um item com erro na rota)"""
+
+
+def libpq_dsn(url: str) -> str:
+    """DATABASE_URL do Prisma sem os parâmetros que o libpq não conhece (?schema=...)"""
+    parts = urlsplit(url)
+    if not parts.query:
+        return url
+    query = [(k, v) for k, v in parse_qsl(parts.query) if k not in ("schema", "connection_limit",
+                                                                       "pool_timeout", "pgbouncer")]
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def connect(dsn: str):
+    if HAS_PSYCOPG:
+        return psycopg.connect(libpq_dsn(dsn))
+    if HAS_PSYCOPG2:
+        return psycopg2.connect(libpq_dsn(dsn))
+    raise RuntimeError("psycopg não instalado (pip install psycopg[binary])")
+
+
+def quote_ident(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+# ------------------------------------------------------------------
+# Conversão de valores para o formato texto do COPY
+# ------------------------------------------------------------------
+
+def _escape(text: str) -> str:
+    if "\x00" in text:
+        raise RowError("texto com caractere NUL")
+    return (text.replace("\\", "\\\\").replace("\t", "\\t")
+            .replace("\n", "\\n").replace("\r", "\\r"))
+
+
+def _json(value: Any) -> str:
+    text = json.dumps(value, ensure_ascii=False, default=str, allow_nan=False)
+    if "\\u0000" in text:
+        raise RowError("JSON com caractere NUL")
+    return text
+
+
+def copy_value(f: PrismaField, value: Any) -> str:
+    """Valor já mapeado -> campo do COPY no tipo da coluna (RowError se não couber)"""
+    if value is None:
+        return "\\N"
+    kind = f.type
+    if kind in INT_RANGES:
+        if isinstance(value, bool):
+            raise RowError(f"{f.name}: booleano em coluna inteira")
+        if isinstance(value, float):
+            if not value.is_integer():
+                raise RowError(f"{f.name}: {value} não é inteiro")
+            value = int(value)
+        elif isinstance(value, str):
+            try:
+                value = int(value.strip())
+            except ValueError:
+                raise RowError(f"{f.name}: {value!r} não é inteiro") from None
+        elif not isinstance(value, int):
+            raise RowError(f"{f.name}: {type(value).__name__} em coluna inteira")
+        low, high = INT_RANGES[kind]
+        if not low <= value <= high:
+            raise RowError(f"{f.name}: {value} fora do intervalo de {kind}")
+        return str(value)
+    if kind in ("Decimal", "Float"):
+        if isinstance(value, bool):
+            raise RowError(f"{f.name}: booleano em coluna numérica")
+        if isinstance(value, str):
+            try:
+                number = float(value)
+            except ValueError:
+                raise RowError(f"{f.name}: {value!r} não é numérico") from None
+        elif isinstance(value, (int, float)):
+            number = value
+        else:
+            raise RowError(f"{f.name}: {type(value).__name__} em coluna numérica")
+        if isinstance(number, float) and not math.isfinite(number):
+            raise RowError(f"{f.name}: {js_string(number)} não é um número válido")
+        return value.strip() if isinstance(value, str) else repr(number)
+    if kind == "Boolean":
+        if not isinstance(value, bool):
+            raise RowError(f"{f.name}: {value!r} não é booleano")
+        return "t" if value else "f"
+    if kind == "DateTime":
+        moment = js_date(value)
+        if moment is INVALID_DATE:
+            raise RowError(f"{f.name}: Invalid Date ({value!r})")
+        if moment.tzinfo is not None:
+            moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+        return moment.isoformat(sep=" ")
+    if kind == "Json":
+        return _escape(_json(value))
+    # String: escalares viram texto como no JS; objetos viram JSON
+    if isinstance(value, (dict, list)):
+        return _escape(_json(value))
+    return _escape(js_string(value))
+
+
+# ------------------------------------------------------------------
+# Plano de carga de um endpoint
+# ------------------------------------------------------------------
+
+@dataclass
+class ForeignKey:
+    """Coluna que aponta para outro model (anulada se o pai não existir)"""
+    field: PrismaField
+    parent: PrismaModel
+    reference: PrismaField
+
+
+@dataclass
+class PreparedRow:
+    key: Any
+    values: List[str]
+    missing: List[str]
+    insert_error: Optional[str] = None
+
+
+class TablePlan:
+    """Colunas, chave e FKs do model de um endpoint"""
+
+    def __init__(self, mapping: EndpointMapping, models: Dict[str, PrismaModel]):
+        model = model_by_delegate(models, mapping.model)
+        if model is None:
+            raise ValueError(f"Model {mapping.model} não encontrado no schema.prisma")
+        self.mapping = mapping
+        self.model = model
+        self.compiled = CompiledMapping(mapping)
+
+        # Campos do mapeamento que não existem no model (o Prisma recusaria)
+        self.skipped = [t for t in mapping.targets if t not in model.fields]
+        self.columns = [model.fields[t] for t in mapping.targets if t in model.fields]
+        mapped = {f.name for f in self.columns}
+        self.touch = [f for f in model.fields.values() if f.updated_at and f.name not in mapped]
+        # Obrigatórios que o mapeamento nunca preenche: registro novo não pode ser criado
+        self.unmapped_required = [f.name for f in model.fields.values()
+                                  if f.required and f.name not in mapped]
+
+        self.key = model.fields.get(mapping.primary_key_target)
+        if self.key is None or not (self.key.is_id or self.key.unique):
+            raise ValueError(f"{mapping.endpoint}: chave {mapping.primary_key_target} "
+                             f"não é @id/@unique em {model.name}")
+        if self.key not in self.columns:
+            self.columns.insert(0, self.key)
+
+        self.foreign_keys = []
+        for relation in model.relations:
+            parent = models.get(relation.parent)
+            if parent is None or len(relation.fields) != 1 or relation.fields[0] not in mapped:
+                continue
+            self.foreign_keys.append(ForeignKey(model.fields[relation.fields[0]], parent,
+                                                parent.fields[relation.references[0]]))
+
+    def prepare(self, item: Dict[str, Any]) -> PreparedRow:
+        """Mapeia e converte um registro da API (RowError se inválido)"""
+        try:
+            mapped = self.compiled(item)
+        except (TypeError, ValueError, AttributeError) as e:
+            raise RowError(str(e)) from None
+
+        key = mapped.get(self.key.name, UNDEFINED)
+        if not js_truthy(key):
+            key = primary_key_value(self.mapping, item)
+            if not js_truthy(key):
+                raise RowError(f"Primary key {self.mapping.primary_key} is missing")
+            mapped[self.key.name] = key
+
+        values, missing, absent_required = [], [], []
+        for f in self.columns:
+            # null em coluna NOT NULL com @default conta como ausente (usa o padrão)
+            if f.name not in mapped or (mapped[f.name] is None and not f.optional
+                                        and not f.required):
+                missing.append(f.column)
+                values.append("\\N")
+                if f.required:
+                    absent_required.append(f.name)
+                continue
+            value = mapped[f.name]
+            if value is None and not f.optional:
+                raise RowError(f"{f.name} não pode ser nulo")
+            values.append(copy_value(f, value))
+
+        insert_error = None
+        if absent_required or self.unmapped_required:
+            names = ", ".join(absent_required + self.unmapped_required)
+            insert_error = f"campos obrigatórios sem valor para criar o registro: {names}"
+        return PreparedRow(values[self.columns.index(self.key)], values, missing, insert_error)
+
+    def _checked(self, f: PrismaField, alias: str = "s") -> str:
+        """Valor da coluna com a FK anulada quando o pai não existe"""
+        column = f"{alias}.{quote_ident(f.column)}"
+        for fk in self.foreign_keys:
+            if fk.field is f:
+                return (f"CASE WHEN {column} IS NULL OR EXISTS (SELECT 1 FROM "
+                        f"{fk.parent.qualified_table} p WHERE p.{quote_ident(fk.reference.column)}"
+                        f" = {column}) THEN {column} END")
+        return column
+
+    def _default(self, f: PrismaField) -> str:
+        """Valor de um campo ausente no INSERT (equivale ao @default do Prisma)"""
+        if f.updated_at or f.default == "now()":
+            return NOW_SQL
+        if f.default in ("true", "false") or (f.default or "").lstrip("-").replace(".", "").isdigit():
+            return f.default
+        if f.default and f.default.startswith('"'):
+            return "'" + f.default.strip('"').replace("'", "''") + "'"
+        return "NULL"
+
+    def merge_sql(self, staging: str, partial: Iterable[str]) -> str:
+        """
+        Upsert set-based do lote: atualiza quem existe, insere quem não existe
+
+        Devolve uma linha (atualizados, inseridos, registros com FK anulada).
+        `partial` são as colunas ausentes em algum registro do lote.
+        """
+        partial = set(partial)
+        target = self.model.qualified_table
+        key = quote_ident(self.key.column)
+
+        def value(f: PrismaField, fallback: str) -> str:
+            checked = self._checked(f)
+            if f.column not in partial:
+                return checked
+            return f"CASE WHEN '{f.column}' = ANY(s._missing) THEN {fallback} ELSE {checked} END"
+
+        updates = [f"{quote_ident(f.column)} = {value(f, 't.' + quote_ident(f.column))}"
+                   for f in self.columns if f is not self.key and f.name != "id"]
+        updates += [f"{quote_ident(f.column)} = {NOW_SQL}" for f in self.touch]
+        insert_columns = [quote_ident(f.column) for f in self.columns + self.touch]
+        insert_values = [value(f, self._default(f)) for f in self.columns]
+        insert_values += [NOW_SQL for _ in self.touch]
+
+        orphans = " OR ".join(
+            f"(s.{quote_ident(fk.field.column)} IS NOT NULL AND NOT EXISTS (SELECT 1 FROM "
+            f"{fk.parent.qualified_table} p WHERE p.{quote_ident(fk.reference.column)} = "
+            f"s.{quote_ident(fk.field.column)}))" for fk in self.foreign_keys) or "false"
+
+        update_sql = (f"UPDATE {target} AS t SET {', '.join(updates)} FROM {staging} s "
+                      f"WHERE t.{key} = s.{key} RETURNING 1") if updates else (
+                      f"SELECT 1 FROM {target} t JOIN {staging} s ON t.{key} = s.{key}")
+        return (
+            f"WITH upd AS ({update_sql}), "
+            f"ins AS (INSERT INTO {target} ({', '.join(insert_columns)}) "
+            f"SELECT {', '.join(insert_values)} FROM {staging} s WHERE s._insertable "
+            f"AND NOT EXISTS (SELECT 1 FROM {target} t WHERE t.{key} = s.{key}) "
+            f"ON CONFLICT ({key}) DO NOTHING RETURNING 1) "
+            f"SELECT (SELECT count(*) FROM upd), (SELECT count(*) FROM ins), "
+            f"(SELECT count(*) FROM {staging} s WHERE {orphans})"
+        )
+
+
+# ------------------------------------------------------------------
+# Carga
+# ------------------------------------------------------------------
+
+@dataclass
+class LoadStats:
+    endpoint: str
+    received: int = 0
+    inserted: int = 0
+    updated: int = 0
+    rejected: int = 0
+    duplicates: int = 0
+    fk_nulled: int = 0
+    batches: int = 0
+    seconds: float = 0.0
+    errors: Counter = field(default_factory=Counter)
+
+    @property
+    def first_error(self) -> Optional[str]:
+        return next(iter(self.errors), None)
+
+    def summary(self) -> str:
+        rate = self.received / self.seconds if self.seconds else 0.0
+        return (f"{self.endpoint}: {self.received} recebidos | {self.inserted} inseridos | "
+                f"{self.updated} atualizados | {self.rejected} com erro | "
+                f"{self.duplicates} duplicados | {self.fk_nulled} com FK anulada | "
+                f"{self.batches} lotes | {self.seconds:.2f}s ({rate:,.0f} registros/s)")
+
+
+def _array_literal(names: List[str]) -> str:
+    return "{" + ",".join(names) + "}"
+
+
+def _copy(cursor, sql: str, lines: Iterator[str]):
+    """COPY FROM STDIN em pedaços (psycopg 3) ou de um buffer (psycopg2)"""
+    if hasattr(cursor, "copy"):
+        with cursor.copy(sql) as copy:
+            chunk, size = [], 0
+            for line in lines:
+                chunk.append(line)
+                size += len(line)
+                if size >= COPY_CHUNK:
+                    copy.write("".join(chunk))
+                    chunk, size = [], 0
+            if chunk:
+                copy.write("".join(chunk))
+    else:
+        cursor.copy_expert(sql, io.StringIO("".join(lines)))
+
+
+class BulkLoader:
+    """Carrega registros de um endpoint no model do Prisma, lote a lote"""
+
+    def __init__(self, conn, endpoint: str, batch_size: int = BATCH_SIZE,
+                 mappings: Optional[Dict[str, EndpointMapping]] = None,
+                 models: Optional[Dict[str, PrismaModel]] = None):
+        mappings = mappings if mappings is not None else load_mappings()
+        if endpoint not in mappings:
+            raise KeyError(f"Endpoint sem mapeamento: {endpoint}")
+        self.conn = conn
+        self.plan = TablePlan(mappings[endpoint], models if models is not None else load_schema())
+        self.batch_size = batch_size
+        self.stats = LoadStats(endpoint)
+        self.staging = quote_ident(f"_stg_{self.plan.model.table}")
+
+    def load(self, records: Iterable[Dict[str, Any]]) -> LoadStats:
+        started = time.perf_counter()
+        batch: Dict[Any, PreparedRow] = {}
+        prepare = wrap("transform", self.plan.prepare)
+        for item in records:
+            self.stats.received += 1
+            try:
+                row = prepare(item)
+            except RowError as e:
+                self.stats.rejected += 1
+                self.stats.errors[str(e)] += 1
+                continue
+            if row.key in batch:
+                # Mesmo registro repetido no lote: vale a última versão
+                self.stats.duplicates += 1
+                del batch[row.key]
+            batch[row.key] = row
+            if len(batch) >= self.batch_size:
+                self._flush(batch)
+                batch = {}
+        if batch:
+            self._flush(batch)
+        self.stats.seconds += time.perf_counter() - started
+        return self.stats
+
+    def _flush(self, batch: Dict[Any, PreparedRow]):
+        with phase("write"):
+            self._copy_merge(batch)
+
+    def _copy_merge(self, batch: Dict[Any, PreparedRow]):
+        plan = self.plan
+        columns = [quote_ident(f.column) for f in plan.columns]
+        partial = {name for row in batch.values() for name in row.missing}
+
+        def lines() -> Iterator[str]:
+            for row in batch.values():
+                yield "\t".join(row.values + [_array_literal(row.missing),
+                                              "f" if row.insert_error else "t"]) + "\n"
+
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(
+                f"CREATE TEMP TABLE {self.staging} ON COMMIT DROP AS "
+                f"SELECT {', '.join(columns)}, NULL::text[] AS _missing, "
+                f"NULL::boolean AS _insertable FROM {plan.model.qualified_table} WITH NO DATA")
+            _copy(cursor, f"COPY {self.staging} ({', '.join(columns)}, _missing, _insertable) "
+                          f"FROM STDIN", lines())
+            cursor.execute(plan.merge_sql(self.staging, partial))
+            updated, inserted, orphans = cursor.fetchone()
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+        self.stats.updated += updated
+        self.stats.inserted += inserted
+        self.stats.fk_nulled += orphans
+        self.stats.batches += 1
+        not_created = len(batch) - updated - inserted
+        if not_created:
+            self.stats.rejected += not_created
+            reason = next((row.insert_error for row in batch.values() if row.insert_error),
+                          "registro não gravado")
+            self.stats.errors[reason] += not_created
+
+
+def load_endpoint(conn, endpoint: str, records: Iterable[Dict[str, Any]],
+                  batch_size: int = BATCH_SIZE) -> LoadStats:
+    """Atalho: carrega todos os registros de um endpoint"""
+    return BulkLoader(conn, endpoint, batch_size).load(records)
+
+
+def read_jsonl(path: str) -> Iterator[Dict[str, Any]]:
+    """Registros de um arquivo JSONL ('-' para a entrada padrão)"""
+    handle = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    try:
+        for line in handle:
+            if line.strip():
+                with phase("decode"):
+                    record = json.loads(line)
+                yield record
+    finally:
+        if handle is not sys.stdin:
+            handle.close()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Carga em massa (COPY + upsert) no Postgres")
+    parser.add_argument("endpoint", help="Chave de ENDPOINT_MAPPINGS, ex. bills")
+    parser.add_argument("--dsn", default=os.getenv("DATABASE_URL"))
+    parser.add_argument("--jsonl", help="Arquivo JSONL de registros ('-' = stdin)")
+    parser.add_argument("--api", action="store_true", help="Busca os registros na API Sienge")
+    parser.add_argument("--bulk", action="store_true", help="Usa a base bulk-data/v1 (com --api)")
+    parser.add_argument("--param", action="append", default=[], metavar="NOME=VALOR",
+                        help="Parâmetro da consulta à API (pode repetir)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--plan", action="store_true", help="Mostra o plano e o SQL sem carregar")
+    add_profile_argument(parser)
+    args = parser.parse_args(argv)
+
+    mappings = load_mappings()
+    if args.endpoint not in mappings:
+        parser.error(f"endpoint sem mapeamento; disponíveis: {', '.join(mappings)}")
+    plan = TablePlan(mappings[args.endpoint], load_schema())
+    print(f"{args.endpoint} -> {plan.model.qualified_table} | chave {plan.key.column} | "
+          f"{len(plan.columns)} colunas | FKs: "
+          f"{', '.join(fk.field.column for fk in plan.foreign_keys) or '-'}")
+    if plan.skipped:
+        print(f"[AVISO] Campos sem coluna no model (ignorados): {', '.join(plan.skipped)}")
+    if plan.unmapped_required:
+        print(f"[AVISO] Obrigatórios sem mapeamento (só atualiza existentes): "
+              f"{', '.join(plan.unmapped_required)}")
+    if args.plan:
+        print(plan.merge_sql(f"_stg_{plan.model.table}", []))
+        return 0
+    if not args.dsn:
+        parser.error("informe --dsn ou DATABASE_URL")
+    if bool(args.jsonl) == args.api:
+        parser.error("informe a origem: --jsonl ARQUIVO ou --api")
+
+    client = None
+    if args.api:
+        from pagination import iter_records
+        from sienge_client import SiengeClient
+        client = SiengeClient.from_env()
+        params = dict(item.split("=", 1) for item in args.param)
+        records = iter_records(client, f"/{args.endpoint}", params, bulk=args.bulk)
+    else:
+        records = read_jsonl(args.jsonl)
+
+    conn = connect(args.dsn)
+    try:
+        with profile_session(args.profile):
+            stats = BulkLoader(conn, args.endpoint, args.batch_size, mappings).load(records)
+    finally:
+        conn.close()
+        if client:
+            client.close()
+
+    print(f"[OK] {stats.summary()}")
+    for message, count in stats.errors.most_common(5):
+        print(f"  [ERRO] {count}x {message}")
+    return 1 if stats.rejected and not (stats.inserted or stats.updated) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
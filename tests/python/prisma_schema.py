@@ -0,0 +1,155 @@
+"""
+Leitura do prisma/schema.prisma
+
+Expõe, para cada model, a tabela física (schema + @@map), as colunas escalares
+com tipo, nulabilidade, @id/@unique, @default e @updatedAt, e as relações
+(chaves estrangeiras) declaradas com @relation. Usado pelos carregadores que
+escrevem direto no Postgres sem passar pelo Prisma Client.
+"""
+
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+SCHEMA_PATH = Path(__file__).resolve().parents[2] / "prisma" / "schema.prisma"
+
+SCALAR_TYPES = {
+    "Int": "integer",
+    "BigInt": "bigint",
+    "Float": "double precision",
+    "Decimal": "numeric",
+    "String": "text",
+    "Boolean": "boolean",
+    "DateTime": "timestamp(3)",
+    "Json": "jsonb",
+}
+
+_MODEL = re.compile(r"^model\s+(\w+)\s*\{(.*?)^\}", re.S | re.M)
+_FIELD = re.compile(r"^(\w+)\s+(\w+)(\[\])?(\?)?\s*(.*)$")
+_MAP = re.compile(r'@map\("([^"]+)"\)')
+_DB_TYPE = re.compile(r"@db\.(\w+(?:\([^)]*\))?)")
+_RELATION = re.compile(r"@relation\((.*)\)")
+
+
+@dataclass
+class PrismaField:
+    """Coluna escalar de um model"""
+    name: str
+    type: str
+    optional: bool
+    column: str
+    is_id: bool = False
+    unique: bool = False
+    default: Optional[str] = None
+    updated_at: bool = False
+    db_type: Optional[str] = None
+
+    @property
+    def required(self) -> bool:
+        """NOT NULL sem valor padrão: precisa vir no INSERT"""
+        return not self.optional and self.default is None and not self.updated_at
+
+
+@dataclass
+class PrismaRelation:
+    """Chave estrangeira: fields -> references no model pai"""
+    name: str
+    parent: str
+    fields: List[str]
+    references: List[str]
+
+
+@dataclass
+class PrismaModel:
+    name: str
+    table: str
+    schema: str = "public"
+    fields: Dict[str, PrismaField] = field(default_factory=dict)
+    relations: List[PrismaRelation] = field(default_factory=list)
+
+    @property
+    def delegate(self) -> str:
+        """Nome do delegate no Prisma Client (TituloPagar -> tituloPagar)"""
+        return self.name[:1].lower() + self.name[1:]
+
+    @property
+    def qualified_table(self) -> str:
+        return f'"{self.schema}"."{self.table}"'
+
+    @property
+    def id_field(self) -> Optional[PrismaField]:
+        return next((f for f in self.fields.values() if f.is_id), None)
+
+
+def _attribute_args(text: str, name: str) -> Optional[str]:
+    """Conteúdo entre parênteses de @name(...), respeitando parênteses aninhados"""
+    start = text.find(f"@{name}(")
+    if start < 0:
+        return None
+    pos = start + len(name) + 1
+    depth = 0
+    for index in range(pos, len(text)):
+        if text[index] == "(":
+            depth += 1
+        elif text[index] == ")":
+            depth -= 1
+            if depth == 0:
+                return text[pos + 1:index]
+    return None
+
+
+def _names(text: str, key: str) -> List[str]:
+    match = re.search(rf"{key}:\s*\[([^\]]*)\]", text)
+    return [name.strip() for name in match.group(1).split(",")] if match else []
+
+
+def parse_schema(text: str) -> Dict[str, PrismaModel]:
+    """Models do schema, indexados pelo nome do model"""
+    models: Dict[str, PrismaModel] = {}
+    for name, body in _MODEL.findall(text):
+        model = PrismaModel(name=name, table=name)
+        for raw in body.splitlines():
+            line = raw.split("//", 1)[0].strip()
+            if not line:
+                continue
+            if line.startswith("@@map("):
+                model.table = re.search(r'"([^"]+)"', line).group(1)
+            elif line.startswith("@@schema("):
+                model.schema = re.search(r'"([^"]+)"', line).group(1)
+            elif not line.startswith("@@"):
+                match = _FIELD.match(line)
+                if not match:
+                    continue
+                fname, ftype, is_list, optional, attrs = match.groups()
+                if ftype not in SCALAR_TYPES:
+                    relation = _RELATION.search(attrs)
+                    if relation and "fields:" in relation.group(1):
+                        model.relations.append(PrismaRelation(
+                            fname, ftype, _names(relation.group(1), "fields"),
+                            _names(relation.group(1), "references")))
+                    continue
+                if is_list:
+                    continue
+                column = _MAP.search(attrs)
+                db_type = _DB_TYPE.search(attrs)
+                model.fields[fname] = PrismaField(
+                    name=fname, type=ftype, optional=bool(optional),
+                    column=column.group(1) if column else fname,
+                    is_id=re.search(r"@id\b", attrs) is not None,
+                    unique=re.search(r"@unique\b", attrs) is not None,
+                    default=_attribute_args(attrs, "default"),
+                    updated_at="@updatedAt" in attrs,
+                    db_type=db_type.group(1) if db_type else None,
+                )
+        models[name] = model
+    return models
+
+
+def load_schema(path: Path = SCHEMA_PATH) -> Dict[str, PrismaModel]:
+    return parse_schema(Path(path).read_text(encoding="utf-8"))
+
+
+def model_by_delegate(models: Dict[str, PrismaModel], delegate: str) -> Optional[PrismaModel]:
+    """Model pelo nome usado em prisma.<delegate> (ex.: 'tituloPagar')"""
+    return next((m for m in models.values() if m.delegate == delegate), None)
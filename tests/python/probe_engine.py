@@ -0,0 +1,100 @@
+"""
+Motor assíncrono de sondagem de endpoints da API Sienge
+
+Executa as chamadas bloqueantes em um pool de threads sob um limite de
+concorrência e um token bucket, no lugar do time.sleep fixo entre requisições.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, List, Optional, Sequence
+
+# Limites padrão (mesmos valores de SIENGE_API_CONFIG em lib/sienge-api-client.ts);
+# as variáveis de ambiente dão a cada tenant o próprio orçamento (tenants.py)
+RATE_LIMIT_PER_MINUTE = float(os.getenv("SIENGE_RATE_LIMIT", "200"))
+RATE_LIMIT_BURST = int(os.getenv("SIENGE_RATE_BURST", "20"))
+MAX_CONCURRENCY = int(os.getenv("SIENGE_MAX_CONCURRENCY", "8"))
+
+
+class TokenBucket:
+    """Token bucket por reserva, utilizável por threads e por corrotinas"""
+
+    def __init__(self, rate_per_minute: float = RATE_LIMIT_PER_MINUTE,
+                 burst: int = RATE_LIMIT_BURST):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(burst)
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def _reserve(self) -> float:
+        """Reserva um token e retorna quantos segundos esperar por ele"""
+        with self._lock:
+            self._refill()
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def try_acquire(self) -> bool:
+        """Consome um token se houver um disponível agora, sem esperar"""
+        with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    def acquire(self):
+        """Bloqueia a thread atual até haver um token disponível"""
+        delay = self._reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self):
+        """Aguarda um token sem bloquear o event loop"""
+        delay = self._reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+async def run_probes(jobs: Sequence[Any], worker: Callable[[Any], Any],
+                     concurrency: int = MAX_CONCURRENCY,
+                     bucket: Optional[TokenBucket] = None,
+                     on_result: Optional[Callable[[Any, Any], None]] = None) -> List[Any]:
+    """
+    Executa worker(job) para cada job com concorrência limitada
+
+    O worker é bloqueante e roda no pool de threads; on_result é chamado no
+    event loop (uma única thread), então pode atualizar estado global sem lock.
+
+    Returns:
+        Lista de resultados na mesma ordem de jobs
+    """
+    bucket = bucket or TokenBucket()
+    semaphore = asyncio.Semaphore(concurrency)
+    loop = asyncio.get_running_loop()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        async def run_one(job):
+            async with semaphore:
+                await bucket.acquire_async()
+                result = await loop.run_in_executor(executor, worker, job)
+            if on_result:
+                on_result(job, result)
+            return result
+
+        return await asyncio.gather(*(run_one(job) for job in jobs))
+
+
+def probe_all(jobs: Iterable[Any], worker: Callable[[Any], Any], **kwargs) -> List[Any]:
+    """Atalho síncrono para run_probes"""
+    return asyncio.run(run_probes(list(jobs), worker, **kwargs))
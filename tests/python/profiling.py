@@ -0,0 +1,454 @@
+#!/usr/bin/env python3
+"""
+Modo de profiling por fase das sondagens e extrações
+
+Cada fase do trabalho (spec, request, decode, transform, write) é marcada no
+código com `with phase("decode"):`. Sem profiling ativo, phase() devolve um
+contexto nulo e o custo é desprezível. Com profiling ativo, cada fase tem seu
+próprio cProfile (por thread, somados no fim) e o tracemalloc mede o pico de
+memória e os maiores alocadores enquanto a fase está aberta. O tempo da thread
+principal fora de qualquer fase vai para "other".
+
+Tempos por fase são exclusivos: uma fase aninhada (ex.: request dentro do
+decode de um stream) desconta o seu tempo da fase externa. Com várias threads
+(probe_all), o tempo de parede é a soma entre threads e os alocadores de uma
+fase incluem o que as outras threads alocaram enquanto ela estava aberta.
+
+O relatório fica em um diretório:
+    report.json      chamadas, tempo de parede e CPU, memória, funções e alocadores por fase
+    <fase>.prof      estatísticas do cProfile (pstats, snakeviz)
+    <fase>.folded    pilhas colapsadas para flamegraph.pl / speedscope
+
+Uso:
+    python test_all_sienge_endpoints.py --profile
+    python checkpoints.py /bills --profile profiles/bills
+    python profiling.py --output profiles/bills test_bills_endpoint.py
+"""
+
+import argparse
+import cProfile
+import json
+import os
+import pstats
+import runpy
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from functools import wraps
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+PHASES = ("spec", "request", "decode", "transform", "write")
+OTHER = "other"
+PROFILE_DIR = "profiles"
+
+_NULL = nullcontext()
+# Alocações do próprio profiler e do mecanismo de import ficam fora do relatório
+_IGNORED_FILES = (tracemalloc.__file__, __file__, "<frozen importlib._bootstrap>",
+                  "<frozen importlib._bootstrap_external>")
+_IGNORED_FILTERS = [tracemalloc.Filter(False, filename) for filename in _IGNORED_FILES]
+_active: Optional["PhaseProfiler"] = None
+
+
+def default_output() -> str:
+    return os.path.join(PROFILE_DIR, datetime.now().strftime("%Y%m%d_%H%M%S"))
+
+
+class _Occurrence:
+    """Uma fase aberta em uma thread"""
+
+    __slots__ = ("name", "profile", "started", "cpu", "child_wall", "child_cpu",
+                 "base", "peak", "snapshot")
+
+    def __init__(self, name: str, profile: Optional[cProfile.Profile], base: int):
+        self.name = name
+        self.profile = profile
+        self.started = time.perf_counter()
+        self.cpu = time.thread_time()
+        self.child_wall = 0.0
+        self.child_cpu = 0.0
+        self.base = base
+        self.peak = base
+        self.snapshot: Optional[tracemalloc.Snapshot] = None
+
+
+class PhaseStats:
+    """Totais de uma fase somados entre ocorrências e threads"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.peak_traced = 0
+        self.peak_growth = 0
+        self.retained = 0
+        self.snapshots = 0
+        self.profiles: List[cProfile.Profile] = []
+        self.allocations: Dict[str, List[int]] = {}
+
+    def add_allocations(self, before: tracemalloc.Snapshot, after: tracemalloc.Snapshot):
+        # Só o que cresceu na fase, por linha de origem
+        for diff in after.compare_to(before, "lineno"):
+            if diff.size_diff <= 0:
+                continue
+            frame = diff.traceback[0]
+            totals = self.allocations.setdefault(f"{frame.filename}:{frame.lineno}", [0, 0])
+            totals[0] += diff.size_diff
+            totals[1] += max(diff.count_diff, 0)
+
+
+class PhaseProfiler:
+    """cProfile e tracemalloc por fase; ver phase()"""
+
+    def __init__(self, output: str, top: int = 25, snapshots: int = 3, frames: int = 1):
+        self.output = output
+        self.top = top
+        self.snapshots = snapshots
+        self.frames = frames
+        self.started: Optional[datetime] = None
+        self.wall = 0.0
+        self.phases: Dict[str, PhaseStats] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._open: List[_Occurrence] = []
+        self._final: Optional[tracemalloc.Snapshot] = None
+        self._own_tracemalloc = False
+        self._clock = 0.0
+
+    def start(self):
+        self.started = datetime.now()
+        self._clock = time.perf_counter()
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._own_tracemalloc = True
+
+    def stop(self):
+        self.wall = time.perf_counter() - self._clock
+        self._final = self._snapshot()
+        if self._own_tracemalloc:
+            tracemalloc.stop()
+
+    def _stats(self, name: str) -> PhaseStats:
+        stats = self.phases.get(name)
+        if stats is None:
+            stats = self.phases[name] = PhaseStats(name)
+        return stats
+
+    def _profile(self, name: str) -> cProfile.Profile:
+        # Um cProfile por thread e fase (o cProfile só mede a thread que o ativou)
+        profiles = self._local.__dict__.setdefault("profiles", {})
+        profile = profiles.get(name)
+        if profile is None:
+            profile = profiles[name] = cProfile.Profile()
+            with self._lock:
+                self._stats(name).profiles.append(profile)
+        return profile
+
+    def _fold_peak(self) -> int:
+        """Distribui o pico do tracemalloc às fases abertas e recomeça a medição (com o lock)"""
+        current, peak = tracemalloc.get_traced_memory()
+        for occurrence in self._open:
+            if peak > occurrence.peak:
+                occurrence.peak = peak
+        tracemalloc.reset_peak()
+        return current
+
+    @staticmethod
+    def _snapshot() -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces(_IGNORED_FILTERS)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        stack: List[_Occurrence] = self._local.__dict__.setdefault("stack", [])
+        outer = stack[-1] if stack else None
+        if outer is not None and outer.name == name:
+            # Mesma fase reaberta por dentro (ex.: json() dentro de um decode): continua a externa
+            yield
+            return
+        if outer is not None and outer.profile is not None:
+            outer.profile.disable()
+        profile = self._profile(name)
+        with self._lock:
+            occurrence = _Occurrence(name, None, self._fold_peak())
+            stats = self._stats(name)
+            if stats.snapshots < self.snapshots and not any(o.name == name for o in self._open):
+                stats.snapshots += 1
+                occurrence.snapshot = self._snapshot()
+            self._open.append(occurrence)
+        stack.append(occurrence)
+        try:
+            profile.enable()
+            occurrence.profile = profile
+        except ValueError:
+            # Outro profiler ativo no processo (ex.: Python 3.12+ com profiling em outra thread)
+            pass
+        occurrence.started = time.perf_counter()
+        occurrence.cpu = time.thread_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - occurrence.started
+            cpu = time.thread_time() - occurrence.cpu
+            if occurrence.profile is not None:
+                occurrence.profile.disable()
+            stack.pop()
+            with self._lock:
+                current = self._fold_peak()
+                self._open.remove(occurrence)
+                stats.calls += 1
+                stats.wall += wall - occurrence.child_wall
+                stats.cpu += cpu - occurrence.child_cpu
+                stats.peak_traced = max(stats.peak_traced, occurrence.peak)
+                stats.peak_growth = max(stats.peak_growth, occurrence.peak - occurrence.base)
+                stats.retained += current - occurrence.base
+                if occurrence.snapshot is not None:
+                    stats.add_allocations(occurrence.snapshot, self._snapshot())
+            if outer is not None:
+                outer.child_wall += wall
+                outer.child_cpu += cpu
+                if outer.profile is not None:
+                    outer.profile.enable()
+
+    def report(self) -> Dict[str, Any]:
+        """Relatório completo; grava os .prof e .folded de cada fase em self.output"""
+        os.makedirs(self.output, exist_ok=True)
+        phases: Dict[str, Any] = {}
+        for name, stats in sorted(self.phases.items(), key=lambda item: -item[1].wall):
+            merged = merge_profiles(stats.profiles)
+            entry: Dict[str, Any] = {
+                "calls": stats.calls,
+                "wall_seconds": round(stats.wall, 6),
+                "cpu_seconds": round(stats.cpu, 6),
+                "peak_traced_mb": _mb(stats.peak_traced),
+                "peak_growth_mb": _mb(stats.peak_growth),
+                "retained_mb": _mb(stats.retained),
+                "top_functions": top_functions(merged, self.top) if merged else [],
+                "top_allocators": [
+                    {"where": where, "size_kb": round(size / 1024, 1), "count": count}
+                    for where, (size, count) in sorted(stats.allocations.items(),
+                                                      key=lambda item: -item[1][0])[:self.top]
+                ],
+                "sampled_occurrences": stats.snapshots,
+            }
+            if merged:
+                entry["pstats"] = os.path.join(self.output, f"{name}.prof")
+                merged.dump_stats(entry["pstats"])
+                entry["folded"] = os.path.join(self.output, f"{name}.folded")
+                write_folded(merged, name, entry["folded"])
+            phases[name] = entry
+
+        final = []
+        if self._final is not None:
+            final = [{"where": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                      "size_kb": round(stat.size / 1024, 1), "count": stat.count}
+                     for stat in self._final.statistics("lineno")[:self.top]]
+        peak_rss = None
+        if resource is not None:
+            peak_rss = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+        return {
+            "started": self.started.isoformat() if self.started else None,
+            "argv": sys.argv,
+            "wall_seconds": round(self.wall, 6),
+            "peak_rss_mb": peak_rss,
+            "peak_traced_mb": _mb(max((s.peak_traced for s in self.phases.values()), default=0)),
+            "phases": phases,
+            "retained_at_end": final,
+        }
+
+    def write(self) -> str:
+        path = os.path.join(self.output, "report.json")
+        report = self.report()
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print_report(report)
+        return path
+
+
+def _mb(size: int) -> float:
+    return round(size / 1024 / 1024, 2)
+
+
+def merge_profiles(profiles: List[cProfile.Profile]) -> Optional[pstats.Stats]:
+    """Soma os cProfile de todas as threads de uma fase"""
+    merged = None
+    for profile in profiles:
+        try:
+            stats = pstats.Stats(profile)
+        except TypeError:
+            # cProfile sem nenhuma chamada medida
+            continue
+        if merged is None:
+            merged = stats
+        else:
+            merged.add(stats)
+    return merged
+
+
+def _label(func: Tuple[str, int, str]) -> str:
+    filename, lineno, name = func
+    if filename == "~":
+        return name.replace(";", ",")
+    return f"{name} ({os.path.basename(filename)}:{lineno})".replace(";", ",")
+
+
+def top_functions(stats: pstats.Stats, top: int) -> List[Dict[str, Any]]:
+    """Funções com mais tempo próprio"""
+    rows = sorted(stats.stats.items(), key=lambda item: -item[1][2])[:top]
+    return [{"function": _label(func), "calls": nc, "tottime": round(tt, 6), "cumtime": round(ct, 6)}
+            for func, (cc, nc, tt, ct, callers) in rows]
+
+
+def folded_stacks(stats: pstats.Stats, root: str, max_depth: int = 64) -> Dict[str, int]:
+    """
+    Pilhas colapsadas (microssegundos) reconstruídas das arestas chamador->chamado
+
+    O cProfile só guarda pares chamador/chamado, então o tempo de cada função é
+    repartido entre os caminhos na proporção do tempo de cada aresta (como o
+    flameprof); recursão é cortada no primeiro ciclo.
+    """
+    callees: Dict[Tuple, List[Tuple[Tuple, float]]] = {}
+    roots = []
+    for func, (cc, nc, tt, ct, callers) in stats.stats.items():
+        known = [caller for caller in callers if caller in stats.stats]
+        if not known:
+            roots.append(func)
+        for caller in known:
+            callees.setdefault(caller, []).append((func, callers[caller][3]))
+
+    folded: Dict[str, int] = {}
+
+    def walk(func: Tuple, path: Tuple[str, ...], seen: frozenset, weight: float):
+        cc, nc, tt, ct, callers = stats.stats[func]
+        share = min(weight / ct, 1.0) if ct else 0.0
+        path = path + (_label(func),)
+        own = int(tt * share * 1e6)
+        if own:
+            key = ";".join(path)
+            folded[key] = folded.get(key, 0) + own
+        if len(path) >= max_depth:
+            return
+        for callee, edge in callees.get(func, ()):
+            child = edge * share
+            if child * 1e6 >= 1 and callee not in seen:
+                walk(callee, path, seen | {callee}, child)
+
+    for func in roots:
+        walk(func, (root,), frozenset((func,)), stats.stats[func][3])
+    return folded
+
+
+def write_folded(stats: pstats.Stats, root: str, path: str):
+    with open(path, "w", encoding="utf-8") as f:
+        for stack, micros in sorted(folded_stacks(stats, root).items()):
+            f.write(f"{stack} {micros}\n")
+
+
+def print_report(report: Dict[str, Any]):
+    print(f"\nPROFILING ({report['wall_seconds']:.2f}s, pico RSS {report['peak_rss_mb']}MB, "
+          f"pico tracemalloc {report['peak_traced_mb']}MB)")
+    print(f"  {'fase':10} | {'chamadas':>8} | {'parede':>9} | {'cpu':>9} | {'pico mem':>9} | função mais cara")
+    for name, entry in report["phases"].items():
+        hottest = entry["top_functions"][0]["function"] if entry["top_functions"] else "-"
+        print(f"  {name:10} | {entry['calls']:>8} | {entry['wall_seconds']:>8.3f}s | "
+              f"{entry['cpu_seconds']:>8.3f}s | {entry['peak_growth_mb']:>7.2f}MB | {hottest[:60]}")
+
+
+def phase(name: str):
+    """Contexto da fase `name` no profiler ativo (nulo quando o profiling está desligado)"""
+    profiler = _active
+    return profiler.phase(name) if profiler is not None else _NULL
+
+
+def enabled() -> bool:
+    return _active is not None
+
+
+def wrap(name: str, func: Callable) -> Callable:
+    """`func` medido como fase `name`; a própria função quando o profiling está desligado"""
+    profiler = _active
+    if profiler is None:
+        return func
+
+    @wraps(func)
+    def phased(*args, **kwargs):
+        with profiler.phase(name):
+            return func(*args, **kwargs)
+    return phased
+
+
+def phased(name: str, items: Iterable[Any]) -> Iterator[Any]:
+    """Itera `items` medindo cada next() como fase `name` (para geradores preguiçosos)"""
+    profiler = _active
+    if profiler is None:
+        yield from items
+        return
+    iterator = iter(items)
+    while True:
+        with profiler.phase(name):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+@contextmanager
+def profile_session(output: Optional[str], **options) -> Iterator[Optional[PhaseProfiler]]:
+    """Ativa o profiling durante o bloco e grava o relatório ao sair (output=None: desligado)"""
+    global _active
+    if not output:
+        yield None
+        return
+    if _active is not None:
+        raise RuntimeError("Já existe uma sessão de profiling ativa")
+    profiler = PhaseProfiler(output, **options)
+    profiler.start()
+    _active = profiler
+    try:
+        with profiler.phase(OTHER):
+            yield profiler
+    finally:
+        _active = None
+        profiler.stop()
+        path = profiler.write()
+        print(f"Relatório de profiling salvo em: {path}")
+
+
+def add_profile_argument(parser: argparse.ArgumentParser):
+    """Opção --profile [DIR] comum aos scripts de sondagem e extração"""
+    parser.add_argument("--profile", nargs="?", const=default_output(), metavar="DIR",
+                        help=f"Grava cProfile/tracemalloc por fase em DIR (padrão: {PROFILE_DIR}/<data>)")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Executa um script com profiling por fase")
+    parser.add_argument("--output", default=default_output(), help="Diretório do relatório")
+    parser.add_argument("--top", type=int, default=25, help="Funções e alocadores por fase")
+    parser.add_argument("--snapshots", type=int, default=3,
+                        help="Ocorrências por fase com snapshot do tracemalloc")
+    parser.add_argument("script")
+    parser.add_argument("args", nargs=argparse.REMAINDER)
+    args = parser.parse_args(argv)
+
+    sys.argv = [args.script] + args.args
+    sys.path.insert(0, os.path.dirname(os.path.abspath(args.script)))
+    with profile_session(args.output, top=args.top, snapshots=args.snapshots):
+        try:
+            runpy.run_path(args.script, run_name="__main__")
+        except SystemExit as e:
+            return e.code if isinstance(e.code, int) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    # Os módulos instrumentados importam "profiling": a sessão precisa ser a mesma instância
+    import profiling
+    sys.exit(profiling.main())
@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+Reconciliação entre as variantes v1 e bulk-data dos mesmos dados
+
+Extrai as duas variantes de um período, normaliza cada registro para a chave
+de negócio e os campos comparáveis (nomes da v1) e ordena cada lado por
+chave com um sort externo: blocos ordenados em memória viram arquivos
+temporários, unidos depois com heapq.merge. O join é um sort-merge sobre os
+dois fluxos ordenados, então a memória fica limitada ao tamanho do bloco,
+qualquer que seja o período.
+
+O relatório traz, por par: registros só na v1 (faltando no bulk), só no
+bulk (extras), chaves repetidas e, para os presentes nos dois, quantas
+divergências por campo, com exemplos.
+
+Pares conhecidos (PAIRS):
+    income     /income v1 x /income bulk (a v1 não está nos YAMLs, mas a
+               varredura a consulta; mesmos nomes de campo do Installment)
+    movements  /accounts-statements v1 x /bank-movement bulk (Statement x
+               BankMovement, id = bankMovementId)
+
+Uso:
+    python reconcile.py movements --start 2024-01-01 --end 2024-03-31
+    python reconcile.py income --start 2024-01-01 --end 2024-01-31 --report income.json
+    python reconcile.py movements --start 2024-01-01 --end 2024-12-31 --run-size 20000
+"""
+
+import argparse
+import heapq
+import json
+import os
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from itertools import groupby
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import requests
+
+from date_sharding import date_params_for
+from json_stream import stream_records
+from pagination import PageError, iter_records
+
+# Linhas ordenadas em memória antes de irem para um arquivo temporário
+RUN_SIZE = 50_000
+# Exemplos guardados por tipo de divergência
+SAMPLES = 5
+# Casas decimais na comparação de valores numéricos
+DECIMALS = 2
+
+
+@dataclass
+class Variant:
+    """Um lado da reconciliação: endpoint, filtros e nomes dos campos na origem"""
+    path: str
+    bulk: bool
+    key: Tuple[str, ...]
+    # Campo canônico (nome na v1) -> campo do registro desta variante
+    fields: Dict[str, str]
+    params: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def label(self) -> str:
+        return f"{'bulk' if self.bulk else 'v1'} {self.path}"
+
+
+@dataclass
+class Pair:
+    v1: Variant
+    bulk: Variant
+
+
+_INCOME_FIELDS = ("companyId", "clientId", "documentIdentificationId", "documentNumber",
+                  "originalAmount", "balanceAmount", "dueDate", "issueDate", "installmentNumber")
+
+PAIRS = {
+    "income": Pair(
+        Variant("/income", False, ("billId", "installmentId"),
+                {name: name for name in _INCOME_FIELDS}, {"selectionType": "D"}),
+        Variant("/income", True, ("billId", "installmentId"),
+                {name: name for name in _INCOME_FIELDS}, {"selectionType": "D"}),
+    ),
+    "movements": Pair(
+        Variant("/accounts-statements", False, ("id",), {
+            "value": "value", "date": "date", "billId": "billId",
+            "installmentNumber": "installmentNumber", "documentId": "documentId",
+            "documentNumber": "documentNumber", "statementOrigin": "statementOrigin",
+            "statementType": "statementType",
+        }),
+        Variant("/bank-movement", True, ("bankMovementId",), {
+            "value": "bankMovementAmount", "date": "bankMovementDate", "billId": "billId",
+            "installmentNumber": "installmentId", "documentId": "documentIdentificationId",
+            "documentNumber": "documentIdentificationNumber",
+            "statementOrigin": "bankMovementOriginId", "statementType": "bankMovementOperationName",
+        }),
+    ),
+}
+
+
+@dataclass
+class Report:
+    pair: str
+    start: str
+    end: str
+    v1_records: int = 0
+    bulk_records: int = 0
+    matched: int = 0
+    identical: int = 0
+    missing: int = 0
+    extra: int = 0
+    duplicated: Dict[str, int] = field(default_factory=lambda: {"v1": 0, "bulk": 0})
+    field_diffs: Dict[str, int] = field(default_factory=dict)
+    samples: Dict[str, List[Any]] = field(default_factory=dict)
+    runs: Dict[str, int] = field(default_factory=dict)
+    seconds: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def consistent(self) -> bool:
+        return not (self.missing or self.extra or self.field_diffs or any(self.duplicated.values()))
+
+    def sample(self, kind: str, value: Any, limit: int = SAMPLES):
+        items = self.samples.setdefault(kind, [])
+        if len(items) < limit:
+            items.append(value)
+
+
+def normalize(value: Any) -> Any:
+    """Forma comparável: números arredondados, datas sem hora zerada, textos sem bordas"""
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, (int, float)):
+        return round(float(value), DECIMALS)
+    if isinstance(value, str):
+        text = value.strip()
+        if len(text) >= 10 and text[4:5] == "-" and text[7:8] == "-" \
+                and text[10:].strip("T:0. Z") == "":
+            return text[:10]
+        return text or None
+    return value
+
+
+def row_key(record: Dict[str, Any], key: Tuple[str, ...]) -> Optional[str]:
+    """Chave de ordenação: valores da chave de negócio como texto (None se faltar algum)"""
+    values = [record.get(name) for name in key]
+    if any(value is None for value in values):
+        return None
+    return json.dumps([str(value) for value in values])
+
+
+def normalized_rows(records: Iterable[Any], variant: Variant) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """(chave, campos canônicos) de cada registro; registros sem chave são descartados"""
+    for record in records:
+        if not isinstance(record, dict):
+            continue
+        key = row_key(record, variant.key)
+        if key is not None:
+            yield key, {name: normalize(record.get(source))
+                        for name, source in variant.fields.items()}
+
+
+def external_sort(rows: Iterable[Tuple[str, Dict[str, Any]]], directory: str,
+                  run_size: int = RUN_SIZE) -> Tuple[Iterator[Tuple[str, Dict[str, Any]]], int, int]:
+    """
+    Ordena por chave com memória limitada: devolve (fluxo ordenado, linhas, blocos)
+
+    Cada bloco de run_size linhas é ordenado e gravado em JSONL; o fluxo final
+    é o heapq.merge dos blocos, lido linha a linha.
+    """
+    paths: List[str] = []
+    buffer: List[Tuple[str, Dict[str, Any]]] = []
+    total = 0
+
+    def flush():
+        buffer.sort(key=lambda row: row[0])
+        handle, path = tempfile.mkstemp(suffix=".jsonl", dir=directory)
+        with os.fdopen(handle, "w", encoding="utf-8") as f:
+            for key, values in buffer:
+                f.write(json.dumps([key, values], ensure_ascii=False) + "\n")
+        paths.append(path)
+        buffer.clear()
+
+    for row in rows:
+        buffer.append(row)
+        total += 1
+        if len(buffer) >= run_size:
+            flush()
+    if buffer or not paths:
+        flush()
+
+    def read(path: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                key, values = json.loads(line)
+                yield key, values
+
+    return heapq.merge(*(read(path) for path in paths), key=lambda row: row[0]), total, len(paths)
+
+
+def merge_join(v1_rows: Iterator[Tuple[str, Dict[str, Any]]],
+               bulk_rows: Iterator[Tuple[str, Dict[str, Any]]], report: Report):
+    """Sort-merge dos dois lados já ordenados, acumulando as divergências no relatório"""
+    v1_groups = groupby(v1_rows, key=lambda row: row[0])
+    bulk_groups = groupby(bulk_rows, key=lambda row: row[0])
+    v1_item = next(v1_groups, None)
+    bulk_item = next(bulk_groups, None)
+
+    def first(group, side: str) -> Dict[str, Any]:
+        rows = list(group)
+        if len(rows) > 1:
+            report.duplicated[side] += len(rows) - 1
+            report.sample(f"duplicated_{side}", rows[0][0])
+        return rows[0][1]
+
+    while v1_item is not None or bulk_item is not None:
+        if bulk_item is None or (v1_item is not None and v1_item[0] < bulk_item[0]):
+            first(v1_item[1], "v1")
+            report.missing += 1
+            report.sample("missing", json.loads(v1_item[0]))
+            v1_item = next(v1_groups, None)
+        elif v1_item is None or bulk_item[0] < v1_item[0]:
+            first(bulk_item[1], "bulk")
+            report.extra += 1
+            report.sample("extra", json.loads(bulk_item[0]))
+            bulk_item = next(bulk_groups, None)
+        else:
+            key = json.loads(v1_item[0])
+            left, right = first(v1_item[1], "v1"), first(bulk_item[1], "bulk")
+            report.matched += 1
+            differing = [name for name in left if left[name] != right.get(name)]
+            if not differing:
+                report.identical += 1
+            for name in differing:
+                report.field_diffs[name] = report.field_diffs.get(name, 0) + 1
+                report.sample(f"field:{name}", {"key": key, "v1": left[name],
+                                                "bulk": right.get(name)})
+            v1_item = next(v1_groups, None)
+            bulk_item = next(bulk_groups, None)
+
+
+def extract(client, variant: Variant, start: str, end: str) -> Iterator[Any]:
+    """Registros da variante no período (bulk numa requisição em streaming, v1 paginada)"""
+    start_param, end_param = date_params_for(variant.path)
+    params = {**variant.params, start_param: start, end_param: end}
+    if variant.bulk:
+        return stream_records(client, variant.path, params, bulk=True)
+    return iter_records(client, variant.path, params)
+
+
+def reconcile(client, name: str, start: str, end: str, run_size: int = RUN_SIZE,
+              work_dir: Optional[str] = None) -> Report:
+    """Extrai, ordena e cruza as duas variantes do par `name`"""
+    pair = PAIRS[name]
+    report = Report(name, start, end)
+    with tempfile.TemporaryDirectory(prefix="reconcile-", dir=work_dir) as directory:
+        sorted_sides = {}
+        for side, variant in (("v1", pair.v1), ("bulk", pair.bulk)):
+            began = time.perf_counter()
+            rows, total, runs = external_sort(
+                normalized_rows(extract(client, variant, start, end), variant), directory, run_size)
+            sorted_sides[side] = rows
+            setattr(report, f"{side}_records", total)
+            report.runs[side] = runs
+            report.seconds[side] = round(time.perf_counter() - began, 3)
+        began = time.perf_counter()
+        merge_join(sorted_sides["v1"], sorted_sides["bulk"], report)
+        report.seconds["merge"] = round(time.perf_counter() - began, 3)
+    return report
+
+
+def print_report(report: Report):
+    pair = PAIRS[report.pair]
+    print(f"\n{report.pair}: {pair.v1.label} x {pair.bulk.label} | {report.start}..{report.end}")
+    print(f"  v1: {report.v1_records} registros ({report.runs['v1']} bloco(s), "
+          f"{report.seconds['v1']:.1f}s) | bulk: {report.bulk_records} registros "
+          f"({report.runs['bulk']} bloco(s), {report.seconds['bulk']:.1f}s) | "
+          f"merge {report.seconds['merge']:.2f}s")
+    print(f"  nos dois lados: {report.matched} ({report.identical} idênticos) | "
+          f"faltando no bulk: {report.missing} | extras no bulk: {report.extra} | "
+          f"chaves repetidas v1/bulk: {report.duplicated['v1']}/{report.duplicated['bulk']}")
+    for name, count in sorted(report.field_diffs.items(), key=lambda item: -item[1]):
+        examples = report.samples.get(f"field:{name}", [])[:2]
+        shown = "; ".join(f"{e['key']}: {e['v1']!r} x {e['bulk']!r}" for e in examples)
+        print(f"  [DIFF] {name:25} | {count:7} divergência(s) | ex.: {shown}")
+    for kind, label in (("missing", "faltando no bulk"), ("extra", "extras no bulk")):
+        if report.samples.get(kind):
+            print(f"  {label}, ex.: {report.samples[kind]}")
+
+
+def main(argv=None) -> int:
+    from sienge_client import SiengeClient
+
+    parser = argparse.ArgumentParser(description="Reconcilia as variantes v1 e bulk-data")
+    parser.add_argument("pair", choices=sorted(PAIRS), nargs="+")
+    parser.add_argument("--start", required=True, help="Data inicial (yyyy-MM-dd)")
+    parser.add_argument("--end", required=True, help="Data final (yyyy-MM-dd)")
+    parser.add_argument("--run-size", type=int, default=RUN_SIZE,
+                        help="Linhas ordenadas em memória por bloco")
+    parser.add_argument("--work-dir", help="Diretório dos blocos temporários")
+    parser.add_argument("--report", help="Grava o relatório em JSON")
+    args = parser.parse_args(argv)
+
+    client = SiengeClient.from_env()
+    reports, failed = [], []
+    try:
+        for name in args.pair:
+            try:
+                report = reconcile(client, name, args.start, args.end, args.run_size,
+                                   args.work_dir)
+            except (PageError, requests.RequestException, ValueError) as e:
+                print(f"[ERRO] {name}: {e}"[:300])
+                failed.append(name)
+                continue
+            print_report(report)
+            reports.append(report)
+    finally:
+        client.close()
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump([{**vars(report), "consistent": report.consistent} for report in reports],
+                      f, indent=2, ensure_ascii=False)
+        print(f"\nRelatório: {args.report}")
+    inconsistent = [report.pair for report in reports if not report.consistent]
+    if inconsistent:
+        print(f"\n[AVISO] Variantes divergentes: {', '.join(inconsistent)}")
+    if inconsistent or failed:
+        return 1
+    print("\n[OK] v1 e bulk devolvem os mesmos dados")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+Histórico de execuções (SQLite) e detecção de regressões de desempenho
+
+Cada sondagem (test_all_sienge_endpoints.py) e extração (checkpoints.py) é
+acrescentada como uma execução, com uma amostra por endpoint: status,
+registros, total disponível, ttfb, tempo total e registros/s. A comparação
+confronta uma execução com a linha de base móvel das BASELINE_RUNS anteriores
+do mesmo tipo e da mesma raiz da API, usando mediana e MAD (z robusto):
+
+    latência      z >= Z_THRESHOLD e pelo menos MIN_RATIO vezes a mediana
+    vazão         registros/s caiu na mesma proporção (z <= -Z_THRESHOLD)
+    registros     total disponível (ou registros) fora da faixa da base
+    status        endpoint que respondia 200 passou a falhar
+
+Uso:
+    python run_history.py                       # últimas execuções
+    python run_history.py --compare             # última execução vs base
+    python run_history.py --compare --run 42 --kind extract --baseline 30
+    python run_history.py --endpoint /v1/bills  # série de um endpoint
+"""
+
+import argparse
+import math
+import os
+import sqlite3
+import sys
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from statistics import median
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from access_map import access_key
+
+HISTORY_DB = os.getenv("SIENGE_HISTORY_DB", "sienge_history.db")
+
+BASELINE_RUNS = 14
+MIN_BASELINE = 5       # execuções anteriores com o endpoint para haver comparação
+Z_THRESHOLD = 3.5      # z robusto (mediana/MAD), p unilateral < 0.0003
+MIN_RATIO = 1.25       # variação mínima de latência/vazão para ser relevante
+COUNT_TOLERANCE = 0.2  # variação relativa aceita no total de registros
+# Ruído mínimo assumido quando a base é quase constante (MAD ~ 0)
+MIN_SPREAD = {"ttfb": 0.005, "total": 0.01, "records_per_sec": 1.0, "count": 1.0}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    scope TEXT NOT NULL,
+    started_at TEXT NOT NULL,
+    seconds REAL,
+    note TEXT
+);
+CREATE TABLE IF NOT EXISTS samples (
+    run_id INTEGER NOT NULL REFERENCES runs (run_id) ON DELETE CASCADE,
+    endpoint TEXT NOT NULL,
+    status INTEGER,
+    records INTEGER,
+    total_available INTEGER,
+    ttfb REAL,
+    total REAL,
+    records_per_sec REAL
+);
+CREATE INDEX IF NOT EXISTS samples_endpoint_run ON samples (endpoint, run_id);
+CREATE INDEX IF NOT EXISTS samples_run ON samples (run_id);
+CREATE INDEX IF NOT EXISTS runs_kind_scope ON runs (kind, scope, run_id);
+"""
+
+
+@dataclass
+class Sample:
+    """Resultado de um endpoint em uma execução"""
+    url: str
+    status: Optional[int]
+    records: int = 0
+    total_available: Optional[int] = None
+    ttfb: Optional[float] = None
+    total: Optional[float] = None
+    records_per_sec: Optional[float] = None
+
+
+@dataclass
+class Finding:
+    """Desvio de um endpoint em relação à linha de base"""
+    endpoint: str
+    metric: str
+    value: Any
+    baseline: Any
+    ratio: Optional[float] = None
+    z: Optional[float] = None
+    n: int = 0
+
+    @property
+    def p_value(self) -> Optional[float]:
+        """p unilateral pela aproximação normal do z robusto"""
+        if self.z is None:
+            return None
+        return 0.5 * math.erfc(abs(self.z) / math.sqrt(2))
+
+    def describe(self) -> str:
+        if self.metric == "status":
+            return f"{self.endpoint}: status {self.value} (base: {self.baseline})"
+        detail = []
+        if self.ratio is not None:
+            detail.append(f"x{self.ratio:.2f}")
+        if self.z is not None:
+            p = self.p_value
+            detail.append(f"z={self.z:+.1f}, p{'<0.001' if p < 0.001 else f'={p:.3f}'}")
+        detail.append(f"n={self.n}")
+        return (f"{self.endpoint}: {LABELS[self.metric]} {_format(self.metric, self.value)} vs base "
+                f"{_format(self.metric, self.baseline)} ({', '.join(detail)})")
+
+
+LABELS = {
+    "ttfb": "ttfb",
+    "total": "latência total",
+    "records_per_sec": "vazão",
+    "count": "registros",
+}
+
+
+def _format(metric: str, value: Any) -> str:
+    if metric in ("ttfb", "total"):
+        return f"{value * 1000:.0f}ms"
+    if metric == "records_per_sec":
+        return f"{value:,.0f} reg/s"
+    return f"{value:,}" if isinstance(value, int) else str(value)
+
+
+def robust_z(value: float, baseline: List[float], min_spread: float) -> Tuple[float, float]:
+    """(mediana da base, z robusto do valor) com MAD escalado para a normal"""
+    center = median(baseline)
+    mad = median(abs(x - center) for x in baseline)
+    spread = max(1.4826 * mad, min_spread, abs(center) * 0.01)
+    return center, (value - center) / spread
+
+
+def probe_samples(results: Iterable[Dict[str, Any]]) -> List[Sample]:
+    """Amostras a partir dos resultados de test_all_sienge_endpoints (ignorados ficam de fora)"""
+    samples = []
+    for result in results:
+        if result.get("skipped") or not result.get("url"):
+            continue
+        timings = result.get("timings") or {}
+        total = timings.get("total")
+        records = result.get("records") or 0
+        samples.append(Sample(result["url"], result.get("status"), records,
+                              result.get("total_available"), timings.get("ttfb"), total,
+                              records / total if total and records else None))
+    return samples
+
+
+class RunHistory:
+    """Execuções e amostras por endpoint em um arquivo SQLite"""
+
+    def __init__(self, path: str = HISTORY_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(SCHEMA)
+
+    def record_run(self, kind: str, samples: Iterable[Sample], started_at: Optional[datetime] = None,
+                   seconds: Optional[float] = None, note: Optional[str] = None) -> Optional[int]:
+        """Acrescenta uma execução com suas amostras; devolve o run_id (None sem amostras)"""
+        rows = []
+        scope = None
+        for sample in samples:
+            sample_scope, endpoint = access_key(sample.url)
+            scope = scope or sample_scope
+            rows.append((endpoint, sample.status, sample.records, sample.total_available,
+                         sample.ttfb, sample.total, sample.records_per_sec))
+        if not rows:
+            return None
+        started_at = started_at or datetime.now()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                run_id = self._conn.execute(
+                    "INSERT INTO runs (kind, scope, started_at, seconds, note) VALUES (?, ?, ?, ?, ?)",
+                    (kind, scope, started_at.isoformat(timespec="seconds"), seconds, note)).lastrowid
+                self._conn.executemany(
+                    "INSERT INTO samples (run_id, endpoint, status, records, total_available, ttfb, "
+                    "total, records_per_sec) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(run_id,) + row for row in rows])
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return run_id
+
+    def runs(self, kind: Optional[str] = None, limit: int = 20) -> List[Tuple]:
+        """(run_id, kind, scope, started_at, seconds, endpoints) das execuções mais recentes"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT r.run_id, r.kind, r.scope, r.started_at, r.seconds, COUNT(s.endpoint) "
+                "FROM runs r LEFT JOIN samples s ON s.run_id = r.run_id "
+                "WHERE ? IS NULL OR r.kind = ? GROUP BY r.run_id ORDER BY r.run_id DESC LIMIT ?",
+                (kind, kind, limit)).fetchall()
+
+    def series(self, endpoint: str, limit: int = 30) -> List[Tuple]:
+        """Histórico de um endpoint: (run_id, started_at, status, records, total_available, ttfb, total)"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT r.run_id, r.started_at, s.status, s.records, s.total_available, s.ttfb, s.total "
+                "FROM samples s JOIN runs r ON r.run_id = s.run_id WHERE s.endpoint = ? "
+                "ORDER BY r.run_id DESC LIMIT ?", (endpoint, limit)).fetchall()
+
+    def _run(self, run_id: Optional[int], kind: str) -> Optional[Tuple[int, str]]:
+        if run_id is None:
+            return self._conn.execute(
+                "SELECT run_id, scope FROM runs WHERE kind = ? ORDER BY run_id DESC LIMIT 1",
+                (kind,)).fetchone()
+        return self._conn.execute("SELECT run_id, scope FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+
+    def _baseline(self, endpoint: str, kind: str, scope: str, run_id: int,
+                  window: int) -> List[Tuple]:
+        """Amostras do endpoint nas `window` execuções anteriores que o incluem"""
+        return self._conn.execute(
+            "SELECT s.run_id, s.status, s.records, s.total_available, s.ttfb, s.total, "
+            "s.records_per_sec FROM samples s WHERE s.endpoint = ? AND s.run_id IN ("
+            "  SELECT r.run_id FROM runs r WHERE r.kind = ? AND r.scope = ? AND r.run_id < ? "
+            "  AND EXISTS (SELECT 1 FROM samples x WHERE x.run_id = r.run_id AND x.endpoint = ?) "
+            "  ORDER BY r.run_id DESC LIMIT ?)",
+            (endpoint, kind, scope, run_id, endpoint, window)).fetchall()
+
+    def compare(self, run_id: Optional[int] = None, kind: str = "probe",
+                window: int = BASELINE_RUNS) -> Tuple[Optional[int], List[Finding]]:
+        """Compara uma execução (padrão: a última do tipo) com as `window` anteriores"""
+        with self._lock:
+            run = self._run(run_id, kind)
+            if run is None:
+                return None, []
+            run_id, scope = run
+            current: Dict[str, List[Tuple]] = {}
+            for row in self._conn.execute(
+                    "SELECT endpoint, run_id, status, records, total_available, ttfb, total, "
+                    "records_per_sec FROM samples WHERE run_id = ?", (run_id,)):
+                current.setdefault(row[0], []).append(row[1:])
+            history = {endpoint: self._baseline(endpoint, kind, scope, run_id, window)
+                       for endpoint in current}
+
+        findings = []
+        for endpoint, rows in sorted(current.items()):
+            findings.extend(compare_endpoint(endpoint, rows, history[endpoint]))
+        return run_id, findings
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _per_run(rows: List[Tuple], index: int) -> List[float]:
+    """Mediana por execução de uma coluna (várias amostras do mesmo endpoint na mesma execução)"""
+    values: Dict[int, List[float]] = {}
+    for row in rows:
+        if row[1] == 200 and row[index] is not None:
+            values.setdefault(row[0], []).append(row[index])
+    return [median(v) for v in values.values()]
+
+
+def compare_endpoint(endpoint: str, current: List[Tuple], history: List[Tuple]) -> List[Finding]:
+    """Desvios de um endpoint; linhas são (run_id, status, records, total_available, ttfb, total, rps)"""
+    findings = []
+    ok_runs = {row[0] for row in history if row[1] == 200}
+    statuses = sorted({row[1] for row in current}, key=lambda s: (s is None, s))
+    if len(ok_runs) >= MIN_BASELINE and 200 not in statuses:
+        findings.append(Finding(endpoint, "status", statuses[0] if statuses else None, 200, n=len(ok_runs)))
+        return findings
+
+    for metric, index, worse in (("ttfb", 4, 1), ("total", 5, 1), ("records_per_sec", 6, -1)):
+        values = _per_run(current, index)
+        baseline = _per_run(history, index)
+        if not values or len(baseline) < MIN_BASELINE:
+            continue
+        value = median(values)
+        center, z = robust_z(value, baseline, MIN_SPREAD[metric])
+        if not center or not value:
+            continue
+        ratio = value / center
+        # Latência pior = maior; vazão pior = menor
+        if worse * z >= Z_THRESHOLD and (ratio if worse > 0 else 1 / ratio) >= MIN_RATIO:
+            findings.append(Finding(endpoint, metric, value, center, ratio, z, len(baseline)))
+
+    # Total disponível (resultSetMetadata.count) quando existe; senão registros recebidos
+    index = 3 if any(row[3] is not None for row in current) else 2
+    values = _per_run(current, index)
+    baseline = _per_run(history, index)
+    if values and len(baseline) >= MIN_BASELINE:
+        value = int(median(values))
+        center, z = robust_z(value, baseline, MIN_SPREAD["count"])
+        change = abs(value - center) / center if center else (1.0 if value else 0.0)
+        if abs(z) >= Z_THRESHOLD and change > COUNT_TOLERANCE:
+            findings.append(Finding(endpoint, "count", value, int(center),
+                                    value / center if center else None, z, len(baseline)))
+    return findings
+
+
+def print_findings(run_id: Optional[int], findings: List[Finding]):
+    if run_id is None:
+        print("[AVISO] Nenhuma execução no histórico")
+        return
+    if not findings:
+        print(f"[OK] Execução {run_id}: nenhum desvio em relação à linha de base")
+        return
+    print(f"[AVISO] Execução {run_id}: {len(findings)} desvio(s) em relação à linha de base")
+    for finding in findings:
+        print(f"  [REGRESSÃO] {finding.describe()}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Histórico de execuções e regressões de desempenho")
+    parser.add_argument("--db", default=HISTORY_DB)
+    parser.add_argument("--kind", help="Tipo de execução: probe, extract (padrão do --compare: probe)")
+    parser.add_argument("--compare", action="store_true", help="Compara uma execução com a base")
+    parser.add_argument("--run", type=int, help="Execução comparada (padrão: a última do tipo)")
+    parser.add_argument("--baseline", type=int, default=BASELINE_RUNS, help="Execuções na linha de base")
+    parser.add_argument("--endpoint", help="Mostra a série de um endpoint (ex. /v1/bills)")
+    args = parser.parse_args(argv)
+
+    with RunHistory(args.db) as history:
+        if args.compare:
+            run_id, findings = history.compare(args.run, args.kind or "probe", args.baseline)
+            print_findings(run_id, findings)
+            return 1 if findings else 0
+        if args.endpoint:
+            for run_id, started_at, status, records, available, ttfb, total in history.series(args.endpoint):
+                print(f"{run_id:>6} | {started_at} | {status or '-':>4} | {records:>7} registros | "
+                      f"total {available if available is not None else '-':>8} | "
+                      f"ttfb {f'{ttfb * 1000:.0f}ms' if ttfb is not None else '-':>7} | "
+                      f"total {f'{total * 1000:.0f}ms' if total is not None else '-':>7}")
+            return 0
+        for run_id, kind, scope, started_at, seconds, endpoints in history.runs(args.kind):
+            print(f"{run_id:>6} | {kind:8} | {started_at} | {endpoints:>4} endpoints | "
+                  f"{f'{seconds:.1f}s' if seconds is not None else '-':>8} | {scope}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,532 @@
+"""
+Cliente HTTP compartilhado para a API Sienge
+
+Mantém uma única sessão com pool de conexões keep-alive (autenticação e headers
+configurados uma vez), negocia compressão gzip/brotli e mede o tempo de cada
+fase da requisição. Com http2=True e httpx[http2] instalado, usa HTTP/2 com
+multiplexação; caso contrário, cai para requests + urllib3. GETs passam pelo
+cache em disco (http_cache.py) quando ele está ativo e, com hedging
+(hedging.py), ganham uma cópia quando demoram além do percentil do endpoint.
+Com um cassete (cassettes.py) as respostas são gravadas ou reproduzidas sem rede.
+"""
+
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError
+
+from cassettes import Cassette, StreamRecorder, replay_chunks
+from hedging import HedgePolicy
+from http_cache import HttpCache, cache_key
+from metrics import MetricsRegistry, count_records, endpoint_label
+from profiling import phase, phased
+
+try:
+    import brotli  # noqa: F401  (urllib3 decodifica "br" quando disponível)
+    HAS_BROTLI = True
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        HAS_BROTLI = True
+    except ImportError:
+        HAS_BROTLI = False
+
+try:
+    import httpx
+    import h2  # noqa: F401
+    HAS_HTTP2 = True
+except ImportError:
+    httpx = None
+    HAS_HTTP2 = False
+
+# Configurações padrão (espelham SIENGE_API_CONFIG em lib/sienge-api-client.ts)
+API_HOST = "https://api.sienge.com.br"
+
+# Sobrescreve a raiz .../{subdomain}/public/api (ex.: apontar para o mock_server.py)
+BASE_URL_ENV = "SIENGE_BASE_URL"
+# Mesmos padrões dos scripts de teste (test_all_sienge_endpoints.py); a senha não tem padrão
+DEFAULT_SUBDOMAIN = "abf"
+DEFAULT_USERNAME = "abf-gfragoso"
+DEFAULT_TIMEOUT = 30
+DEFAULT_POOL_SIZE = 10
+USER_AGENT = "Sienge-Test/1.0.0"
+
+# Tempo gasto abrindo conexões na thread atual (zero quando a conexão é reutilizada)
+_phase = threading.local()
+
+
+def _add_phase(name: str, seconds: float):
+    phases = getattr(_phase, "timings", None)
+    if phases is not None:
+        phases[name] = phases.get(name, 0.0) + seconds
+
+
+def server_time(until_headers: float, timings: Dict[str, float]) -> float:
+    """Tempo até os headers menos as fases de rede (dns, connect, tls) já medidas"""
+    return until_headers - sum(timings.get(name, 0.0) for name in ("dns", "connect", "tls"))
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    def _new_conn(self):
+        # Resolve o nome à parte para separar DNS do handshake TCP
+        host = self._dns_host
+        start = time.perf_counter()
+        try:
+            addresses = list(dict.fromkeys(
+                info[4][0] for info in socket.getaddrinfo(host, self.port, 0, socket.SOCK_STREAM)))
+        except OSError:
+            addresses = []
+        resolved = time.perf_counter()
+        _add_phase("dns", resolved - start)
+        try:
+            if not addresses:
+                # Sem resolução própria: o urllib3 resolve (e reporta o erro) sozinho
+                return super()._new_conn()
+            # Tenta os endereços em ordem, como o urllib3 faria com o nome
+            for i, address in enumerate(addresses):
+                self._dns_host = address
+                try:
+                    return super()._new_conn()
+                except (OSError, ConnectTimeoutError):
+                    # NewConnectionError (recusa, rede inacessível) e timeout de conexão
+                    if i == len(addresses) - 1:
+                        raise
+        finally:
+            self._dns_host = host
+            _add_phase("connect", time.perf_counter() - resolved)
+
+
+class _TimedHTTPSConnection(_TimedHTTPConnection, HTTPSConnection):
+    def connect(self):
+        timings = getattr(_phase, "timings", None)
+        tcp_before = timings.get("connect", 0.0) if timings is not None else 0.0
+        start = time.perf_counter()
+        super().connect()
+        if timings is not None:
+            # connect() inclui _new_conn(); o restante é o handshake TLS
+            tcp = timings.get("connect", 0.0) - tcp_before
+            _add_phase("tls", time.perf_counter() - start - tcp)
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _TimedAdapter(HTTPAdapter):
+    """HTTPAdapter cujas conexões registram o tempo de conexão/TLS"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _TimedHTTPConnectionPool,
+            "https": _TimedHTTPSConnectionPool,
+        }
+
+
+class SiengeResponse:
+    """Resposta já lida por completo, independente do backend HTTP"""
+
+    def __init__(self, status_code: int, headers: Dict[str, str], content: bytes,
+                 url: str, timings: Dict[str, float], http_version: str = "HTTP/1.1"):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.url = url
+        self.timings = timings
+        self.http_version = http_version
+        self.from_cache = False
+        self.from_cassette = False
+        # Preenchidos pelo SiengeClient quando as métricas estão ativas
+        self.metrics: Optional[MetricsRegistry] = None
+        self.endpoint: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status_code < 300
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self) -> Any:
+        """Decodifica o corpo, registrando o tempo em timings['decode']"""
+        with phase("decode"):
+            start = time.perf_counter()
+            data = json.loads(self.content)
+            self.timings["decode"] = time.perf_counter() - start
+        if self.metrics is not None:
+            self.metrics.observe_decode(self.endpoint, self.timings["decode"], count_records(data))
+        return data
+
+    def __repr__(self) -> str:
+        return f"<SiengeResponse [{self.status_code}]>"
+
+
+class SiengeStream:
+    """Resposta cujo corpo ainda não foi lido (ver SiengeClient.stream)"""
+
+    def __init__(self, status_code: int, headers: Dict[str, str], url: str,
+                 chunks: Iterator[bytes], timings: Dict[str, float]):
+        self.status_code = status_code
+        self.headers = headers
+        self.url = url
+        self.timings = timings
+        self._chunks = chunks
+
+    def iter_bytes(self, chunk_size: Optional[int] = None) -> Iterator[bytes]:
+        """Pedaços do corpo já descomprimidos"""
+        return self._chunks(chunk_size) if callable(self._chunks) else self._chunks
+
+    def read(self) -> bytes:
+        return b"".join(self.iter_bytes())
+
+    def __repr__(self) -> str:
+        return f"<SiengeStream [{self.status_code}]>"
+
+
+def credentials_from_env() -> Tuple[str, str]:
+    """(usuário, senha) de SIENGE_USERNAME/SIENGE_PASSWORD; encerra o script sem a senha"""
+    password = os.getenv("SIENGE_PASSWORD")
+    if not password:
+        sys.exit("[ERRO] SIENGE_PASSWORD não definida: exporte a senha do usuário da API "
+                 f"({os.getenv('SIENGE_USERNAME', DEFAULT_USERNAME)}) antes de rodar o script")
+    return os.getenv("SIENGE_USERNAME", DEFAULT_USERNAME), password
+
+
+class SiengeClient:
+    """Cliente com pool de conexões para a API pública do Sienge"""
+
+    def __init__(self, subdomain: str, username: str, password: str,
+                 base_url: Optional[str] = None, pool_size: int = DEFAULT_POOL_SIZE,
+                 timeout: float = DEFAULT_TIMEOUT, http2: bool = False,
+                 rate_limiter=None, cache: Optional[HttpCache] = None,
+                 metrics: Optional[MetricsRegistry] = None,
+                 hedge: Optional[HedgePolicy] = None, cassette: Optional[Cassette] = None):
+        self.subdomain = subdomain
+        self.username = username
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter
+        # Cache em disco dos GETs (SIENGE_CACHE_DIR ativa sem mudar os scripts)
+        self.cache = cache if cache is not None else HttpCache.from_env()
+        # Histogramas por fase/endpoint (SIENGE_METRICS_FILE ativa sem mudar os scripts)
+        self.metrics = metrics if metrics is not None else MetricsRegistry.from_env()
+        # Cópia de GETs lentos (SIENGE_HEDGE ativa sem mudar os scripts)
+        self.hedge = hedge if hedge is not None else HedgePolicy.from_env()
+        # Gravação/reprodução (SIENGE_CASSETTE ativa sem mudar os scripts; não é fechado em close())
+        self.cassette = cassette if cassette is not None else Cassette.from_env()
+
+        # Raiz da API pública: .../{subdomain}/public/api
+        base_url = base_url or os.environ.get(BASE_URL_ENV) or f"{API_HOST}/{subdomain}/public/api"
+        self.base_url = base_url.rstrip("/")
+        self.base_url_v1 = f"{self.base_url}/v1"
+        self.base_url_bulk = f"{self.base_url}/bulk-data/v1"
+
+        encodings = "gzip, deflate, br" if HAS_BROTLI else "gzip, deflate"
+        self.headers = {
+            "Content-Type": "application/json",
+            "Accept": "application/json",
+            "Accept-Encoding": encodings,
+            "User-Agent": USER_AGENT,
+        }
+
+        self.http2 = http2 and HAS_HTTP2
+        if self.http2:
+            self._httpx = httpx.Client(
+                http2=True,
+                auth=(username, password),
+                headers=self.headers,
+                timeout=timeout,
+                limits=httpx.Limits(max_connections=pool_size,
+                                    max_keepalive_connections=pool_size),
+            )
+        else:
+            self._session = requests.Session()
+            self._session.auth = (username, password)
+            self._session.headers.update(self.headers)
+            adapter = _TimedAdapter(pool_connections=4, pool_maxsize=pool_size)
+            self._session.mount("https://", adapter)
+            self._session.mount("http://", adapter)
+
+    @classmethod
+    def from_env(cls, subdomain: Optional[str] = None, **kwargs) -> "SiengeClient":
+        """Cliente com SIENGE_SUBDOMAIN e as credenciais de credentials_from_env()"""
+        username, password = credentials_from_env()
+        return cls(subdomain or os.getenv("SIENGE_SUBDOMAIN", DEFAULT_SUBDOMAIN),
+                   username, password, **kwargs)
+
+    def url(self, path: str, bulk: bool = False) -> str:
+        """Monta a URL completa; URLs absolutas são devolvidas como estão"""
+        if path.startswith("http://") or path.startswith("https://"):
+            return path
+        return f"{self.base_url_bulk if bulk else self.base_url_v1}{path}"
+
+    def request(self, method: str, path: str, params: Optional[Dict[str, Any]] = None,
+                json_body: Any = None, bulk: bool = False,
+                timeout: Optional[float] = None) -> SiengeResponse:
+        """Executa uma requisição e devolve a resposta com os tempos por fase"""
+        url = self.url(path, bulk)
+        if self.cassette is not None and self.cassette.replaying:
+            start = time.perf_counter()
+            recorded = self.cassette.play(method, url, params, json_body)
+            response = SiengeResponse(recorded.status, recorded.headers, recorded.body, url,
+                                      {"total": time.perf_counter() - start})
+            response.from_cassette = True
+            return self._observe(response, url)
+
+        response = self._request(method, url, params, json_body, timeout or self.timeout)
+        if self.cassette is not None:
+            self.cassette.record(method, url, params, json_body, response.status_code,
+                                 response.headers, response.content,
+                                 response.timings.get("total", 0.0))
+        return response
+
+    def _request(self, method: str, url: str, params: Optional[Dict[str, Any]],
+                 json_body: Any, timeout: float) -> SiengeResponse:
+        """Cache, rate limiter, hedging e rede"""
+        key = entry = None
+        if self.cache is not None and method == "GET":
+            start = time.perf_counter()
+            key = cache_key(method, url, params, self.username)
+            entry = self.cache.lookup(key)
+            if entry is not None and entry.fresh:
+                # Acerto no cache não consome token do rate limiter
+                content = self.cache.hit(entry)
+                if content is not None:
+                    response = SiengeResponse(200, dict(entry.headers), content, entry.url,
+                                              {"total": time.perf_counter() - start})
+                    response.from_cache = True
+                    return self._observe(response, url)
+                # Corpo despejado depois do lookup: segue como miss, sem validadores
+                entry = None
+
+        conditional = entry.validators if entry is not None else None
+
+        def send() -> SiengeResponse:
+            if self.http2:
+                return self._request_httpx(method, url, params, json_body, timeout, conditional)
+            return self._request_requests(method, url, params, json_body, timeout, conditional)
+
+        def dispatch() -> SiengeResponse:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            with phase("request"):
+                if self.hedge is not None and method == "GET":
+                    return self.hedge.run(endpoint_label(url), send, self.rate_limiter, self.metrics)
+                return send()
+
+        response = dispatch()
+
+        if key is not None:
+            if response.status_code == 304 and entry is not None:
+                content = self.cache.revalidated(entry, response.headers)
+                if content is not None:
+                    response = SiengeResponse(200, {**entry.headers, **response.headers}, content,
+                                              response.url, response.timings, response.http_version)
+                    response.from_cache = True
+                    return self._observe(response, url)
+                # O 304 confirmou um corpo que já foi despejado: busca de novo, incondicional
+                conditional = None
+                response = dispatch()
+            self.cache.miss()
+            if self.cache.cacheable(url, response.status_code, response.headers):
+                self.cache.store(key, response.url, response.content, response.headers)
+        return self._observe(response, url)
+
+    def _observe(self, response: SiengeResponse, url: str) -> SiengeResponse:
+        """Registra fases, bytes e status; o decode é registrado em response.json()"""
+        if self.metrics is not None:
+            response.metrics = self.metrics
+            response.endpoint = endpoint_label(url)
+            source = "cassette" if response.from_cassette else \
+                "cache" if response.from_cache else "network"
+            if source == "network":
+                self.metrics.observe_phases(response.endpoint, response.timings)
+            self.metrics.observe_request(response.endpoint, response.status_code, source,
+                                         len(response.content))
+        return response
+
+    def get(self, path: str, params: Optional[Dict[str, Any]] = None, **kwargs) -> SiengeResponse:
+        return self.request("GET", path, params=params, **kwargs)
+
+    def post(self, path: str, json_body: Any = None, **kwargs) -> SiengeResponse:
+        return self.request("POST", path, json_body=json_body, **kwargs)
+
+    @contextmanager
+    def stream(self, method: str, path: str, params: Optional[Dict[str, Any]] = None,
+               json_body: Any = None, bulk: bool = False,
+               timeout: Optional[float] = None) -> Iterator[SiengeStream]:
+        """
+        Abre a requisição e entrega o corpo em pedaços, sem passar pelo cache
+
+        Uso:
+            with client.stream("GET", "/income", params=params, bulk=True) as response:
+                for chunk in response.iter_bytes():
+                    ...
+        """
+        url = self.url(path, bulk)
+        if self.cassette is not None and self.cassette.replaying:
+            recorded = self.cassette.play(method, url, params, json_body)
+            yield SiengeStream(recorded.status, recorded.headers, url,
+                               lambda size: replay_chunks(recorded.body, size), {"ttfb": 0.0})
+            return
+
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        timeout = timeout or self.timeout
+        start = time.perf_counter()
+        received = [0]
+        recorder = StreamRecorder() if self.cassette is not None else None
+
+        def metered(chunks):
+            # Conta os bytes entregues, para as métricas do stream; a leitura da rede é fase "request"
+            if recorder is not None:
+                chunks = recorder.wrap(chunks)
+            for chunk in phased("request", chunks):
+                received[0] += len(chunk)
+                yield chunk
+
+        if self.http2:
+            try:
+                with phase("request"):
+                    request = self._httpx.build_request(method, url, params=params, json=json_body,
+                                                        timeout=timeout)
+                    response = self._httpx.send(request, stream=True)
+                try:
+                    stream = SiengeStream(response.status_code, dict(response.headers), str(response.url),
+                                          lambda size: metered(response.iter_bytes(size)),
+                                          {"ttfb": time.perf_counter() - start})
+                    try:
+                        yield stream
+                    finally:
+                        self._record_stream(recorder, method, url, params, json_body, stream)
+                        self._observe_stream(stream, url, start, received[0])
+                finally:
+                    response.close()
+            except httpx.TimeoutException as e:
+                raise requests.exceptions.Timeout(str(e)) from e
+            except httpx.TransportError as e:
+                raise requests.exceptions.ConnectionError(str(e)) from e
+            return
+
+        timings: Dict[str, float] = {"connect": 0.0, "tls": 0.0}
+        _phase.timings = timings
+        try:
+            with phase("request"):
+                response = self._session.request(method, url, params=params, json=json_body,
+                                                 timeout=timeout, stream=True)
+        finally:
+            _phase.timings = None
+        timings["ttfb"] = server_time(time.perf_counter() - start, timings)
+        stream = SiengeStream(response.status_code, dict(response.headers), response.url,
+                              lambda size: metered(response.iter_content(size or 64 * 1024)),
+                              timings)
+        try:
+            yield stream
+        finally:
+            self._record_stream(recorder, method, url, params, json_body, stream)
+            response.close()
+            self._observe_stream(stream, url, start, received[0])
+
+    def _record_stream(self, recorder: Optional[StreamRecorder], method: str, url: str,
+                       params: Optional[Dict[str, Any]], json_body: Any, stream: SiengeStream):
+        """Grava no cassete o corpo inteiro do stream (um corpo parcial não serve para replay)"""
+        if recorder is None:
+            return
+        try:
+            recorder.finish(stream.iter_bytes)
+        except Exception:
+            # Conexão caiu no meio do corpo: o erro já chegou (ou chegará) a quem lia o stream
+            return
+        if recorder.complete:
+            self.cassette.record(method, url, params, json_body, stream.status_code,
+                                 stream.headers, recorder.body,
+                                 time.perf_counter() - recorder.start)
+
+    def _observe_stream(self, stream: SiengeStream, url: str, start: float, size: int):
+        """Fases de um stream: o download inclui a decodificação feita durante a leitura"""
+        if self.metrics is None:
+            return
+        stream.timings["total"] = time.perf_counter() - start
+        stream.timings["download"] = stream.timings["total"] - sum(
+            stream.timings.get(name, 0.0) for name in ("dns", "connect", "tls", "ttfb"))
+        endpoint = endpoint_label(url)
+        self.metrics.observe_phases(endpoint, stream.timings)
+        self.metrics.observe_request(endpoint, stream.status_code, "stream", size)
+
+    def _request_requests(self, method, url, params, json_body, timeout,
+                          headers=None) -> SiengeResponse:
+        timings: Dict[str, float] = {"connect": 0.0, "tls": 0.0}
+        _phase.timings = timings
+        start = time.perf_counter()
+        try:
+            response = self._session.request(method, url, params=params, json=json_body,
+                                             headers=headers, timeout=timeout, stream=True)
+            headers_at = time.perf_counter()
+            content = response.content
+        finally:
+            _phase.timings = None
+        end = time.perf_counter()
+
+        timings["ttfb"] = server_time(headers_at - start, timings)
+        timings["download"] = end - headers_at
+        timings["total"] = end - start
+        return SiengeResponse(response.status_code, dict(response.headers), content,
+                              response.url, timings)
+
+    def _request_httpx(self, method, url, params, json_body, timeout,
+                       headers=None) -> SiengeResponse:
+        timings: Dict[str, float] = {"connect": 0.0, "tls": 0.0}
+        marks: Dict[str, float] = {}
+
+        def trace(event_name, info):
+            marks[event_name] = time.perf_counter()
+
+        start = time.perf_counter()
+        try:
+            with self._httpx.stream(method, url, params=params, json=json_body, headers=headers,
+                                    timeout=timeout, extensions={"trace": trace}) as response:
+                headers_at = time.perf_counter()
+                content = response.read()
+        except httpx.TimeoutException as e:
+            raise requests.exceptions.Timeout(str(e)) from e
+        except httpx.TransportError as e:
+            raise requests.exceptions.ConnectionError(str(e)) from e
+        end = time.perf_counter()
+
+        if "connection.connect_tcp.complete" in marks:
+            timings["connect"] = marks["connection.connect_tcp.complete"] - marks["connection.connect_tcp.started"]
+        if "connection.start_tls.complete" in marks:
+            timings["tls"] = marks["connection.start_tls.complete"] - marks["connection.start_tls.started"]
+        timings["ttfb"] = server_time(headers_at - start, timings)
+        timings["download"] = end - headers_at
+        timings["total"] = end - start
+        return SiengeResponse(response.status_code, dict(response.headers), content,
+                              str(response.url), timings, response.http_version)
+
+    def close(self):
+        if self.cache is not None:
+            self.cache.close()
+        if self.http2:
+            self._httpx.close()
+        else:
+            self._session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
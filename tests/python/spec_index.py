@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+Índice pré-compilado das especificações OpenAPI (api-docs-plus)
+
+Os YAMLs são lidos uma vez, com o loader em C e em paralelo, e viram um índice
+binário compacto (marshal), guardado por SHA-256 de cada arquivo: paths,
+parâmetros (obrigatórios, tipo, formato, valores aceitos), estilo de paginação
+e base (v1 ou bulk-data/v1). Nas execuções seguintes só os arquivos alterados
+são relidos.
+
+Com o índice as sondagens montam requisições válidas: a base e o path vêm da
+especificação, os parâmetros obrigatórios de data/enum são preenchidos, e o
+que não dá para adivinhar (ids, números de contrato) é apontado antes de gastar
+uma chamada que voltaria 400/404.
+
+Uso:
+    python spec_index.py --list
+    python spec_index.py --resolve /bulk-data/income /supply-contracts/all
+    python spec_index.py --rebuild --workers 4
+"""
+
+import argparse
+import hashlib
+import marshal
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from openapi_specs import (BASE_BULK, BASE_V1, UNIFIED_SPEC, YAML_DIR, SpecSet, _base_of,
+                           load_yaml, match_template)
+from profiling import phase
+
+INDEX_PATH_ENV = "SIENGE_SPEC_INDEX"
+DEFAULT_INDEX_PATH = Path(__file__).resolve().parent / ".sienge_cache" / "spec_index.bin"
+# Muda quando o layout das tuplas gravadas muda (o índice antigo é descartado)
+INDEX_VERSION = 1
+
+PAGINATION_OFFSET = "offset"
+PAGINATION_NONE = "none"
+
+_DATE_FORMAT = re.compile(r"yyyy-MM-dd|\bdate\b", re.I)
+# Valores aceitos descritos em texto: "(I, D, P ou B)", "(PROPOSAL, SOLD or CANCELED)"
+_CHOICES = re.compile(r"\(\s*([A-Z][A-Z_]*(?:\s*(?:,|\bou\b|\bor\b)\s*[A-Z][A-Z_]*)+)\s*\)")
+_PATH_PARAM = re.compile(r"\{([^}]+)\}")
+
+
+@dataclass(frozen=True)
+class ParamSpec:
+    """Parâmetro de uma operação"""
+    name: str
+    location: str
+    required: bool
+    type: Optional[str] = None
+    format: Optional[str] = None
+    choices: Tuple[str, ...] = ()
+    default: Any = None
+
+    @property
+    def is_date(self) -> bool:
+        return bool(self.format and _DATE_FORMAT.search(self.format)) or \
+            self.name.endswith(("Date", "After", "Before"))
+
+
+@dataclass(frozen=True)
+class EndpointSpec:
+    """Operação indexada: o suficiente para montar uma requisição válida"""
+    method: str
+    path: str
+    base: str
+    source: str
+    params: Tuple[ParamSpec, ...] = ()
+    pagination: str = PAGINATION_NONE
+
+    @property
+    def bulk(self) -> bool:
+        return self.base == BASE_BULK
+
+    @property
+    def required_query(self) -> List[ParamSpec]:
+        return [p for p in self.params if p.location == "query" and p.required]
+
+    @property
+    def path_params(self) -> List[str]:
+        return _PATH_PARAM.findall(self.path)
+
+    @property
+    def display(self) -> str:
+        """Path completo com a base, como aparece na URL"""
+        return f"/{self.base}{self.path}"
+
+
+@dataclass
+class ProbeRequest:
+    """Requisição montada a partir do índice (missing = o que falta para ser válida)"""
+    spec: EndpointSpec
+    path: str
+    params: Dict[str, Any]
+    missing: List[str] = field(default_factory=list)
+
+    @property
+    def ready(self) -> bool:
+        return not self.missing
+
+
+def _choices(param: Dict[str, Any]) -> Tuple[str, ...]:
+    enum = param.get("enum") or (param.get("schema") or {}).get("enum")
+    if enum:
+        return tuple(str(v) for v in enum)
+    for text in (param.get("format"), param.get("description")):
+        match = _CHOICES.search(text or "")
+        if match:
+            return tuple(re.split(r"\s*(?:,|\bou\b|\bor\b)\s*", match.group(1)))
+    return ()
+
+
+def _param_tuple(param: Dict[str, Any]) -> Tuple:
+    schema = param.get("schema") or {}
+    return (param.get("name"), param.get("in"), bool(param.get("required")),
+            param.get("type") or schema.get("type"), param.get("format") or schema.get("format"),
+            _choices(param), param.get("default", schema.get("default")))
+
+
+def _pagination(params: Iterable[Tuple]) -> str:
+    names = {p[0] for p in params if p[1] == "query"}
+    return PAGINATION_OFFSET if {"limit", "offset"} <= names else PAGINATION_NONE
+
+
+def index_spec(spec: Dict[str, Any], source: str = "") -> Tuple[str, Tuple]:
+    """
+    (base, operações) de uma especificação já carregada, só com tipos primitivos
+
+    As operações e os parâmetros ($ref resolvidos) vêm do mesmo SpecSet.add_spec
+    usado pelo mock_server.py, para que os dois não divirjam.
+    """
+    specs = SpecSet()
+    specs.add_spec(source, spec)
+    operations = []
+    for op in specs.operations:
+        params = tuple(_param_tuple(p) for p in op.parameters if isinstance(p, dict))
+        operations.append((op.method, op.path, params, _pagination(params)))
+    return _base_of(spec), tuple(operations)
+
+
+def _file_hash(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def _index_file(path: str) -> Tuple[str, str, str, Tuple]:
+    """Trabalho de um processo: (nome, sha256, base, operações) de um YAML"""
+    file = Path(path)
+    base, operations = index_spec(load_yaml(file), file.name)
+    return file.name, _file_hash(file), base, operations
+
+
+class SpecIndex:
+    """Operações de todos os YAMLs, com busca por path e montagem de requisições"""
+
+    def __init__(self, files: Dict[str, Tuple]):
+        # files: nome -> (sha256, tamanho, mtime_ns, base, operações)
+        self.files = files
+        self.endpoints: List[EndpointSpec] = []
+        self._by_key: Dict[Tuple[str, str, str], EndpointSpec] = {}
+        names = sorted(n for n in files if n != UNIFIED_SPEC)
+        if UNIFIED_SPEC in files:
+            # O arquivo unificado só acrescenta paths ausentes nos YAMLs por módulo
+            names.append(UNIFIED_SPEC)
+        for name in names:
+            _, _, _, base, operations = files[name]
+            for method, path, params, pagination in operations:
+                key = (method, base, path)
+                if key in self._by_key:
+                    continue
+                spec = EndpointSpec(method, path, base, name,
+                                    tuple(ParamSpec(*p) for p in params), pagination)
+                self._by_key[key] = spec
+                self.endpoints.append(spec)
+
+    def get(self, path: str, base: str = BASE_V1, method: str = "GET") -> Optional[EndpointSpec]:
+        return self._by_key.get((method, base, path))
+
+    def paths(self, method: str = "GET") -> List[EndpointSpec]:
+        return [spec for spec in self.endpoints if spec.method == method]
+
+    def resolve(self, guess: str, method: str = "GET") -> Optional[EndpointSpec]:
+        """
+        Operação de um path "adivinhado" (ex.: /bulk-data/income, /bulk-data/bank-movements)
+
+        Aceita o prefixo /bulk-data/ (vira a base bulk-data/v1), singular/plural
+        no último segmento e paths concretos de templates (/customers/12).
+        """
+        base, path = split_base(guess)
+        head, _, last = path.rpartition("/")
+        variants = [path, f"{head}/{last[:-1]}" if last.endswith("s") else f"{path}s"]
+        for candidate in variants:
+            spec = self.get(candidate, base, method)
+            if spec:
+                return spec
+        for spec in self.paths(method):
+            if spec.base == base and spec.path_params and match_template(spec.path, path) is not None:
+                return spec
+        return None
+
+    def request_for(self, guess: str, overrides: Optional[Dict[str, Any]] = None,
+                    limit: int = 5, method: str = "GET") -> Optional[ProbeRequest]:
+        """resolve() + build_request(), com os parâmetros de path tirados do path concreto"""
+        spec = self.resolve(guess, method)
+        if spec is None:
+            return None
+        _, path = split_base(guess)
+        values = match_template(spec.path, path) if spec.path_params else None
+        return self.build_request(spec, overrides, limit, path_values=values)
+
+    def build_request(self, spec: EndpointSpec, overrides: Optional[Dict[str, Any]] = None,
+                      limit: int = 5, today: Optional[date] = None,
+                      path_values: Optional[Dict[str, Any]] = None) -> ProbeRequest:
+        """Preenche os parâmetros obrigatórios com valores válidos (ou aponta os que faltam)"""
+        overrides = dict(overrides or {})
+        today = today or date.today()
+        params: Dict[str, Any] = {}
+        missing: List[str] = []
+        if spec.pagination == PAGINATION_OFFSET:
+            params.update(limit=limit, offset=0)
+        for param in spec.required_query:
+            if param.name in overrides:
+                continue
+            value = sample_value(param, today, limit)
+            if value is None:
+                missing.append(param.name)
+            else:
+                params[param.name] = value
+        params.update(overrides)
+
+        path = spec.path
+        for name in spec.path_params:
+            value = (path_values or {}).get(name)
+            if value is None:
+                missing.append(f"{{{name}}}")
+            else:
+                path = path.replace(f"{{{name}}}", str(value))
+        return ProbeRequest(spec, path, params, missing)
+
+
+def split_base(guess: str) -> Tuple[str, str]:
+    """(base, path) de um path que pode vir com /v1/ ou /bulk-data/ na frente"""
+    path = "/" + guess.strip("/")
+    for prefix, base in (("/bulk-data/v1/", BASE_BULK), ("/bulk-data/", BASE_BULK), ("/v1/", BASE_V1)):
+        if path.startswith(prefix):
+            return base, "/" + path[len(prefix):]
+    return BASE_V1, path
+
+
+def sample_value(param: ParamSpec, today: date, limit: int = 5) -> Any:
+    """Valor válido para um parâmetro obrigatório, ou None se depender de dados (ids)"""
+    if param.default is not None:
+        return param.default
+    if param.choices:
+        return param.choices[0]
+    if param.name == "limit":
+        return limit
+    if param.name == "offset":
+        return 0
+    if param.name == "monthYear" or (param.format or "").startswith("monthYear"):
+        # Formato da especificação: MM-yyyy
+        return today.strftime("%m-%Y")
+    if param.is_date:
+        # Início do intervalo (startDate, contractStartDate, createdAfter): 30 dias atrás
+        lowered = param.name.lower()
+        if "start" in lowered or lowered.endswith("after"):
+            return (today - timedelta(days=30)).isoformat()
+        return today.isoformat()
+    return None
+
+
+def index_path() -> Path:
+    return Path(os.environ.get(INDEX_PATH_ENV) or DEFAULT_INDEX_PATH)
+
+
+def _read_cache(path: Path) -> Dict[str, Tuple]:
+    try:
+        data = marshal.loads(path.read_bytes())
+    except (OSError, EOFError, ValueError, TypeError):
+        return {}
+    if not isinstance(data, dict) or data.get("version") != INDEX_VERSION:
+        return {}
+    return data.get("files") or {}
+
+
+def _write_cache(path: Path, files: Dict[str, Tuple]):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_bytes(marshal.dumps({"version": INDEX_VERSION, "files": files}))
+    os.replace(tmp, path)
+
+
+def build_index(yaml_dir: Path = YAML_DIR, cache_path: Optional[Path] = None,
+                workers: Optional[int] = None, rebuild: bool = False) -> SpecIndex:
+    """
+    Índice das especificações, relendo só os YAMLs alterados desde o cache
+
+    Arquivos com mesmo tamanho e mtime reaproveitam o hash gravado; os demais
+    têm o SHA-256 conferido e, se mudou, são relidos em processos paralelos.
+    """
+    yaml_dir = Path(yaml_dir)
+    cache_path = Path(cache_path) if cache_path else index_path()
+    cached = {} if rebuild else _read_cache(cache_path)
+    files: Dict[str, Tuple] = {}
+    stale: List[Path] = []
+    stats: Dict[str, Tuple[int, int]] = {}
+    for path in sorted(yaml_dir.glob("*.yaml")):
+        st = path.stat()
+        stats[path.name] = (st.st_size, st.st_mtime_ns)
+        entry = cached.get(path.name)
+        if entry and entry[1:3] == stats[path.name]:
+            files[path.name] = entry
+        elif entry and entry[0] == _file_hash(path):
+            files[path.name] = (entry[0], *stats[path.name], *entry[3:])
+        else:
+            stale.append(path)
+
+    if stale:
+        workers = workers or min(len(stale), os.cpu_count() or 1)
+        if workers > 1 and len(stale) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(_index_file, map(str, stale)))
+        else:
+            results = [_index_file(str(path)) for path in stale]
+        for name, digest, base, operations in results:
+            files[name] = (digest, *stats[name], base, operations)
+
+    if stale or set(files) != set(cached) or any(files[n] != cached.get(n) for n in files):
+        _write_cache(cache_path, files)
+    return SpecIndex(files)
+
+
+def load_index(yaml_dir: Path = YAML_DIR) -> SpecIndex:
+    """Atalho usado pelos scripts de sondagem"""
+    with phase("spec"):
+        return build_index(yaml_dir)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Índice pré-compilado das especificações OpenAPI")
+    parser.add_argument("--yaml-dir", default=str(YAML_DIR))
+    parser.add_argument("--rebuild", action="store_true", help="Ignora o cache e relê todos os YAMLs")
+    parser.add_argument("--workers", type=int, help="Processos para ler os YAMLs")
+    parser.add_argument("--list", action="store_true", help="Lista os GETs e o que exigem")
+    parser.add_argument("--resolve", nargs="+", metavar="PATH", help="Resolve paths adivinhados")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    index = build_index(Path(args.yaml_dir), workers=args.workers, rebuild=args.rebuild)
+    elapsed = time.perf_counter() - started
+    print(f"[OK] {len(index.files)} especificações, {len(index.endpoints)} operações "
+          f"em {elapsed * 1000:.1f}ms ({index_path()})")
+
+    if args.list:
+        for spec in index.paths():
+            request = index.build_request(spec)
+            needs = f" | falta: {', '.join(request.missing)}" if request.missing else ""
+            print(f"  {spec.display:60} {spec.pagination:6}{needs}")
+    for guess in args.resolve or []:
+        spec = index.resolve(guess)
+        if spec is None:
+            print(f"[ERRO] {guess}: não existe nas especificações")
+            continue
+        request = index.build_request(spec)
+        status = "[OK]" if request.ready else "[AVISO]"
+        print(f"{status} {guess} -> {spec.display} {request.params}"
+              + (f" | falta: {', '.join(request.missing)}" if request.missing else ""))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Execução multi-tenant: a mesma sondagem/extração em vários subdomínios Sienge
+
+Cada tenant roda em um processo próprio (os scripts criam cliente, pool de
+conexões e token bucket no import), então o orçamento de rate limit e o pool
+de um tenant não disputam com os dos outros e o tempo total fica próximo ao
+do tenant mais lento, não à soma de todos.
+
+Configuração (fora do código):
+    SIENGE_TENANTS_FILE   arquivo JSON com a lista de tenants (padrão tenants.json)
+    SIENGE_TENANTS        alternativa só com variáveis: "abf,outro"; credenciais em
+                          SIENGE_<TENANT>_USERNAME / SIENGE_<TENANT>_PASSWORD
+
+    [
+      {"subdomain": "abf", "username": "abf-apitest", "password_env": "SIENGE_ABF_PASSWORD",
+       "rate_limit_per_minute": 200, "burst": 20, "concurrency": 8},
+      {"subdomain": "outro", "username": "outro-api", "password_env": "SIENGE_OUTRO_PASSWORD",
+       "base_url": "http://127.0.0.1:8765/{subdomain}/public/api"}
+    ]
+
+SIENGE_BASE_URL também aceita {subdomain}, para apontar todos os tenants para o mock.
+
+Cada execução grava em tenant_runs/<data>/<tenant>/ (saída do script,
+test_results.json etc.) e um report.json com os resultados por tenant e somados.
+
+Uso:
+    python tenants.py probe
+    python tenants.py --only abf extract /bills --output bills.jsonl
+    python tenants.py --workers 4 load /v1/customers
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from access_map import ACCESS_DB
+from checkpoints import CHECKPOINT_DB
+from parquet_export import EXPORT_DIR
+from run_history import HISTORY_DB
+
+TENANTS_FILE = os.getenv("SIENGE_TENANTS_FILE", "tenants.json")
+RUNS_DIR = os.getenv("SIENGE_TENANT_RUNS_DIR", "tenant_runs")
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPTS = {
+    "probe": "test_all_sienge_endpoints.py",
+    "extract": "checkpoints.py",
+    "load": "pg_bulk_loader.py",
+}
+
+# Arquivos compartilhados entre os tenants (as chaves já separam por tenant/raiz da API);
+# viram caminhos absolutos porque cada processo roda no próprio diretório
+SHARED_PATHS = {
+    "SIENGE_ACCESS_DB": ACCESS_DB,
+    "SIENGE_HISTORY_DB": HISTORY_DB,
+    "SIENGE_CHECKPOINT_DB": CHECKPOINT_DB,
+    "SIENGE_EXPORT_DIR": EXPORT_DIR,
+}
+PATH_ENVS = ("SIENGE_CACHE_DIR", "SIENGE_SPEC_INDEX")
+
+# Estatísticas somadas no relatório consolidado (mesmas chaves de test_all_sienge_endpoints)
+STAT_KEYS = ("total_tested", "successful", "failed_404", "failed_403", "failed_400",
+             "failed_401", "failed_other", "skipped", "total_records")
+
+
+@dataclass
+class Tenant:
+    """Credenciais e limites de um tenant"""
+    subdomain: str
+    username: str
+    password: str = field(default="", repr=False)
+    base_url: Optional[str] = None
+    rate_limit_per_minute: Optional[float] = None
+    burst: Optional[int] = None
+    concurrency: Optional[int] = None
+    env: Dict[str, str] = field(default_factory=dict)
+
+    def environment(self, base: Dict[str, str]) -> Dict[str, str]:
+        """Ambiente do processo do tenant"""
+        env = dict(base)
+        env.update({
+            "SIENGE_SUBDOMAIN": self.subdomain,
+            "SIENGE_USERNAME": self.username,
+            "SIENGE_PASSWORD": self.password,
+        })
+        base_url = self.base_url or base.get("SIENGE_BASE_URL")
+        if base_url:
+            env["SIENGE_BASE_URL"] = base_url.replace("{subdomain}", self.subdomain)
+        limits = {
+            "SIENGE_RATE_LIMIT": self.rate_limit_per_minute,
+            "SIENGE_RATE_BURST": self.burst,
+            "SIENGE_MAX_CONCURRENCY": self.concurrency,
+        }
+        env.update({name: str(value) for name, value in limits.items() if value is not None})
+        env.update({name: str(value) for name, value in self.env.items()})
+        return env
+
+
+def _env_name(subdomain: str) -> str:
+    return re.sub(r"[^A-Z0-9]", "_", subdomain.upper())
+
+
+def _tenant(config: Dict[str, Any]) -> Tenant:
+    config = dict(config)
+    subdomain = config.pop("subdomain")
+    prefix = f"SIENGE_{_env_name(subdomain)}_"
+    password_env = config.pop("password_env", prefix + "PASSWORD")
+    password = config.pop("password", None) or os.getenv(password_env, "")
+    username = config.pop("username", None) or os.getenv(prefix + "USERNAME", "")
+    return Tenant(subdomain, username, password, **config)
+
+
+def load_tenants(path: Optional[str] = None) -> List[Tenant]:
+    """Tenants do arquivo JSON ou, na falta dele, de SIENGE_TENANTS"""
+    path = path or TENANTS_FILE
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            configs = json.load(f)
+    else:
+        names = [name.strip() for name in os.getenv("SIENGE_TENANTS", "").split(",")]
+        configs = [{"subdomain": name} for name in names if name]
+    tenants = [_tenant(config) for config in configs]
+    subdomains = [tenant.subdomain for tenant in tenants]
+    duplicated = sorted({name for name in subdomains if subdomains.count(name) > 1})
+    if duplicated:
+        raise ValueError(f"tenant repetido na configuração: {', '.join(duplicated)}")
+    return tenants
+
+
+def shared_environment() -> Dict[str, str]:
+    """Ambiente base com os arquivos compartilhados em caminhos absolutos"""
+    env = dict(os.environ)
+    for name, default in SHARED_PATHS.items():
+        env[name] = os.path.abspath(env.get(name) or default)
+    for name in PATH_ENVS:
+        if env.get(name):
+            env[name] = os.path.abspath(env[name])
+    return env
+
+
+def run_tenant(tenant: Tenant, script: str, args: List[str], run_dir: str,
+               base_env: Dict[str, str], timeout: Optional[float] = None) -> Dict[str, Any]:
+    """Roda o script para um tenant no diretório dele e devolve o resumo"""
+    workdir = os.path.join(run_dir, tenant.subdomain)
+    os.makedirs(workdir, exist_ok=True)
+    log_path = os.path.join(workdir, "output.log")
+    start = time.perf_counter()
+    with open(log_path, "w", encoding="utf-8") as log:
+        try:
+            code = subprocess.run([sys.executable, os.path.join(SCRIPT_DIR, script), *args],
+                                  cwd=workdir, env=tenant.environment(base_env),
+                                  stdout=log, stderr=subprocess.STDOUT,
+                                  timeout=timeout).returncode
+            error = None if code == 0 else f"código de saída {code}"
+        except subprocess.TimeoutExpired:
+            code, error = None, f"timeout após {timeout:.0f}s"
+
+    summary = {
+        "tenant": tenant.subdomain,
+        "returncode": code,
+        "error": error,
+        "seconds": round(time.perf_counter() - start, 3),
+        "log": log_path,
+    }
+    results_path = os.path.join(workdir, "test_results.json")
+    if os.path.exists(results_path):
+        with open(results_path, encoding="utf-8") as f:
+            data = json.load(f)
+        summary["stats"] = data.get("stats")
+        summary["results"] = data.get("results")
+    return summary
+
+
+def merge_reports(summaries: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Soma as estatísticas e junta os resultados, marcados com o tenant"""
+    stats = dict.fromkeys(STAT_KEYS, 0)
+    results = []
+    for summary in summaries:
+        for key, value in (summary.get("stats") or {}).items():
+            if key in stats:
+                stats[key] += value
+        for result in summary.get("results") or []:
+            results.append({"tenant": summary["tenant"], **result})
+    return {"stats": stats, "results": results}
+
+
+def run_all(tenants: List[Tenant], command: str, args: List[str],
+            workers: Optional[int] = None, timeout: Optional[float] = None,
+            runs_dir: str = RUNS_DIR) -> Dict[str, Any]:
+    """Roda o comando para todos os tenants em paralelo e grava o report.json"""
+    run_at = datetime.now()
+    run_dir = os.path.join(runs_dir, run_at.strftime("%Y%m%dT%H%M%S"))
+    os.makedirs(run_dir, exist_ok=True)
+    base_env = shared_environment()
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=workers or len(tenants)) as executor:
+        futures = [executor.submit(run_tenant, tenant, SCRIPTS[command], args, run_dir,
+                                   base_env, timeout) for tenant in tenants]
+        summaries = []
+        for tenant, future in zip(tenants, futures):
+            summary = future.result()
+            summaries.append(summary)
+            symbol = "[OK]" if summary["returncode"] == 0 else "[ERRO]"
+            stats = summary.get("stats")
+            detail = (f"{stats['successful']}/{stats['total_tested']} OK, "
+                      f"{stats['total_records']} registros" if stats else summary["log"])
+            print(f"{symbol:7} {tenant.subdomain:20} | {summary['seconds']:7.1f}s | "
+                  f"{summary['error'] or detail}")
+
+    report = {
+        "timestamp": run_at.isoformat(),
+        "command": [command, *args],
+        "seconds": round(time.perf_counter() - start, 3),
+        "tenants": [{key: value for key, value in summary.items() if key != "results"}
+                    for summary in summaries],
+        **merge_reports(summaries),
+    }
+    report_path = os.path.join(run_dir, "report.json")
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    report["path"] = report_path
+    return report
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Sondagem/extração em paralelo por tenant Sienge")
+    parser.add_argument("--tenants", help=f"Arquivo JSON de tenants (padrão: {TENANTS_FILE})")
+    parser.add_argument("--only", action="append", metavar="SUBDOMINIO",
+                        help="Roda só estes tenants (pode repetir)")
+    parser.add_argument("--workers", type=int, help="Processos simultâneos (padrão: um por tenant)")
+    parser.add_argument("--timeout", type=float, help="Limite em segundos por tenant")
+    parser.add_argument("--runs-dir", default=RUNS_DIR)
+    parser.add_argument("command", choices=sorted(SCRIPTS))
+    parser.add_argument("args", nargs=argparse.REMAINDER,
+                        help="Argumentos repassados ao script do comando")
+    args = parser.parse_args(argv)
+
+    try:
+        tenants = load_tenants(args.tenants)
+    except (ValueError, KeyError, TypeError, json.JSONDecodeError) as e:
+        print(f"[ERRO] Configuração de tenants inválida: {e}")
+        return 2
+    if args.only:
+        tenants = [tenant for tenant in tenants if tenant.subdomain in args.only]
+    if not tenants:
+        print("[ERRO] Nenhum tenant configurado (SIENGE_TENANTS_FILE ou SIENGE_TENANTS)")
+        return 2
+    missing = [tenant.subdomain for tenant in tenants if not tenant.username]
+    if missing:
+        print(f"[AVISO] Tenants sem usuário configurado: {', '.join(missing)}")
+
+    print(f"Rodando '{args.command}' em {len(tenants)} tenant(s): "
+          f"{', '.join(tenant.subdomain for tenant in tenants)}")
+    report = run_all(tenants, args.command, args.args, args.workers, args.timeout, args.runs_dir)
+
+    tenant_seconds = sum(summary["seconds"] for summary in report["tenants"])
+    stats = report["stats"]
+    print(f"\nTempo total: {report['seconds']:.1f}s (soma dos tenants: {tenant_seconds:.1f}s)")
+    if stats["total_tested"]:
+        print(f"Endpoints: {stats['successful']}/{stats['total_tested']} OK | "
+              f"registros: {stats['total_records']}")
+    print(f"Relatório consolidado: {report['path']}")
+    failed = [summary for summary in report["tenants"] if summary["returncode"] != 0]
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,29 +3,34 @@
 Script para testar todos os endpoints da API Sienge e verificar quais estão acessíveis
 """
 
+import argparse
 import requests
 import json
-import yaml
 import os
-from typing import Dict, List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 from datetime import datetime
 import time
-from pathlib import Path
 
-# Configurações da API
-SIENGE_SUBDOMAIN = "abf"
-SIENGE_USERNAME = "abf-gfragoso"
-SIENGE_PASSWORD = "2grGSPuKaEyFtwhrKVttAIimPbP2AfNJ"
-BASE_URL = f"https://{SIENGE_SUBDOMAIN}.sienge.com.br/{SIENGE_SUBDOMAIN}/api/v1"
+from access_map import AccessMap
+from parquet_export import export_probe_results
+from sienge_client import SiengeClient
+from openapi_specs import BASE_BULK
+from spec_index import SpecIndex, load_index, split_base
 
-# Diretório com os YAMLs
-YAML_DIR = "C:/Users/darla/OneDrive/Documentos/sienge/api-docs-plus/sienge_yamls_updated"
+# Configurações da API (o ambiente sobrescreve; ver tenants.py)
+SIENGE_SUBDOMAIN = os.getenv("SIENGE_SUBDOMAIN", "abf")
+SIENGE_USERNAME = os.getenv("SIENGE_USERNAME", "abf-gfragoso")
+SIENGE_PASSWORD = os.getenv("SIENGE_PASSWORD", "2grGSPuKaEyFtwhrKVttAIimPbP2AfNJ")
 
-# Headers para autenticação
-headers = {
-    "Authorization": f"Basic {SIENGE_USERNAME}:{SIENGE_PASSWORD}",
-    "Content-Type": "application/json"
-}
+# Cliente HTTP compartilhado
+client = SiengeClient(SIENGE_SUBDOMAIN, SIENGE_USERNAME, SIENGE_PASSWORD, timeout=10)
+BASE_URL = client.base_url_v1
+
+# Índice das especificações (api-docs-plus), lido do cache quando os YAMLs não mudaram
+SPEC_INDEX: Optional[SpecIndex] = None
+
+# Endpoints já sabidamente negados/inexistentes/instáveis não são chamados de novo
+ACCESS: Optional[AccessMap] = None
 
 # Mapeamento de endpoints conhecidos
 ENDPOINT_MAPPINGS = {
@@ -63,25 +68,37 @@ ENDPOINT_MAPPINGS = {
     "sites-v1": "/sites",
 }
 
-def test_endpoint(endpoint_name: str, endpoint_path: str) -> Tuple[str, int, str, int]:
+def test_endpoint(endpoint_name: str, endpoint_path: str,
+                  params: Optional[Dict[str, Any]] = None,
+                  bulk: bool = False) -> Tuple[str, int, str, int, str]:
     """
     Testa um endpoint específico
 
     Returns:
-        Tuple com (endpoint_name, status_code, message, record_count)
+        Tuple com (endpoint_name, status_code, message, record_count, url)
     """
+    url = client.url(endpoint_path, bulk)
     try:
-        # Adiciona parâmetros de paginação
-        url = f"{BASE_URL}{endpoint_path}"
-        params = {
-            "limit": 1,  # Busca apenas 1 registro para teste rápido
-            "offset": 0
-        }
+        if params is None:
+            params = {
+                "limit": 1,  # Busca apenas 1 registro para teste rápido
+                "offset": 0
+            }
+
+        reason = ACCESS.skip_reason(url)
+        if reason:
+            print(f"Ignorando: {endpoint_name} -> {url} (mapa de acesso: {reason})")
+            return (endpoint_name, 0, f"⏭️ Mapa de acesso: {reason}", 0, url)
 
         print(f"Testando: {endpoint_name} -> {url}")
 
         # Faz a requisição
-        response = requests.get(url, headers=headers, params=params, timeout=10)
+        try:
+            response = client.get(url, params=params)
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+            ACCESS.record(url, None, type(e).__name__)
+            raise
+        ACCESS.record(url, response.status_code)
 
         if response.status_code == 200:
             try:
@@ -100,41 +117,50 @@ def test_endpoint(endpoint_name: str, endpoint_path: str) -> Tuple[str, int, str
                         # Se não encontrou lista, conta como 1 registro
                         record_count = 1 if data else 0
 
-                return (endpoint_name, response.status_code, "✅ Acesso liberado", record_count)
+                return (endpoint_name, response.status_code, "✅ Acesso liberado", record_count, url)
             except:
-                return (endpoint_name, response.status_code, "✅ Acesso liberado (não JSON)", 0)
+                return (endpoint_name, response.status_code, "✅ Acesso liberado (não JSON)", 0, url)
         elif response.status_code == 401:
-            return (endpoint_name, response.status_code, "❌ Não autorizado", 0)
+            return (endpoint_name, response.status_code, "❌ Não autorizado", 0, url)
         elif response.status_code == 403:
-            return (endpoint_name, response.status_code, "🔒 Acesso negado", 0)
+            return (endpoint_name, response.status_code, "🔒 Acesso negado", 0, url)
         elif response.status_code == 404:
-            return (endpoint_name, response.status_code, "⚠️ Endpoint não encontrado", 0)
+            return (endpoint_name, response.status_code, "⚠️ Endpoint não encontrado", 0, url)
         else:
-            return (endpoint_name, response.status_code, f"⚠️ Status: {response.status_code}", 0)
+            return (endpoint_name, response.status_code, f"⚠️ Status: {response.status_code}", 0, url)
 
     except requests.exceptions.Timeout:
-        return (endpoint_name, 0, "⏱️ Timeout", 0)
+        return (endpoint_name, 0, "⏱️ Timeout", 0, url)
     except Exception as e:
-        return (endpoint_name, 0, f"❌ Erro: {str(e)[:50]}", 0)
+        return (endpoint_name, 0, f"❌ Erro: {str(e)[:50]}", 0, url)
 
-def extract_endpoints_from_yaml(yaml_file: str) -> List[str]:
-    """
-    Extrai os endpoints de um arquivo YAML
-    """
-    try:
-        with open(yaml_file, 'r', encoding='utf-8') as f:
-            data = yaml.safe_load(f)
+def request_path(url: str) -> str:
+    """Path relativo à base (v1 ou bulk-data/v1) de uma URL montada pelo cliente"""
+    for base in (client.base_url_bulk, client.base_url_v1):
+        if url.startswith(base + "/"):
+            return url[len(base):]
+    return url
 
-        endpoints = []
-        if 'paths' in data:
-            for path in data['paths'].keys():
-                endpoints.append(path)
-
-        return endpoints
-    except:
-        return []
+def test_from_spec(endpoint_name: str, guess: str) -> Tuple[str, int, str, int, str]:
+    """
+    Testa um endpoint montando a requisição pelo índice das especificações
 
-def main():
+    Paths que não existem na especificação ou que exigem ids não são chamados
+    (voltariam 404/400): o resultado sai com status 0 e o motivo.
+    """
+    request = SPEC_INDEX.request_for(guess, limit=1)
+    if request is None:
+        print(f"Ignorando: {endpoint_name} -> {guess} (não existe na especificação)")
+        base, path = split_base(guess)
+        return (endpoint_name, 0, "⏭️ Não existe na especificação", 0,
+                client.url(path, base == BASE_BULK))
+    if not request.ready:
+        print(f"Ignorando: {endpoint_name} -> {request.spec.display} (requer {', '.join(request.missing)})")
+        return (endpoint_name, 0, f"⏭️ Requer {', '.join(request.missing)}", 0,
+                client.url(request.path, request.spec.bulk))
+    return test_endpoint(endpoint_name, request.path, request.params, request.spec.bulk)
+
+def run_tests():
     print("=" * 80)
     print("TESTE DE TODOS OS ENDPOINTS DA API SIENGE")
     print("=" * 80)
@@ -150,29 +176,27 @@ def main():
     print("Testando endpoints conhecidos...")
     print("-" * 40)
     for endpoint_name, endpoint_path in ENDPOINT_MAPPINGS.items():
-        result = test_endpoint(endpoint_name, endpoint_path)
+        result = test_from_spec(endpoint_name, endpoint_path)
         results.append(result)
-        time.sleep(0.5)  # Pequeno delay entre requisições
+        if not result[2].startswith("⏭️"):
+            time.sleep(0.5)  # Pequeno delay entre requisições
 
     # Tenta descobrir novos endpoints dos YAMLs
     print("\n" + "=" * 80)
     print("Tentando descobrir novos endpoints dos arquivos YAML...")
     print("-" * 40)
 
-    yaml_files = list(Path(YAML_DIR).glob("*.yaml"))
-    discovered_endpoints = set()
-
-    for yaml_file in yaml_files:
-        endpoints = extract_endpoints_from_yaml(str(yaml_file))
-        for endpoint in endpoints:
-            if endpoint not in discovered_endpoints:
-                discovered_endpoints.add(endpoint)
-                # Testa se não foi testado ainda
-                endpoint_name = f"discovered_{yaml_file.stem}_{endpoint}"
-                if not any(r[0] == endpoint_name for r in results):
-                    result = test_endpoint(endpoint_name, endpoint)
-                    results.append(result)
-                    time.sleep(0.5)
+    known = [SPEC_INDEX.resolve(path) for path in ENDPOINT_MAPPINGS.values()]
+    tested = {spec.display for spec in known if spec}
+    for spec in SPEC_INDEX.paths("GET"):
+        if spec.display in tested:
+            continue
+        tested.add(spec.display)
+        endpoint_name = f"discovered_{spec.source.rsplit('.', 1)[0]}_{spec.path}"
+        result = test_from_spec(endpoint_name, spec.display)
+        results.append(result)
+        if not result[2].startswith("⏭️"):
+            time.sleep(0.5)
 
     # Resumo dos resultados
     print("\n" + "=" * 80)
@@ -183,29 +207,31 @@ def main():
     accessible = [r for r in results if "✅" in r[2]]
     denied = [r for r in results if "🔒" in r[2] or "❌" in r[2]]
     not_found = [r for r in results if "⚠️" in r[2]]
+    skipped = [r for r in results if "⏭️" in r[2]]
 
     print(f"\n📊 ESTATÍSTICAS:")
-    print(f"Total de endpoints testados: {len(results)}")
+    print(f"Total de endpoints testados: {len(results) - len(skipped)}")
     print(f"✅ Acessíveis: {len(accessible)}")
     print(f"🔒 Acesso negado: {len(denied)}")
     print(f"⚠️ Não encontrados/Outros: {len(not_found)}")
+    print(f"⏭️ Não chamados (fora da especificação, exigem ids ou bloqueados no mapa de acesso): {len(skipped)}")
 
     if accessible:
         print(f"\n✅ ENDPOINTS ACESSÍVEIS ({len(accessible)}):")
         print("-" * 40)
-        for name, status, msg, count in sorted(accessible):
+        for name, status, msg, count, _ in sorted(accessible):
             print(f"  • {name}: {msg} (registros encontrados: {count})")
 
     if denied:
         print(f"\n🔒 ENDPOINTS COM ACESSO NEGADO ({len(denied)}):")
         print("-" * 40)
-        for name, status, msg, count in sorted(denied):
+        for name, status, msg, count, _ in sorted(denied):
             print(f"  • {name}: {msg}")
 
     if not_found:
         print(f"\n⚠️ ENDPOINTS NÃO ENCONTRADOS/OUTROS ({len(not_found)}):")
         print("-" * 40)
-        for name, status, msg, count in sorted(not_found):
+        for name, status, msg, count, _ in sorted(not_found):
             print(f"  • {name}: {msg}")
 
     # Salva resultados em JSON
@@ -233,6 +259,15 @@ def main():
 
     print(f"\n💾 Resultados salvos em: {output_file}")
 
+    # Histórico colunar (Parquet), quando o pyarrow está instalado; a partição vem do path real
+    parquet_dir = export_probe_results(
+        [{"name": r[0], "endpoint": request_path(r[4]), "url": r[4], "status": r[1],
+          "message": r[2], "records": r[3]}
+         for r in results],
+        SIENGE_SUBDOMAIN)
+    if parquet_dir:
+        print(f"💾 Histórico Parquet atualizado em: {parquet_dir}")
+
     # Compara com endpoints já implementados
     print("\n" + "=" * 80)
     print("COMPARAÇÃO COM ENDPOINTS JÁ IMPLEMENTADOS")
@@ -264,7 +299,7 @@ def main():
     print("-" * 40)
 
     new_endpoints = []
-    for name, status, msg, count in accessible:
+    for name, status, msg, count, _ in accessible:
         # Remove prefixos e normaliza nome
         clean_name = name.replace("-v1", "").replace("_", "-")
 
@@ -282,5 +317,17 @@ def main():
     print("TESTE CONCLUÍDO!")
     print("=" * 80)
 
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Testa todos os endpoints da API Sienge")
+    parser.add_argument("--recheck", action="store_true",
+                        help="Chama também os endpoints bloqueados no mapa de acesso")
+    args = parser.parse_args(argv)
+
+    # Abertos só aqui: importar o módulo não lê os YAMLs nem cria o banco no diretório atual
+    global ACCESS, SPEC_INDEX
+    SPEC_INDEX = load_index()
+    with AccessMap(recheck=args.recheck) as ACCESS:
+        run_tests()
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,26 +1,37 @@
+import argparse
 import requests
 import json
-from datetime import datetime, timedelta
-from requests.auth import HTTPBasicAuth
-from typing import Dict, List, Any, Tuple
+import os
 import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional, Tuple
+
+from access_map import AccessMap
+from json_stream import RecordStream
+from parquet_export import export_probe_results
+from probe_engine import probe_all, MAX_CONCURRENCY
+from profiling import add_profile_argument, phase, profile_session
+from run_history import RunHistory, print_findings, probe_samples
+from sienge_client import SiengeClient, SiengeResponse
 
-# Credenciais do Sienge
-SIENGE_SUBDOMAIN = "abf"
-SIENGE_USERNAME = "abf-gfragoso"
-SIENGE_PASSWORD = "2grGSPuKaEyFtwhrKVttAIimPbP2AfNJ"
+# Credenciais do Sienge (o ambiente sobrescreve; ver tenants.py)
+SIENGE_SUBDOMAIN = os.getenv("SIENGE_SUBDOMAIN", "abf")
+SIENGE_USERNAME = os.getenv("SIENGE_USERNAME", "abf-gfragoso")
+SIENGE_PASSWORD = os.getenv("SIENGE_PASSWORD", "2grGSPuKaEyFtwhrKVttAIimPbP2AfNJ")
+
+# Cliente HTTP compartilhado
+client = SiengeClient(SIENGE_SUBDOMAIN, SIENGE_USERNAME, SIENGE_PASSWORD,
+                      pool_size=MAX_CONCURRENCY)
 
 # URLs base
-BASE_URL_V1 = f"https://api.sienge.com.br/{SIENGE_SUBDOMAIN}/public/api/v1"
-BASE_URL_BULK = f"https://api.sienge.com.br/{SIENGE_SUBDOMAIN}/public/api/bulk-data/v1"
-
-# Headers e autenticação
-headers = {
-    "Content-Type": "application/json",
-    "Accept": "application/json",
-    "User-Agent": "Sienge-Test/1.0.0"
-}
-auth = HTTPBasicAuth(SIENGE_USERNAME, SIENGE_PASSWORD)
+BASE_URL_V1 = client.base_url_v1
+BASE_URL_BULK = client.base_url_bulk
+
+# Endpoints já sabidamente negados/inexistentes/instáveis não são chamados de novo
+ACCESS: Optional[AccessMap] = None
+
+# Histórico de execuções (latência/registros por endpoint) para detectar regressões
+HISTORY: Optional[RunHistory] = None
 
 # Estatísticas globais
 stats = {
@@ -31,6 +42,7 @@ stats = {
     "failed_400": 0,
     "failed_401": 0,
     "failed_other": 0,
+    "skipped": 0,
     "total_records": 0
 }
 
@@ -42,14 +54,14 @@ def get_date_params():
     return {
         "end_date": datetime.now().strftime("%Y-%m-%d"),
         "start_date": (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d"),
-        "month_year": datetime.now().strftime("%m/%Y")
+        # MM-yyyy, como na especificação (mesmo valor de spec_index.sample_value)
+        "month_year": datetime.now().strftime("%m-%Y")
     }
 
-def test_endpoint(name: str, base_url: str, endpoint: str, params: Dict[str, Any],
-                 method: str = "GET") -> Tuple[int, Dict[str, Any]]:
-    """Testa um endpoint específico"""
+def request_endpoint(name: str, base_url: str, endpoint: str, params: Dict[str, Any],
+                     method: str = "GET") -> Dict[str, Any]:
+    """Executa a requisição e monta o resultado, sem tocar em stats/results"""
     url = f"{base_url}{endpoint}"
-    stats["total_tested"] += 1
 
     result = {
         "name": name,
@@ -59,19 +71,29 @@ def test_endpoint(name: str, base_url: str, endpoint: str, params: Dict[str, Any
         "status": None,
         "records": 0,
         "error": None,
-        "response_structure": None
+        "response_structure": None,
+        "timings": None
     }
 
     try:
-        if method == "GET":
-            response = requests.get(url, auth=auth, headers=headers, params=params, timeout=30)
+        if method == "GET" and base_url == BASE_URL_BULK:
+            # bulk-data pode devolver respostas enormes: registros contados em streaming
+            with client.stream("GET", url, params=params) as response:
+                result["status"] = response.status_code
+                if response.status_code == 200:
+                    summarize_stream(response, result)
+                    return result
+                response = SiengeResponse(response.status_code, response.headers, response.read(),
+                                          response.url, response.timings)
+        elif method == "GET":
+            response = client.get(url, params=params)
         else:
-            response = requests.post(url, auth=auth, headers=headers, json=params, timeout=30)
+            response = client.post(url, json_body=params)
 
         result["status"] = response.status_code
+        result["timings"] = response.timings
 
         if response.status_code == 200:
-            stats["successful"] += 1
             try:
                 data = response.json()
 
@@ -92,46 +114,118 @@ def test_endpoint(name: str, base_url: str, endpoint: str, params: Dict[str, Any
                     result["records"] = len(data)
                     result["response_structure"] = "array"
 
-                stats["total_records"] += result["records"]
-
             except json.JSONDecodeError:
                 result["error"] = "Invalid JSON response"
 
         elif response.status_code == 401:
-            stats["failed_401"] += 1
             result["error"] = "Unauthorized"
         elif response.status_code == 403:
-            stats["failed_403"] += 1
             result["error"] = "Forbidden - No permission"
         elif response.status_code == 404:
-            stats["failed_404"] += 1
             result["error"] = "Not found"
         elif response.status_code == 400:
-            stats["failed_400"] += 1
             result["error"] = f"Bad request: {response.text[:200]}"
         else:
-            stats["failed_other"] += 1
             result["error"] = f"Status {response.status_code}"
 
     except requests.exceptions.Timeout:
         result["error"] = "Timeout"
-        stats["failed_other"] += 1
     except requests.exceptions.ConnectionError as e:
         result["error"] = f"Connection error: {str(e)[:100]}"
-        stats["failed_other"] += 1
     except Exception as e:
         result["error"] = f"Error: {str(e)[:100]}"
-        stats["failed_other"] += 1
 
+    return result
+
+def summarize_stream(response, result: Dict[str, Any]):
+    """Preenche records/estrutura/metadata lendo o corpo em streaming"""
+    records = RecordStream(response.iter_bytes())
+    start = time.perf_counter()
+    try:
+        result["records"] = records.drain()
+        result["response_structure"] = records.structure
+        if "resultSetMetadata" in records.metadata:
+            result["total_available"] = records.result_set_metadata.get("count", 0)
+    except ValueError:
+        result["error"] = "Invalid JSON response"
+    response.timings["download"] = time.perf_counter() - start
+    response.timings["total"] = response.timings["ttfb"] + response.timings["download"]
+    result["timings"] = response.timings
+
+def record_result(result: Dict[str, Any]):
+    """Contabiliza um resultado em stats/results (chamar de uma única thread)"""
+    if result.get("skipped"):
+        stats["skipped"] += 1
+        results.append(result)
+        return
+    stats["total_tested"] += 1
+    status = result["status"]
+    if status == 200:
+        stats["successful"] += 1
+        stats["total_records"] += result["records"]
+    elif status == 401:
+        stats["failed_401"] += 1
+    elif status == 403:
+        stats["failed_403"] += 1
+    elif status == 404:
+        stats["failed_404"] += 1
+    elif status == 400:
+        stats["failed_400"] += 1
+    else:
+        stats["failed_other"] += 1
     results.append(result)
+
+def test_endpoint(name: str, base_url: str, endpoint: str, params: Dict[str, Any],
+                 method: str = "GET") -> Tuple[int, Dict[str, Any]]:
+    """Testa um endpoint específico"""
+    result = request_endpoint(name, base_url, endpoint, params, method)
+    record_result(result)
     return result["status"], result
 
+def skipped_result(name: str, base_url: str, endpoint: str, params: Dict[str, Any],
+                   reason: str) -> Dict[str, Any]:
+    """Resultado de um endpoint não chamado por causa do mapa de acesso"""
+    return {"name": name, "endpoint": endpoint, "url": f"{base_url}{endpoint}", "params": params,
+            "status": None, "records": 0, "error": f"Ignorado: {reason}",
+            "response_structure": None, "timings": None, "skipped": True}
+
+def probe_endpoints(endpoints: List[Tuple[str, str, str, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """Testa todos os endpoints em paralelo, com concorrência e taxa limitadas"""
+    def on_result(job, result):
+        ACCESS.record(result["url"], result["status"], result["error"])
+        record_result(result)
+        print_test_result(result)
+
+    # Bloqueados no mapa de acesso saem antes do token bucket: não gastam taxa nem tempo
+    probed: List[Optional[Dict[str, Any]]] = [None] * len(endpoints)
+    pending = []
+    for position, job in enumerate(endpoints):
+        reason = ACCESS.skip_reason(f"{job[1]}{job[2]}")
+        if reason:
+            probed[position] = skipped_result(*job[:4], reason)
+            record_result(probed[position])
+            print_test_result(probed[position])
+        else:
+            pending.append(position)
+
+    called = probe_all([endpoints[position] for position in pending],
+                       lambda job: request_endpoint(*job), on_result=on_result)
+    for position, result in zip(pending, called):
+        probed[position] = result
+
+    # Mantém o relatório na ordem da lista de endpoints
+    results[:] = probed
+    return probed
+
 def print_test_result(result: Dict[str, Any]):
     """Imprime resultado de um teste"""
-    status_symbol = "[OK]" if result["status"] == 200 else f"[{result['status'] or 'ERR'}]"
+    if result.get("skipped"):
+        status_symbol = "[SKIP]"
+    else:
+        status_symbol = "[OK]" if result["status"] == 200 else f"[{result['status'] or 'ERR'}]"
     print(f"{status_symbol:8} {result['name']:40} | Records: {result['records']:5} | {result['error'] or 'Success'}")
 
-def main():
+def run_probe():
     print("="*80)
     print("TESTE ABRANGENTE DE TODOS OS ENDPOINTS DA API SIENGE")
     print("="*80)
@@ -270,11 +364,10 @@ def main():
     print(f"\nTestando {len(all_endpoints)} endpoints...\n")
     print("-"*80)
 
-    # Testar cada endpoint
-    for name, base_url, endpoint, params in all_endpoints:
-        status, result = test_endpoint(name, base_url, endpoint, params)
-        print_test_result(result)
-        time.sleep(0.3)  # Pequena pausa para evitar rate limiting
+    # Testar endpoints em paralelo (token bucket no lugar da pausa fixa)
+    started = time.perf_counter()
+    probe_endpoints(all_endpoints)
+    elapsed = time.perf_counter() - started
 
     # Imprimir relatório final
     print("\n" + "="*80)
@@ -289,6 +382,7 @@ def main():
     print(f"  Requisição inválida (400): {stats['failed_400']}")
     print(f"  Não autorizado (401): {stats['failed_401']}")
     print(f"  Outros erros: {stats['failed_other']}")
+    print(f"  Ignorados pelo mapa de acesso: {stats['skipped']}")
     print(f"  Total de registros retornados: {stats['total_records']}")
 
     # Listar endpoints funcionais
@@ -311,22 +405,56 @@ def main():
         for result in not_found:
             print(f"  [404] {result['name']:30} - Endpoint nao existe")
 
+    # Listar endpoints ignorados pelo mapa de acesso
+    skipped = [r for r in results if r.get("skipped")]
+    if skipped:
+        print(f"\nENDPOINTS IGNORADOS ({len(skipped)}):")
+        for result in skipped:
+            print(f"  [SKIP] {result['name']:30} - {result['error']}")
+
     # Taxa de sucesso
     if stats['total_tested'] > 0:
         success_rate = (stats['successful'] / stats['total_tested']) * 100
         print(f"\nTAXA DE SUCESSO: {success_rate:.1f}%")
 
     # Salvar resultados em arquivo JSON
-    with open("test_results.json", "w", encoding="utf-8") as f:
+    run_at = datetime.now()
+    with phase("write"), open("test_results.json", "w", encoding="utf-8") as f:
         json.dump({
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": run_at.isoformat(),
             "subdomain": SIENGE_SUBDOMAIN,
             "stats": stats,
             "results": results
         }, f, indent=2, ensure_ascii=False)
 
     print("\nResultados salvos em: test_results.json")
+
+    # Histórico colunar (Parquet), quando o pyarrow está instalado
+    with phase("write"):
+        parquet_dir = export_probe_results(results, SIENGE_SUBDOMAIN, run_at)
+    if parquet_dir:
+        print(f"Histórico Parquet atualizado em: {parquet_dir}")
+
+    # Histórico de execuções e comparação com a linha de base móvel
+    with phase("write"):
+        run_id = HISTORY.record_run("probe", probe_samples(results), run_at, elapsed)
+    if run_id:
+        print(f"Execução {run_id} gravada em: {HISTORY.path}")
+        print_findings(*HISTORY.compare(run_id, "probe"))
     print("="*80)
 
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Teste abrangente de todos os endpoints da API Sienge")
+    parser.add_argument("--recheck", action="store_true",
+                        help="Chama também os endpoints bloqueados no mapa de acesso")
+    add_profile_argument(parser)
+    args = parser.parse_args(argv)
+
+    # Abertos só aqui: importar o módulo não cria os bancos no diretório atual
+    global ACCESS, HISTORY
+    with AccessMap(recheck=args.recheck) as ACCESS, RunHistory() as HISTORY:
+        with profile_session(args.profile):
+            run_probe()
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
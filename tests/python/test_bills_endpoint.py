@@ -1,33 +1,23 @@
+import argparse
 import requests
 import json
+import sys
+import time
 from datetime import datetime, timedelta
-from requests.auth import HTTPBasicAuth
+
+from bills_analysis import HAS_PYARROW, analyze, fetch_bills
+from sienge_client import SiengeClient
 
 # Credenciais do Sienge
 SIENGE_SUBDOMAIN = "abf"
 SIENGE_USERNAME = "abf-gfragoso"
 SIENGE_PASSWORD = "2grGSPuKaEyFtwhrKVttAIimPbP2AfNJ"
 
+# Cliente HTTP compartilhado
+client = SiengeClient(SIENGE_SUBDOMAIN, SIENGE_USERNAME, SIENGE_PASSWORD)
+
 # URL base do endpoint bills conforme YAML
-BASE_URL = f"https://api.sienge.com.br/{SIENGE_SUBDOMAIN}/public/api/v1"
-
-print("="*70)
-print("TESTE DO ENDPOINT /bills - TITULOS A PAGAR")
-print("="*70)
-print(f"Subdomain: {SIENGE_SUBDOMAIN}")
-print(f"Username: {SIENGE_USERNAME}")
-print(f"Base URL: {BASE_URL}")
-print("="*70)
-
-# Headers para requisições
-headers = {
-    "Content-Type": "application/json",
-    "Accept": "application/json",
-    "User-Agent": "Sienge-Test/1.0.0"
-}
-
-# Autenticação HTTP Basic
-auth = HTTPBasicAuth(SIENGE_USERNAME, SIENGE_PASSWORD)
+BASE_URL = client.base_url_v1
 
 # Definir períodos de teste
 test_periods = [
@@ -79,9 +69,10 @@ def test_bills_endpoint(period_name, start_date, end_date, additional_params=Non
         print(f"URL: {url}")
         print(f"Parâmetros: {json.dumps(params, indent=2)}")
 
-        response = requests.get(url, auth=auth, headers=headers, params=params, timeout=30)
+        response = client.get(url, params=params)
 
         print(f"\nStatus Code: {response.status_code}")
+        print(f"Tempos (s): { {k: round(v, 3) for k, v in response.timings.items()} }")
 
         if response.status_code == 200:
             print("[SUCESSO] Endpoint acessível!")
@@ -143,53 +134,98 @@ def test_bills_endpoint(period_name, start_date, end_date, additional_params=Non
     except Exception as e:
         print(f"[ERRO] Erro inesperado: {type(e).__name__}: {e}")
 
-# Executar testes básicos
-print("\n" + "="*70)
-print("INICIANDO TESTES DO ENDPOINT /bills")
-print("="*70)
-
-# Teste 1: Sem filtros adicionais
-for period in test_periods:
-    test_bills_endpoint(period["name"], period["start"], period["end"])
-
-# Teste 2: Com filtros de status
-print("\n" + "="*70)
-print("TESTES COM FILTROS DE STATUS")
-print("="*70)
-
-status_options = [
-    ("S", "Completo"),
-    ("N", "Incompleto"),
-    ("I", "Em inclusão")
-]
-
-for status_code, status_name in status_options:
-    test_bills_endpoint(
-        f"Títulos com status {status_name}",
-        "2024-01-01",
-        "2024-12-31",
-        {"status": status_code}
-    )
-
-# Teste 3: Com filtros de origem
-print("\n" + "="*70)
-print("TESTES COM FILTROS DE ORIGEM")
-print("="*70)
-
-origin_options = [
-    ("AC", "Administração de Compras"),
-    ("CP", "Contas a Pagar"),
-    ("SE", "Sistemas Externos")
-]
-
-for origin_code, origin_name in origin_options:
-    test_bills_endpoint(
-        f"Títulos origem {origin_name}",
-        "2024-01-01",
-        "2024-12-31",
-        {"originId": origin_code}
-    )
-
-print("\n" + "="*70)
-print("TESTE CONCLUÍDO")
-print("="*70)
\ No newline at end of file
+def print_header():
+    print("="*70)
+    print("TESTE DO ENDPOINT /bills - TITULOS A PAGAR")
+    print("="*70)
+    print(f"Subdomain: {SIENGE_SUBDOMAIN}")
+    print(f"Username: {SIENGE_USERNAME}")
+    print(f"Base URL: {BASE_URL}")
+    print("="*70)
+
+def run_filter_tests():
+    """Uma chamada a /bills por período, status e origem"""
+    # Executar testes básicos
+    print("\n" + "="*70)
+    print("INICIANDO TESTES DO ENDPOINT /bills")
+    print("="*70)
+
+    # Teste 1: Sem filtros adicionais
+    for period in test_periods:
+        test_bills_endpoint(period["name"], period["start"], period["end"])
+
+    # Teste 2: Com filtros de status
+    print("\n" + "="*70)
+    print("TESTES COM FILTROS DE STATUS")
+    print("="*70)
+
+    status_options = [
+        ("S", "Completo"),
+        ("N", "Incompleto"),
+        ("I", "Em inclusão")
+    ]
+
+    for status_code, status_name in status_options:
+        test_bills_endpoint(
+            f"Títulos com status {status_name}",
+            "2024-01-01",
+            "2024-12-31",
+            {"status": status_code}
+        )
+
+    # Teste 3: Com filtros de origem
+    print("\n" + "="*70)
+    print("TESTES COM FILTROS DE ORIGEM")
+    print("="*70)
+
+    origin_options = [
+        ("AC", "Administração de Compras"),
+        ("CP", "Contas a Pagar"),
+        ("SE", "Sistemas Externos")
+    ]
+
+    for origin_code, origin_name in origin_options:
+        test_bills_endpoint(
+            f"Títulos origem {origin_name}",
+            "2024-01-01",
+            "2024-12-31",
+            {"originId": origin_code}
+        )
+
+    print("\n" + "="*70)
+    print("TESTE CONCLUÍDO")
+    print("="*70)
+
+def run_analysis() -> int:
+    """Uma única varredura do intervalo dos períodos, agregada localmente"""
+    if not HAS_PYARROW:
+        print("[ERRO] pyarrow não instalado (pip install pyarrow)")
+        return 1
+    start = min(period["start"] for period in test_periods)
+    end = max(period["end"] for period in test_periods)
+    print(f"\nBuscando títulos de {start} até {end} (uma varredura paginada)...")
+    began = time.perf_counter()
+    table = fetch_bills(client, start, end)
+    fetched = time.perf_counter() - began
+    periods = [(period["name"], period["start"], period["end"]) for period in test_periods]
+    elapsed = analyze(table, periods)
+    print(f"\n[OK] {table.num_rows} títulos em {fetched:.2f}s | agregações em {elapsed * 1000:.1f}ms")
+    return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Teste do endpoint /bills")
+    parser.add_argument("--analyze", action="store_true",
+                        help="Busca os títulos uma vez e agrega por status/origem/credor/mês "
+                             "localmente, em vez de uma chamada por filtro")
+    args = parser.parse_args(argv)
+    print_header()
+    try:
+        if args.analyze:
+            return run_analysis()
+        run_filter_tests()
+        return 0
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
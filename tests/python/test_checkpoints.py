@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Testes de incremental_records com um cliente falso: término das janelas
+bulk/sem paginação e retomada pelo offset confirmado
+
+Uso:
+    python -m pytest test_checkpoints.py
+    python test_checkpoints.py
+"""
+
+import os
+import tempfile
+import unittest
+from datetime import date
+
+from checkpoints import STATUS_DONE, STATUS_RUNNING, CheckpointStore, endpoint_key, incremental_records
+
+PAGE = 200
+UNTIL = date(2024, 3, 31)
+
+
+class FakeResponse:
+    def __init__(self, data, status_code=200):
+        self.status_code = status_code
+        self.url = "http://mock/test"
+        self.text = ""
+        self._data = data
+
+    def json(self):
+        return self._data
+
+
+class FakeClient:
+    """Responde como a API real: bulk ignora limit/offset, v1 pagina sobre `total` registros"""
+
+    def __init__(self, total, metadata=True, fail_at_offset=None, max_calls=20, paginated=True):
+        self.total = total
+        self.metadata = metadata
+        self.paginated = paginated
+        self.fail_at_offset = fail_at_offset
+        self.max_calls = max_calls
+        self.calls = []
+
+    def get(self, path, params=None, bulk=False):
+        params = dict(params or {})
+        self.calls.append(params)
+        if len(self.calls) > self.max_calls:
+            raise AssertionError("requisições demais: a janela não terminou")
+        records = [{"id": i} for i in range(self.total)]
+        if bulk:
+            return FakeResponse({"data": records})
+        if not self.paginated:
+            return FakeResponse(records)
+        offset, limit = int(params.get("offset", 0)), int(params.get("limit", PAGE))
+        if offset == self.fail_at_offset:
+            self.fail_at_offset = None
+            return FakeResponse({}, status_code=503)
+        page = records[offset:offset + limit]
+        if not self.metadata:
+            return FakeResponse(page)
+        return FakeResponse({"resultSetMetadata": {"count": self.total, "offset": offset,
+                                                   "limit": limit}, "results": page})
+
+
+class IncrementalRecordsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = CheckpointStore(os.path.join(self.directory.name, "checkpoints.db"), "teste")
+
+    def tearDown(self):
+        self.store.close()
+        self.directory.cleanup()
+
+    def run_window(self, client, path, bulk=False):
+        return list(incremental_records(client, self.store, path, bulk=bulk, until=UNTIL,
+                                        page_size=PAGE))
+
+    def test_bulk_window_of_exactly_one_page_ends(self):
+        client = FakeClient(PAGE)
+        records = self.run_window(client, "/income", bulk=True)
+        self.assertEqual(len(records), PAGE)
+        self.assertEqual(len(client.calls), 1)
+        self.assertNotIn("offset", client.calls[0])
+        self.assertNotIn("limit", client.calls[0])
+        checkpoint = self.store.get(endpoint_key("/income", True))
+        self.assertEqual(checkpoint.status, STATUS_DONE)
+        self.assertEqual(checkpoint.watermark, UNTIL.isoformat())
+        self.assertEqual(checkpoint.records, PAGE)
+
+    def test_bulk_resume_redoes_the_window(self):
+        key = endpoint_key("/income", True)
+        self.store.begin(key, "2024-03-01", "2024-03-31")
+        self.store.advance(key, 150, 150)
+        client = FakeClient(PAGE)
+        self.assertEqual(len(self.run_window(client, "/income", bulk=True)), PAGE)
+        self.assertEqual(client.calls[0]["startDate"], "2024-03-01")
+        self.assertEqual(self.store.get(key).records, PAGE)
+
+    def test_v1_without_metadata_pages_while_full(self):
+        client = FakeClient(PAGE, metadata=False)
+        self.assertEqual(len(self.run_window(client, "/customer-types")), PAGE)
+        self.assertEqual([call["offset"] for call in client.calls], [0, PAGE])
+
+    def test_v1_without_metadata_stops_on_short_page(self):
+        client = FakeClient(PAGE + 10, metadata=False)
+        self.assertEqual(len(self.run_window(client, "/customer-types")), PAGE + 10)
+        self.assertEqual([call["offset"] for call in client.calls], [0, PAGE])
+
+    def test_v1_without_limit_offset_does_not_repeat(self):
+        client = FakeClient(PAGE, metadata=False, paginated=False)
+        records = self.run_window(client, "/customer-types")
+        self.assertEqual([r["id"] for r in records], list(range(PAGE)))
+        self.assertEqual(len(client.calls), 2)
+
+    def test_v1_pages_until_count(self):
+        client = FakeClient(2 * PAGE + 10)
+        self.assertEqual(len(self.run_window(client, "/bills")), 2 * PAGE + 10)
+        self.assertEqual([call["offset"] for call in client.calls], [0, PAGE, 2 * PAGE])
+
+    def test_v1_resumes_from_confirmed_offset(self):
+        client = FakeClient(3 * PAGE, fail_at_offset=2 * PAGE)
+        received = []
+        with self.assertRaises(Exception):
+            for record in incremental_records(client, self.store, "/bills", until=UNTIL,
+                                              page_size=PAGE):
+                received.append(record)
+        checkpoint = self.store.get(endpoint_key("/bills"))
+        self.assertEqual(checkpoint.status, STATUS_RUNNING)
+        self.assertEqual(checkpoint.next_offset, 2 * PAGE)
+
+        received += self.run_window(client, "/bills")
+        self.assertEqual([r["id"] for r in received], list(range(3 * PAGE)))
+        self.assertEqual(self.store.get(endpoint_key("/bills")).status, STATUS_DONE)
+
+
+if __name__ == "__main__":
+    unittest.main()
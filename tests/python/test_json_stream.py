@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Testes do json_stream: o resultado não pode depender de onde a resposta
+foi cortada em pedaços
+
+Uso:
+    python -m pytest test_json_stream.py
+    python test_json_stream.py
+"""
+
+import json
+import unittest
+
+from json_stream import RecordStream
+
+BODIES = [
+    b'[1.5, 1e3, 2.5E+3, -0.25e-2, 12, true, false, null, "x"]',
+    b'{"resultSetMetadata": {"count": 2, "offset": 0, "limit": 100}, '
+    b'"results": [{"id": 1, "valor": 10.75, "nome": "Jo\xc3\xa3o"}, '
+    b'{"id": 22, "valor": -3e2, "tags": [1, 2.0], "ativo": null}]}',
+    b'{"data": [{"billId": 1, "balanceAmount": 1234.5}, {"billId": 2, "balanceAmount": 0}], '
+    b'"extra": 7.25}',
+    b' [ ] ',
+]
+
+
+def decode(chunks):
+    stream = RecordStream(chunks)
+    return list(stream), stream.metadata
+
+
+def expected(body):
+    data = json.loads(body)
+    if isinstance(data, list):
+        return data, {}
+    key = next(k for k in ("results", "data") if k in data)
+    return data[key], {k: v for k, v in data.items() if k != key}
+
+
+class ChunkBoundaryTest(unittest.TestCase):
+
+    def test_every_split_offset(self):
+        for body in BODIES:
+            records, metadata = expected(body)
+            for cut in range(len(body) + 1):
+                with self.subTest(body=body[:30], cut=cut):
+                    self.assertEqual(decode([body[:cut], body[cut:]]), (records, metadata))
+
+    def test_one_byte_chunks(self):
+        for body in BODIES:
+            with self.subTest(body=body[:30]):
+                self.assertEqual(decode([body[i:i + 1] for i in range(len(body))]), expected(body))
+
+    def test_numbers_cut_after_exponent_or_dot(self):
+        self.assertEqual(decode([b"[1.", b"5]"])[0], [1.5])
+        self.assertEqual(decode([b"[1e", b"3]"])[0], [1000.0])
+        self.assertEqual(decode([b"[2.5E+", b"3]"])[0], [2500.0])
+
+    def test_invalid_number_still_fails(self):
+        with self.assertRaises(ValueError):
+            decode([b"[1.", b"]"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,26 +3,32 @@
 Script para testar os principais endpoints da API Sienge
 """
 
+import argparse
 import requests
 import json
+import os
 from datetime import datetime
+from typing import Optional
 import time
 
-# Configurações da API
-SIENGE_SUBDOMAIN = "abf"
-SIENGE_USERNAME = "abf-gfragoso"
-SIENGE_PASSWORD = "2grGSPuKaEyFtwhrKVttAIimPbP2AfNJ"
-BASE_URL = f"https://api.sienge.com.br/{SIENGE_SUBDOMAIN}/public/api/v1"
+from access_map import AccessMap
+from sienge_client import SiengeClient
+from spec_index import SpecIndex, load_index
 
-# Headers para autenticação
-auth_string = f"{SIENGE_USERNAME}:{SIENGE_PASSWORD}"
-import base64
-auth_encoded = base64.b64encode(auth_string.encode()).decode()
+# Configurações da API (o ambiente sobrescreve; ver tenants.py)
+SIENGE_SUBDOMAIN = os.getenv("SIENGE_SUBDOMAIN", "abf")
+SIENGE_USERNAME = os.getenv("SIENGE_USERNAME", "abf-gfragoso")
+SIENGE_PASSWORD = os.getenv("SIENGE_PASSWORD", "2grGSPuKaEyFtwhrKVttAIimPbP2AfNJ")
 
-headers = {
-    "Authorization": f"Basic {auth_encoded}",
-    "Content-Type": "application/json"
-}
+# Cliente HTTP compartilhado
+client = SiengeClient(SIENGE_SUBDOMAIN, SIENGE_USERNAME, SIENGE_PASSWORD, timeout=5)
+BASE_URL = client.base_url_v1
+
+# Índice das especificações: monta base, path e parâmetros obrigatórios válidos
+SPEC_INDEX: Optional[SpecIndex] = None
+
+# Endpoints já sabidamente negados/inexistentes/instáveis não são chamados de novo
+ACCESS: Optional[AccessMap] = None
 
 # Lista dos principais endpoints para testar
 MAIN_ENDPOINTS = {
@@ -67,11 +73,27 @@ MAIN_ENDPOINTS = {
 
 def test_endpoint(name, path):
     """Testa um endpoint específico"""
+    request = SPEC_INDEX.request_for(path, limit=1)
+    if request is None:
+        # Path fora da especificação: a chamada só devolveria 404
+        return {"status": "⚠️", "code": 0, "message": "Não existe na especificação", "count": 0}
+    if not request.ready:
+        return {"status": "⏭️", "code": 0, "count": 0,
+                "message": f"Requer {', '.join(request.missing)} (não chamado)"}
     try:
-        url = f"{BASE_URL}{path}"
-        params = {"limit": 1, "offset": 0}
+        url = client.url(request.path, request.spec.bulk)
+        params = request.params
 
-        response = requests.get(url, headers=headers, params=params, timeout=5)
+        reason = ACCESS.skip_reason(url)
+        if reason:
+            return {"status": "⏭️", "code": 0, "count": 0, "message": f"Mapa de acesso: {reason}"}
+
+        try:
+            response = client.get(url, params=params)
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+            ACCESS.record(url, None, type(e).__name__)
+            raise
+        ACCESS.record(url, response.status_code)
 
         if response.status_code == 200:
             try:
@@ -103,7 +125,7 @@ def test_endpoint(name, path):
     except Exception as e:
         return {"status": "❌", "code": 0, "message": str(e)[:50], "count": 0}
 
-def main():
+def run_tests():
     import sys
     import io
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
@@ -124,7 +146,8 @@ def main():
         result = test_endpoint(name, path)
         results[name] = result
         print(f"{result['status']} {result['message']}")
-        time.sleep(0.2)  # Pequeno delay entre requisições
+        if result["status"] != "⏭️":
+            time.sleep(0.2)  # Pequeno delay entre requisições
 
     # Análise dos resultados
     print("\n" + "=" * 80)
@@ -198,5 +221,17 @@ def main():
     print(f"\n💾 Resultados salvos em: endpoint_test_summary.json")
     print("\n" + "=" * 80)
 
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Testa os principais endpoints da API Sienge")
+    parser.add_argument("--recheck", action="store_true",
+                        help="Chama também os endpoints bloqueados no mapa de acesso")
+    args = parser.parse_args(argv)
+
+    # Abertos só aqui: importar o módulo não lê os YAMLs nem cria o banco no diretório atual
+    global ACCESS, SPEC_INDEX
+    SPEC_INDEX = load_index()
+    with AccessMap(recheck=args.recheck) as ACCESS:
+        run_tests()
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
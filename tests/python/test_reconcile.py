@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Testes do sort-merge do reconcile.py: faltantes, extras, duplicados e
+divergências por campo, com o sort externo partido em vários blocos
+
+Uso:
+    python -m pytest test_reconcile.py
+    python test_reconcile.py
+"""
+
+import random
+import tempfile
+import unittest
+
+from reconcile import PAIRS, Report, external_sort, merge_join, normalize, normalized_rows
+
+MOVEMENTS = PAIRS["movements"]
+
+
+def v1_record(i, value=10.0, date="2024-01-05"):
+    return {"id": i, "value": value, "date": date, "billId": i * 10, "installmentNumber": 1,
+            "documentId": "NF", "documentNumber": str(i), "statementOrigin": "CP",
+            "statementType": "D"}
+
+
+def bulk_record(i, value=10.0, date="2024-01-05T00:00:00"):
+    return {"bankMovementId": i, "bankMovementAmount": value, "bankMovementDate": date,
+            "billId": i * 10, "installmentId": 1, "documentIdentificationId": "NF",
+            "documentIdentificationNumber": str(i), "bankMovementOriginId": "CP",
+            "bankMovementOperationName": "D"}
+
+
+def reconcile_records(v1, bulk, run_size=3):
+    report = Report("movements", "2024-01-01", "2024-01-31")
+    with tempfile.TemporaryDirectory() as directory:
+        v1_rows, report.v1_records, _ = external_sort(
+            normalized_rows(v1, MOVEMENTS.v1), directory, run_size)
+        bulk_rows, report.bulk_records, _ = external_sort(
+            normalized_rows(bulk, MOVEMENTS.bulk), directory, run_size)
+        merge_join(v1_rows, bulk_rows, report)
+    return report
+
+
+class MergeJoinTest(unittest.TestCase):
+
+    def test_identical_sides_are_consistent(self):
+        v1 = [v1_record(i) for i in range(20)]
+        bulk = [bulk_record(i) for i in range(20)]
+        random.Random(1).shuffle(bulk)
+        report = reconcile_records(v1, bulk)
+        self.assertTrue(report.consistent)
+        self.assertEqual((report.matched, report.identical), (20, 20))
+
+    def test_missing_extra_duplicated_and_field_diffs(self):
+        v1 = [v1_record(i) for i in range(10)] + [v1_record(3)]
+        bulk = [bulk_record(i, value=11.0 if i == 5 else 10.0) for i in range(2, 12)]
+        random.Random(2).shuffle(v1)
+        random.Random(3).shuffle(bulk)
+        report = reconcile_records(v1, bulk)
+        self.assertFalse(report.consistent)
+        self.assertEqual(report.missing, 2)
+        self.assertEqual(report.extra, 2)
+        self.assertEqual(report.duplicated, {"v1": 1, "bulk": 0})
+        self.assertEqual(report.matched, 8)
+        self.assertEqual(report.identical, 7)
+        self.assertEqual(report.field_diffs, {"value": 1})
+        self.assertEqual(sorted(report.samples["missing"]), [["0"], ["1"]])
+        self.assertEqual(sorted(report.samples["extra"]), [["10"], ["11"]])
+        self.assertEqual(report.samples["field:value"],
+                         [{"key": ["5"], "v1": 10.0, "bulk": 11.0}])
+
+    def test_one_side_empty(self):
+        report = reconcile_records([], [bulk_record(i) for i in range(4)])
+        self.assertEqual((report.missing, report.extra, report.matched), (0, 4, 0))
+        report = reconcile_records([v1_record(i) for i in range(4)], [])
+        self.assertEqual((report.missing, report.extra, report.matched), (4, 0, 0))
+
+    def test_records_without_key_are_dropped(self):
+        report = reconcile_records([v1_record(1), {"value": 1.0}], [bulk_record(1)])
+        self.assertEqual(report.v1_records, 1)
+        self.assertTrue(report.consistent)
+
+    def test_normalize(self):
+        self.assertEqual(normalize("2024-01-05T00:00:00"), "2024-01-05")
+        self.assertEqual(normalize("2024-01-05T10:30:00"), "2024-01-05T10:30:00")
+        self.assertEqual(normalize(10), normalize(10.001))
+        self.assertIsNone(normalize("  "))
+
+
+if __name__ == "__main__":
+    unittest.main()
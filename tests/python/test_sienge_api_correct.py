@@ -1,15 +1,19 @@
 import requests
 import json
 from datetime import datetime, timedelta
-from requests.auth import HTTPBasicAuth
+
+from sienge_client import SiengeClient
 
 # Credenciais do Sienge
 SIENGE_SUBDOMAIN = "abf"
 SIENGE_USERNAME = "abf-gfragoso"
 SIENGE_PASSWORD = "2grGSPuKaEyFtwhrKVttAIimPbP2AfNJ"
 
+# Cliente HTTP compartilhado
+client = SiengeClient(SIENGE_SUBDOMAIN, SIENGE_USERNAME, SIENGE_PASSWORD)
+
 # URL base correta da API Sienge
-BASE_URL = f"https://api.sienge.com.br/{SIENGE_SUBDOMAIN}/public/api/v1"
+BASE_URL = client.base_url_v1
 
 print("="*70)
 print("TESTE DE ACESSO A API SIENGE - FORMATO CORRETO")
@@ -19,16 +23,6 @@ print(f"Username: {SIENGE_USERNAME}")
 print(f"Base URL: {BASE_URL}")
 print("="*70)
 
-# Headers para requisições
-headers = {
-    "Content-Type": "application/json",
-    "Accept": "application/json",
-    "User-Agent": "Sienge-Test/1.0.0"
-}
-
-# Autenticação HTTP Basic
-auth = HTTPBasicAuth(SIENGE_USERNAME, SIENGE_PASSWORD)
-
 def test_endpoint(name, endpoint, params=None, method="GET"):
     """Testa um endpoint da API Sienge"""
     print(f"\n{'='*70}")
@@ -44,11 +38,12 @@ def test_endpoint(name, endpoint, params=None, method="GET"):
         url = f"{BASE_URL}{endpoint}"
 
         if method == "GET":
-            response = requests.get(url, auth=auth, headers=headers, params=params, timeout=30)
+            response = client.get(url, params=params)
         else:
-            response = requests.post(url, auth=auth, headers=headers, json=params, timeout=30)
+            response = client.post(url, json_body=params)
 
         print(f"Status Code: {response.status_code}")
+        print(f"Tempos (s): { {k: round(v, 3) for k, v in response.timings.items()} }")
 
         if response.status_code == 200:
             print("[SUCESSO] API acessivel!")
@@ -88,7 +83,7 @@ def test_endpoint(name, endpoint, params=None, method="GET"):
 
         elif response.status_code == 401:
             print("[ERRO 401] Nao autorizado - Credenciais invalidas")
-            print(f"Headers de autenticacao: {response.request.headers.get('Authorization', 'Nao encontrado')}")
+            print(f"Usuario de autenticacao: {client.username}")
 
         elif response.status_code == 403:
             print("[ERRO 403] Proibido - Sem permissao para este recurso")
@@ -0,0 +1,572 @@
+#!/usr/bin/env python3
+"""
+Atualização dirigida por webhooks da API Sienge (/hooks)
+
+Em vez de puxar coleções inteiras para achar o que mudou, um receptor
+assíncrono recebe os eventos do Sienge, descarta entregas repetidas, agrupa
+eventos do mesmo registro numa fila SQLite durável e busca em lotes só os
+registros afetados (GET /customers/{id}, /sales-contracts/{id} etc.).
+
+Os registros buscados são acrescentados a <output>/<recurso>.jsonl e, com
+--dsn, carregados no Postgres pelo pg_bulk_loader.py. Registros excluídos
+(eventos *_DELETED ou 404 na busca) vão para <output>/deleted.jsonl.
+
+Uso:
+    python webhooks.py serve --port 8780 --token segredo
+    python webhooks.py register http://meu-host:8780/sienge/webhook --token segredo \\
+        --event CUSTOMER_UPDATED --event SALES_CONTRACT_UPDATED
+    python webhooks.py list
+    python webhooks.py delete <hookId>
+    python webhooks.py status
+
+Com o mock (eventos sintéticos a 20/s):
+    python mock_server.py --port 8765 --events 20
+    SIENGE_BASE_URL=http://127.0.0.1:8765/abf/public/api python webhooks.py serve --port 8780
+    SIENGE_BASE_URL=http://127.0.0.1:8765/abf/public/api \\
+        python webhooks.py register http://127.0.0.1:8780/sienge/webhook --event CUSTOMER_UPDATED
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import sys
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from openapi_specs import YAML_DIR, load_yaml
+from probe_engine import TokenBucket, run_probes
+from profiling import phase
+from spec_index import load_index
+
+QUEUE_DB = os.getenv("SIENGE_WEBHOOK_DB", "sienge_webhooks.db")
+OUTPUT_DIR = os.getenv("SIENGE_WEBHOOK_OUTPUT", "webhook_refresh")
+HOOKS_SPEC = "hooks-v1.yaml"
+
+# Prefixo do evento -> (recurso, path de detalhe). O prefixo mais longo vence
+# (RECEIVABLE_BILL_UPDATED não é um BILL_UPDATED)
+EVENT_RESOURCES = {
+    "CUSTOMER": ("customers", "/customers/{id}"),
+    "SALES_CONTRACT": ("sales-contracts", "/sales-contracts/{id}"),
+    "CONTRACT": ("sales-contracts", "/sales-contracts/{id}"),
+    "RECEIVABLE_BILL": ("receivable-bills", "/accounts-receivable/receivable-bills/{receivableBillId}"),
+    "BILL": ("bills", "/bills/{billId}"),
+    "CREDITOR": ("creditors", "/creditors/{creditorId}"),
+    "ENTERPRISE": ("enterprises", "/enterprises/{enterpriseId}"),
+}
+
+BATCH_SIZE = 50
+# Espera após o primeiro evento de uma rajada, para juntar os seguintes no mesmo lote
+COALESCE_SECONDS = 0.5
+FETCH_CONCURRENCY = 4
+# Entregas repetidas do mesmo eventId são reconhecidas por este tempo
+DEDUP_TTL = timedelta(days=1)
+RETRY_BASE = timedelta(seconds=5)
+RETRY_MAX = timedelta(minutes=10)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS webhook_queue (
+    resource TEXT NOT NULL,
+    entity_id TEXT NOT NULL,
+    action TEXT NOT NULL,
+    event TEXT NOT NULL,
+    first_seen TEXT NOT NULL,
+    last_seen TEXT NOT NULL,
+    events INTEGER NOT NULL DEFAULT 1,
+    version INTEGER NOT NULL DEFAULT 1,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt TEXT NOT NULL,
+    error TEXT,
+    PRIMARY KEY (resource, entity_id)
+);
+CREATE TABLE IF NOT EXISTS webhook_events (
+    event_id TEXT PRIMARY KEY,
+    received_at TEXT NOT NULL
+);
+"""
+
+
+@dataclass
+class HookEvent:
+    """Evento recebido, já associado ao recurso que precisa ser buscado"""
+    event_id: Optional[str]
+    event: str
+    resource: str
+    entity_id: str
+
+    @property
+    def action(self) -> str:
+        return "delete" if self.event.endswith("_DELETED") else "refresh"
+
+
+@dataclass
+class QueueItem:
+    resource: str
+    entity_id: str
+    action: str
+    version: int
+    attempts: int
+
+
+def event_resource(event: str) -> Optional[Tuple[str, str]]:
+    """(recurso, path de detalhe) do evento, pelo prefixo mais longo conhecido"""
+    for prefix in sorted(EVENT_RESOURCES, key=len, reverse=True):
+        if event.startswith(prefix + "_"):
+            return EVENT_RESOURCES[prefix]
+    return None
+
+
+def _entity_id(payload: Dict[str, Any]) -> Optional[Any]:
+    data = payload.get("data")
+    if isinstance(data, dict):
+        if data.get("id") is not None:
+            return data["id"]
+        ids = [value for key, value in data.items() if key.endswith("Id") and value is not None]
+        if len(ids) == 1:
+            return ids[0]
+    return payload.get("entityId")
+
+
+def parse_event(payload: Dict[str, Any]) -> Optional[HookEvent]:
+    """Evento do corpo do webhook, ou None se for de um recurso não tratado"""
+    name = payload.get("event") or payload.get("eventName") or payload.get("type")
+    entity_id = _entity_id(payload)
+    if not name or entity_id is None:
+        return None
+    target = event_resource(str(name))
+    if target is None:
+        return None
+    event_id = payload.get("eventId")
+    return HookEvent(str(event_id) if event_id else None, str(name), target[0], str(entity_id))
+
+
+class WebhookQueue:
+    """Fila durável de registros a atualizar, um item por (recurso, id)"""
+
+    def __init__(self, path: str = QUEUE_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def enqueue(self, event: HookEvent, now: Optional[datetime] = None) -> str:
+        """Enfileira o evento: 'duplicado', 'agrupado' (registro já na fila) ou 'novo'"""
+        stamp = (now or datetime.now()).isoformat(timespec="seconds")
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if event.event_id:
+                    inserted = self._conn.execute(
+                        "INSERT OR IGNORE INTO webhook_events (event_id, received_at) VALUES (?, ?)",
+                        (event.event_id, stamp)).rowcount
+                    if not inserted:
+                        self._conn.execute("COMMIT")
+                        return "duplicado"
+                existing = self._conn.execute(
+                    "SELECT 1 FROM webhook_queue WHERE resource = ? AND entity_id = ?",
+                    (event.resource, event.entity_id)).fetchone()
+                # O evento mais recente decide a ação; version muda para que um lote
+                # em andamento não apague o item ao terminar
+                self._conn.execute(
+                    "INSERT INTO webhook_queue (resource, entity_id, action, event, first_seen, "
+                    "last_seen, next_attempt) VALUES (?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (resource, entity_id) DO UPDATE SET action = excluded.action, "
+                    "event = excluded.event, last_seen = excluded.last_seen, "
+                    "events = events + 1, version = version + 1, attempts = 0, "
+                    "next_attempt = excluded.next_attempt, error = NULL",
+                    (event.resource, event.entity_id, event.action, event.event, stamp, stamp,
+                     stamp))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return "agrupado" if existing else "novo"
+
+    def claim(self, limit: int = BATCH_SIZE, now: Optional[datetime] = None) -> List[QueueItem]:
+        """Itens prontos para busca, os mais antigos primeiro"""
+        stamp = (now or datetime.now()).isoformat(timespec="seconds")
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT resource, entity_id, action, version, attempts FROM webhook_queue "
+                "WHERE next_attempt <= ? ORDER BY first_seen LIMIT ?", (stamp, limit)).fetchall()
+        return [QueueItem(*row) for row in rows]
+
+    def done(self, item: QueueItem):
+        """Remove o item, a menos que um evento novo tenha chegado durante a busca"""
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM webhook_queue WHERE resource = ? AND entity_id = ? AND version = ?",
+                (item.resource, item.entity_id, item.version))
+
+    def retry(self, item: QueueItem, error: str, now: Optional[datetime] = None):
+        """Reagenda com espera exponencial"""
+        delay = min(RETRY_BASE * 2 ** item.attempts, RETRY_MAX)
+        next_attempt = ((now or datetime.now()) + delay).isoformat(timespec="seconds")
+        with self._lock:
+            self._conn.execute(
+                "UPDATE webhook_queue SET attempts = attempts + 1, next_attempt = ?, error = ? "
+                "WHERE resource = ? AND entity_id = ? AND version = ?",
+                (next_attempt, error[:200], item.resource, item.entity_id, item.version))
+
+    def prune(self, now: Optional[datetime] = None) -> int:
+        """Esquece os eventIds antigos usados na deduplicação"""
+        cutoff = ((now or datetime.now()) - DEDUP_TTL).isoformat(timespec="seconds")
+        with self._lock:
+            return self._conn.execute(
+                "DELETE FROM webhook_events WHERE received_at < ?", (cutoff,)).rowcount
+
+    def pending(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT resource, COUNT(*) FROM webhook_queue GROUP BY resource").fetchall()
+        return dict(rows)
+
+    def items(self) -> List[Tuple]:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT resource, entity_id, action, event, events, attempts, next_attempt, error "
+                "FROM webhook_queue ORDER BY first_seen").fetchall()
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class RecordSink:
+    """Destino dos registros atualizados: JSONL por recurso e, opcionalmente, Postgres"""
+
+    def __init__(self, output_dir: str = OUTPUT_DIR, conn=None):
+        self.output_dir = output_dir
+        self.conn = conn
+        os.makedirs(output_dir, exist_ok=True)
+        self._no_mapping: set = set()
+
+    def write(self, resource: str, records: List[Dict[str, Any]], deleted: List[str]):
+        with phase("write"):
+            if records:
+                with open(os.path.join(self.output_dir, f"{resource}.jsonl"), "a",
+                          encoding="utf-8") as f:
+                    f.writelines(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+            if deleted:
+                stamp = datetime.now().isoformat(timespec="seconds")
+                with open(os.path.join(self.output_dir, "deleted.jsonl"), "a",
+                          encoding="utf-8") as f:
+                    f.writelines(json.dumps({"resource": resource, "id": entity_id, "at": stamp})
+                                 + "\n" for entity_id in deleted)
+        if self.conn is not None and records and resource not in self._no_mapping:
+            from pg_bulk_loader import load_endpoint
+            try:
+                stats = load_endpoint(self.conn, resource, records)
+            except KeyError:
+                self._no_mapping.add(resource)
+                print(f"[AVISO] {resource} sem mapeamento no pg_bulk_loader; só JSONL")
+            else:
+                print(f"[OK] Postgres: {stats.summary()}")
+
+
+class WebhookReceiver:
+    """Servidor HTTP assíncrono que recebe os eventos e alimenta a fila"""
+
+    def __init__(self, queue: WebhookQueue, token: Optional[str] = None):
+        self.queue = queue
+        self.token = token
+        self.wakeup = asyncio.Event()
+        self.counts = {"novo": 0, "agrupado": 0, "duplicado": 0, "ignorado": 0}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                status, payload = self.dispatch(method, path, headers, body)
+                self._respond(writer, status, payload,
+                              keep_alive=headers.get("connection", "").lower() != "close")
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _read_request(reader: asyncio.StreamReader):
+        line = await reader.readline()
+        if not line:
+            return None
+        method, path, _ = line.decode("latin-1").split(" ", 2)
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get("content-length") or 0)
+        body = await reader.readexactly(length) if length else b""
+        return method, path, headers, body
+
+    @staticmethod
+    def _respond(writer: asyncio.StreamWriter, status: int, payload: Any, keep_alive: bool):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        reason = {200: "OK", 202: "Accepted", 400: "Bad Request", 401: "Unauthorized",
+                  404: "Not Found", 405: "Method Not Allowed"}.get(status, "OK")
+        writer.write(f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\n"
+                     f"Content-Length: {len(body)}\r\n"
+                     f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+                     .encode("latin-1") + body)
+
+    def dispatch(self, method: str, path: str, headers: Dict[str, str],
+                 body: bytes) -> Tuple[int, Any]:
+        if method == "GET" and path.split("?")[0] == "/health":
+            return 200, {"pending": self.queue.pending(), "received": self.counts}
+        if method != "POST":
+            return 405, {"error": "use POST"}
+        if self.token and headers.get("authorization") != f"Bearer {self.token}":
+            return 401, {"error": "token inválido"}
+        try:
+            payload = json.loads(body or b"null")
+        except ValueError:
+            return 400, {"error": "JSON inválido"}
+        payloads = payload if isinstance(payload, list) else [payload]
+        accepted = 0
+        for item in payloads:
+            event = parse_event(item) if isinstance(item, dict) else None
+            if event is None:
+                self.counts["ignorado"] += 1
+                continue
+            outcome = self.queue.enqueue(event)
+            self.counts[outcome] += 1
+            accepted += outcome != "duplicado"
+        if accepted:
+            self.wakeup.set()
+        return 202, {"accepted": accepted}
+
+
+class Refresher:
+    """Busca em lotes os registros enfileirados"""
+
+    def __init__(self, client, queue: WebhookQueue, sink: RecordSink,
+                 batch_size: int = BATCH_SIZE, concurrency: int = FETCH_CONCURRENCY,
+                 bucket: Optional[TokenBucket] = None):
+        self.client = client
+        self.queue = queue
+        self.sink = sink
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.bucket = bucket or TokenBucket()
+        self.paths = detail_paths()
+        self.fetched = 0
+
+    def fetch(self, item: QueueItem) -> Tuple[Optional[int], Any]:
+        """(status, registro ou mensagem de erro) de um item; status None em falha de rede"""
+        path = self.paths[item.resource].format(item.entity_id)
+        try:
+            response = self.client.get(path)
+        except Exception as e:  # requests/httpx: erro de conexão ou timeout
+            return None, f"{type(e).__name__}: {e}"
+        if response.status_code == 200:
+            return 200, response.json()
+        return response.status_code, response.text[:200]
+
+    async def run_batch(self) -> int:
+        """Processa um lote; devolve quantos itens foram retirados da fila"""
+        items = self.queue.claim(self.batch_size)
+        if not items:
+            return 0
+        refresh = [item for item in items if item.action == "refresh"]
+        results = await run_probes(refresh, self.fetch, concurrency=self.concurrency,
+                                   bucket=self.bucket) if refresh else []
+
+        records: Dict[str, List[Dict[str, Any]]] = {}
+        deleted: Dict[str, List[str]] = {}
+        finished = []
+        for item in items:
+            if item.action == "delete":
+                deleted.setdefault(item.resource, []).append(item.entity_id)
+                finished.append(item)
+        for item, (status, body) in zip(refresh, results):
+            if status == 200:
+                records.setdefault(item.resource, []).append(body)
+                finished.append(item)
+            elif status == 404:
+                # Excluído depois do evento: vale como exclusão
+                deleted.setdefault(item.resource, []).append(item.entity_id)
+                finished.append(item)
+            else:
+                self.queue.retry(item, f"{status or 'ERR'}: {body}")
+
+        loop = asyncio.get_running_loop()
+        for resource in sorted(set(records) | set(deleted)):
+            await loop.run_in_executor(None, self.sink.write, resource,
+                                       records.get(resource, []), deleted.get(resource, []))
+        for item in finished:
+            self.queue.done(item)
+        self.fetched += sum(len(batch) for batch in records.values())
+        print(f"[OK] Lote: {len(items)} item(s) | atualizados "
+              f"{', '.join(f'{r}={len(v)}' for r, v in sorted(records.items())) or '-'}"
+              + (f" | excluídos {sum(len(v) for v in deleted.values())}" if deleted else "")
+              + (f" | reagendados {len(items) - len(finished)}" if len(finished) < len(items) else ""))
+        return len(finished)
+
+    async def run(self, wakeup: asyncio.Event,
+                  idle_seconds: float = RETRY_BASE.total_seconds()):
+        """Processa a fila sempre que chega evento (e a cada idle_seconds, para as retentativas)"""
+        while True:
+            try:
+                await asyncio.wait_for(wakeup.wait(), timeout=idle_seconds)
+                await asyncio.sleep(COALESCE_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            wakeup.clear()
+            while await self.run_batch() >= self.batch_size:
+                pass
+
+
+def detail_paths() -> Dict[str, str]:
+    """Recurso -> path de detalhe com {} no lugar do id, conferido no índice dos YAMLs"""
+    index = load_index()
+    paths = {}
+    for resource, template in EVENT_RESOURCES.values():
+        spec = index.get(template)
+        if spec is None or len(spec.path_params) != 1:
+            raise ValueError(f"Path de detalhe ausente nos YAMLs: {template}")
+        paths[resource] = template.replace("{" + spec.path_params[0] + "}", "{}")
+    return paths
+
+
+def hook_body(url: str, events: List[str], token: Optional[str] = None) -> Dict[str, Any]:
+    """Corpo do POST /hooks validado contra o HookCreate de hooks-v1.yaml"""
+    definition = load_yaml(YAML_DIR / HOOKS_SPEC)["definitions"]["HookCreate"]
+    body = {"url": url, "events": list(events)}
+    if token:
+        body["token"] = token
+    unknown = set(body) - set(definition.get("properties") or {})
+    missing = [name for name in definition.get("required") or [] if not body.get(name)]
+    if unknown or missing:
+        raise ValueError(f"Corpo de webhook inválido (ausentes: {missing}, desconhecidos: "
+                         f"{sorted(unknown)})")
+    unhandled = [event for event in events if event_resource(event) is None]
+    if unhandled:
+        print(f"[AVISO] Eventos sem recurso conhecido (serão ignorados): {', '.join(unhandled)}")
+    return body
+
+
+def list_hooks(client) -> List[Dict[str, Any]]:
+    hooks, offset = [], 0
+    while True:
+        response = client.get("/hooks", params={"limit": 200, "offset": offset})
+        if response.status_code != 200:
+            raise RuntimeError(f"GET /hooks: {response.status_code} {response.text[:200]}")
+        data = response.json()
+        page = data.get("results") or []
+        hooks.extend(page)
+        offset += len(page)
+        if not page or offset >= (data.get("resultSetMetadata") or {}).get("count", 0):
+            return hooks
+
+
+def register_hook(client, url: str, events: List[str], token: Optional[str] = None) -> Dict[str, Any]:
+    """Cadastra o webhook, reaproveitando um já existente para a mesma URL e eventos"""
+    for hook in list_hooks(client):
+        if hook.get("url") == url and sorted(hook.get("events") or []) == sorted(events):
+            return hook
+    response = client.post("/hooks", json_body=hook_body(url, events, token))
+    if response.status_code not in (200, 201):
+        raise RuntimeError(f"POST /hooks: {response.status_code} {response.text[:200]}")
+    return response.json()
+
+
+async def serve(client, queue: WebhookQueue, sink: RecordSink, host: str, port: int,
+                token: Optional[str] = None, batch_size: int = BATCH_SIZE):
+    receiver = WebhookReceiver(queue, token)
+    refresher = Refresher(client, queue, sink, batch_size)
+    server = await asyncio.start_server(receiver.handle, host, port)
+    pending = sum(queue.pending().values())
+    print(f"[OK] Recebendo webhooks em http://{host}:{port}/ (pendentes: {pending})")
+    # Itens que sobraram da execução anterior entram no primeiro lote
+    receiver.wakeup.set()
+    async with server:
+        await asyncio.gather(server.serve_forever(), refresher.run(receiver.wakeup))
+
+
+def main(argv=None) -> int:
+    from sienge_client import SiengeClient
+
+    parser = argparse.ArgumentParser(description="Atualização dirigida por webhooks do Sienge")
+    parser.add_argument("--db", default=QUEUE_DB)
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve_cmd = commands.add_parser("serve", help="Recebe eventos e atualiza os registros")
+    serve_cmd.add_argument("--host", default="0.0.0.0")
+    serve_cmd.add_argument("--port", type=int, default=8780)
+    serve_cmd.add_argument("--token", default=os.getenv("SIENGE_WEBHOOK_TOKEN"))
+    serve_cmd.add_argument("--output", default=OUTPUT_DIR)
+    serve_cmd.add_argument("--dsn", help="Carrega também no Postgres (ex. $DATABASE_URL)")
+    serve_cmd.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    register_cmd = commands.add_parser("register", help="Cadastra o webhook no Sienge")
+    register_cmd.add_argument("url")
+    register_cmd.add_argument("--event", action="append", required=True)
+    register_cmd.add_argument("--token", default=os.getenv("SIENGE_WEBHOOK_TOKEN"))
+    commands.add_parser("list", help="Lista os webhooks cadastrados")
+    delete_cmd = commands.add_parser("delete", help="Remove um webhook")
+    delete_cmd.add_argument("hook_id")
+    commands.add_parser("status", help="Mostra a fila local")
+    args = parser.parse_args(argv)
+
+    if args.command == "status":
+        with WebhookQueue(args.db) as queue:
+            for row in queue.items():
+                print(f"{row[0]:18} | {row[1]:>10} | {row[2]:7} | {row[3]:28} | "
+                      f"{row[4]:>3} evento(s) | tentativas {row[5]} | {row[6]} | {row[7] or ''}")
+            print(f"Pendentes: {sum(queue.pending().values())}")
+        return 0
+
+    client = SiengeClient.from_env()
+    try:
+        if args.command == "register":
+            hook = register_hook(client, args.url, args.event, args.token)
+            events = ", ".join(hook.get("events") or [])
+            print(f"[OK] WebHook {hook.get('id')}: {hook.get('url')} <- {events}")
+        elif args.command == "list":
+            for hook in list_hooks(client):
+                print(f"{hook.get('id')} | {hook.get('url')} | {', '.join(hook.get('events') or [])}")
+        elif args.command == "delete":
+            response = client.request("DELETE", f"/hooks/{args.hook_id}")
+            if response.status_code != 200:
+                print(f"[ERRO] DELETE /hooks/{args.hook_id}: {response.status_code}")
+                return 1
+            print(f"[OK] WebHook {args.hook_id} removido")
+        else:
+            conn = None
+            if args.dsn:
+                from pg_bulk_loader import connect
+                conn = connect(args.dsn)
+            with WebhookQueue(args.db) as queue:
+                queue.prune()
+                try:
+                    asyncio.run(serve(client, queue, RecordSink(args.output, conn), args.host,
+                                      args.port, args.token, args.batch_size))
+                except KeyboardInterrupt:
+                    print(f"\nPendentes na fila: {sum(queue.pending().values())}")
+    except (RuntimeError, ValueError) as e:
+        print(f"[ERRO] {e}")
+        return 1
+    finally:
+        client.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())